@@ -0,0 +1 @@
+"""Benchmarks for the web API and scheduler jobs (see bench/run.py)."""
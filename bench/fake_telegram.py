@@ -0,0 +1,268 @@
+"""Local stand-in for the Telegram Bot API, for tests and load runs.
+
+Serves /bot<token>/<method> and /file/bot<token>/<path> like api.telegram.org,
+so both aiogram and webapp/notify.py can talk to it through
+TELEGRAM_API_URL. sendMessage, sendPhoto, sendVideo, editMessageCaption,
+getFile and getMe return realistic objects; other methods answer
+{"ok": true, "result": true}. Every call is recorded.
+
+    python -m bench.fake_telegram --port 8082 --latency-ms 40 --flood-every 25
+    TELEGRAM_API_URL=http://127.0.0.1:8082 python -m bot.main
+
+Inspect and steer a running instance:
+    GET  /_fake/calls            recorded calls (?method= filter)
+    POST /_fake/reset            forget calls and uploaded files
+    POST /_fake/config           {"latency_ms": .., "flood_every": .., ...}
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+MEDIA_METHODS = {"sendPhoto": "photo", "sendVideo": "video"}
+
+
+@dataclass
+class RecordedCall:
+    method: str
+    params: dict
+    status: int
+    at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return {"method": self.method, "params": self.params, "status": self.status, "at": self.at}
+
+
+class FakeTelegram:
+    """In-memory Bot API. `flood_every=N` answers every Nth call with 429;
+    `flood_probability` does the same at random; both use `retry_after`."""
+
+    def __init__(
+        self,
+        token: str | None = None,
+        latency: float = 0.0,
+        flood_every: int = 0,
+        flood_probability: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ) -> None:
+        self.token = token
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_probability = flood_probability
+        self.retry_after = retry_after
+        self.calls: list[RecordedCall] = []
+        self.files: dict[str, bytes] = {}
+        self._rng = random.Random(seed)
+        self._counter = 0
+        self._ids = itertools.count(1)
+
+    # ── Inspection ──
+
+    def sent(self, method: str | None = None) -> list[RecordedCall]:
+        return [c for c in self.calls if method is None or c.method == method]
+
+    def reset(self) -> None:
+        self.calls.clear()
+        self.files.clear()
+        self._counter = 0
+
+    def stats(self) -> dict:
+        by_method: dict[str, dict[str, int]] = {}
+        for c in self.calls:
+            entry = by_method.setdefault(c.method, {"ok": 0, "flooded": 0, "failed": 0})
+            key = "ok" if c.status == 200 else "flooded" if c.status == 429 else "failed"
+            entry[key] += 1
+        return by_method
+
+    # ── Bot API ──
+
+    def _flooded(self) -> bool:
+        self._counter += 1
+        if self.flood_every and self._counter % self.flood_every == 0:
+            return True
+        return bool(self.flood_probability) and self._rng.random() < self.flood_probability
+
+    async def _params(self, request: web.Request) -> tuple[dict, dict[str, bytes]]:
+        params: dict = dict(request.query)
+        uploads: dict[str, bytes] = {}
+        if request.content_type == "application/json":
+            params.update(await request.json())
+        elif request.method == "POST":
+            for key, value in (await request.post()).items():
+                if isinstance(value, web.FileField):
+                    body = value.file.read()
+                    uploads[key] = body
+                    params[key] = {
+                        "filename": value.filename,
+                        "content_type": value.content_type,
+                        "size": len(body),
+                    }
+                else:
+                    params[key] = value
+        if isinstance(params.get("reply_markup"), str):
+            try:
+                params["reply_markup"] = json.loads(params["reply_markup"])
+            except ValueError:
+                pass
+        return params, uploads
+
+    def _message(self, params: dict, **content) -> dict:
+        chat_id = params.get("chat_id")
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+        message = {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            **content,
+        }
+        if "reply_markup" in params:
+            message["reply_markup"] = params["reply_markup"]
+        return message
+
+    def _store_file(self, body: bytes) -> str:
+        file_id = f"fake-file-{next(self._ids)}"
+        self.files[file_id] = body
+        return file_id
+
+    def _media(self, kind: str, params: dict, uploads: dict[str, bytes]) -> dict:
+        if kind in uploads:
+            file_id = self._store_file(uploads[kind])
+        else:
+            file_id = str(params.get(kind, ""))
+        size = len(self.files.get(file_id, b""))
+        caption = {"caption": params["caption"]} if params.get("caption") else {}
+        if kind == "photo":
+            media = [{"file_id": file_id, "file_unique_id": file_id, "width": 1280, "height": 960, "file_size": size}]
+        else:
+            media = {"file_id": file_id, "file_unique_id": file_id, "width": 1280, "height": 720,
+                     "duration": 5, "file_size": size}
+        return self._message(params, **{kind: media}, **caption)
+
+    async def _result(self, method: str, params: dict, uploads: dict[str, bytes]):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        if method == "sendMessage":
+            return self._message(params, text=params.get("text", ""))
+        if method in MEDIA_METHODS:
+            return self._media(MEDIA_METHODS[method], params, uploads)
+        if method == "editMessageCaption":
+            message = self._message(params, caption=params.get("caption", ""))
+            message["message_id"] = int(params.get("message_id", message["message_id"]))
+            return message
+        if method == "getFile":
+            file_id = str(params.get("file_id", ""))
+            # Unknown ids (e.g. from a real database) still resolve, to placeholder bytes
+            self.files.setdefault(file_id, f"fake-content:{file_id}".encode())
+            return {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_size": len(self.files[file_id]),
+                "file_path": f"files/{file_id}",
+            }
+        if method == "getUpdates":
+            # Long polling: idle briefly instead of spinning the client
+            await asyncio.sleep(min(float(params.get("timeout", 0) or 0), 1.0))
+            return []
+        return True
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params, uploads = await self._params(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.token is not None and request.match_info["token"] != self.token:
+            status, body = 401, {"ok": False, "error_code": 401, "description": "Unauthorized"}
+        elif self._flooded():
+            status, body = 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+        else:
+            status, body = 200, {"ok": True, "result": await self._result(method, params, uploads)}
+        self.calls.append(RecordedCall(method, params, status))
+        return web.json_response(body, status=status)
+
+    async def handle_file(self, request: web.Request) -> web.Response:
+        file_id = request.match_info["path"].rsplit("/", 1)[-1]
+        if file_id not in self.files:
+            raise web.HTTPNotFound()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.Response(body=self.files[file_id], content_type="application/octet-stream")
+
+    # ── Control endpoints ──
+
+    async def handle_calls(self, request: web.Request) -> web.Response:
+        calls = self.sent(request.query.get("method"))
+        return web.json_response({"stats": self.stats(), "calls": [c.to_dict() for c in calls]})
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response({"ok": True})
+
+    async def handle_config(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if "latency_ms" in body:
+            self.latency = float(body["latency_ms"]) / 1000
+        for key in ("flood_every", "retry_after"):
+            if key in body:
+                setattr(self, key, int(body[key]))
+        if "flood_probability" in body:
+            self.flood_probability = float(body["flood_probability"])
+        return web.json_response({
+            "latency_ms": self.latency * 1000,
+            "flood_every": self.flood_every,
+            "flood_probability": self.flood_probability,
+            "retry_after": self.retry_after,
+        })
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self.handle_file)
+        app.router.add_get("/_fake/calls", self.handle_calls)
+        app.router.add_post("/_fake/reset", self.handle_reset)
+        app.router.add_post("/_fake/config", self.handle_config)
+        return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--token", help="reject other tokens with 401 (default: accept any)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--flood-every", type=int, default=0)
+    parser.add_argument("--flood-probability", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeTelegram(
+        token=args.token,
+        latency=args.latency_ms / 1000,
+        flood_every=args.flood_every,
+        flood_probability=args.flood_probability,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    web.run_app(fake.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
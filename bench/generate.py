@@ -0,0 +1,169 @@
+"""Deterministic synthetic data: families, children, completions, extras.
+
+Same seed + same `today` → byte-identical rows. Only the schema comes from
+bot.database.init_db; rows are bulk-inserted, then the score ledger is seeded
+from them the same way an upgraded production database is.
+
+    python -m bench.generate data/bench.db --families 50 --children 3 --weeks 12
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+from datetime import date, timedelta
+
+from bot.tasks_config import DAILY_TASKS, SUNDAY_TASK
+
+PARENT_ID_BASE = 1_000_000
+FAMILY_ID_STRIDE = 100
+
+
+def parent_telegram_id(family_no: int) -> int:
+    return PARENT_ID_BASE + family_no * FAMILY_ID_STRIDE
+
+
+def child_telegram_id(family_no: int, child_no: int) -> int:
+    return parent_telegram_id(family_no) + 1 + child_no
+
+
+async def generate(
+    families: int,
+    children: int,
+    weeks: int,
+    seed: int = 1,
+    today: date | None = None,
+) -> dict:
+    """Populate the (empty) database at bot.config.DB_PATH; return row counts."""
+    from bot import database, ledger
+
+    rng = random.Random(seed)
+    today = today or date.today()
+    start = today - timedelta(weeks=weeks, days=today.weekday())
+    days = [start + timedelta(days=i) for i in range((today - start).days + 1)]
+    all_tasks = list(DAILY_TASKS) + [SUNDAY_TASK]
+
+    await database.init_db()
+    db = await database.get_db()
+
+    users: list[tuple] = []
+    child_tasks: list[tuple] = []
+    completions: list[tuple] = []
+    extras: list[tuple] = []
+    pending_tasks: list[tuple[int, int]] = []   # (family_no, completion row no)
+    pending_extras: list[tuple[int, int]] = []
+
+    user_id = 0
+    for f in range(1, families + 1):
+        await db.execute(
+            "INSERT INTO families (id, invite_code, parent_password) VALUES (?, ?, ?)",
+            (f, f"B{f:05d}", "1234"),
+        )
+        user_id += 1
+        users.append((user_id, parent_telegram_id(f), "parent", f, f"Parent {f}"))
+        for c in range(children):
+            user_id += 1
+            child_id = user_id
+            users.append((child_id, child_telegram_id(f, c), "child", f, f"Child {f}.{c}"))
+            for i, t in enumerate(all_tasks):
+                child_tasks.append((child_id, t.key, t.label, t.group, i))
+
+            diligence = rng.uniform(0.5, 0.95)
+            for d in days:
+                day = d.isoformat()
+                is_today = d == today
+                tasks = list(DAILY_TASKS) + ([SUNDAY_TASK] if d.weekday() == 6 else [])
+                for t in tasks:
+                    if rng.random() >= diligence:
+                        continue
+                    approved = 0 if is_today and rng.random() < 0.5 else 1
+                    completions.append(
+                        (child_id, t.key, day, f"bench-{child_id}-{day}-{t.key}", approved)
+                    )
+                    if not approved:
+                        pending_tasks.append((f, len(completions)))
+                if rng.random() < 0.25:
+                    approved = 0 if is_today else int(rng.random() < 0.9)
+                    extras.append(
+                        (f, child_id, f"Extra {day}", rng.randint(1, 3), day,
+                         1, f"bench-extra-{child_id}-{day}", approved)
+                    )
+                    if not approved:
+                        pending_extras.append((f, len(extras)))
+
+    await db.executemany(
+        "INSERT INTO users (id, telegram_id, role, family_id, name) VALUES (?, ?, ?, ?, ?)",
+        users,
+    )
+    await db.executemany(
+        """INSERT INTO child_tasks
+           (child_id, task_key, label, task_group, is_standard, enabled, sort_order)
+           VALUES (?, ?, ?, ?, 1, 1, ?)""",
+        child_tasks,
+    )
+    # Explicit ids = 1-based position, so pending_* can reference them
+    await db.executemany(
+        """INSERT INTO completions (id, child_id, task_key, date, photo_file_id, approved)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        [(i, *row) for i, row in enumerate(completions, 1)],
+    )
+    await db.executemany(
+        """INSERT INTO extra_tasks
+           (id, family_id, child_id, title, points, date, completed, photo_file_id, approved)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [(i, *row) for i, row in enumerate(extras, 1)],
+    )
+    message_id = 0
+    approval_messages: list[tuple] = []
+    for kind, pending in (("task", pending_tasks), ("extra", pending_extras)):
+        for f, approval_id in pending:
+            message_id += 1
+            approval_messages.append((kind, approval_id, parent_telegram_id(f), message_id))
+    await db.executemany(
+        """INSERT INTO approval_messages (approval_type, approval_id, chat_id, message_id)
+           VALUES (?, ?, ?, ?)""",
+        approval_messages,
+    )
+    await ledger.seed_ledger(db)
+    await db.commit()
+
+    return {
+        "families": families,
+        "children": families * children,
+        "weeks": weeks,
+        "days": len(days),
+        "completions": len(completions),
+        "extras": len(extras),
+        "approval_messages": len(approval_messages),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path")
+    parser.add_argument("--families", type=int, default=50)
+    parser.add_argument("--children", type=int, default=3)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db_path):
+        parser.error(f"{args.db_path} exists — the generator only fills a fresh file")
+    # Must be set before bot.config is imported
+    os.environ["DB_PATH"] = args.db_path
+
+    async def _run() -> None:
+        from bot.database import close_db
+
+        try:
+            print(await generate(args.families, args.children, args.weeks, args.seed))
+        finally:
+            await close_db()
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
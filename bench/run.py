@@ -0,0 +1,267 @@
+"""Time the hot API endpoints and scheduler jobs on a generated database.
+
+    python -m bench.run --families 50 --children 3 --weeks 12 --output bench_output.txt
+
+Endpoints run through the real aiohttp app (auth middleware included) on a
+loopback test server; jobs get a StubBot, or with --fake-telegram a real
+aiogram Bot talking HTTP to bench/fake_telegram.py, so no Telegram traffic
+leaves the machine. Results are JSON, so runs from different versions can be
+diffed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode
+
+BENCH_BOT_TOKEN = "123456:bench-token"
+
+# (name, path, statement budget incl. the auth lookup; None = not enforced)
+ENDPOINTS = (
+    ("children", "/api/children", 5),
+    ("today", "/api/today/{child_id}", 8),
+    ("report", "/api/report/{child_id}", 6),
+    ("history", "/api/history/{child_id}", 7),
+    ("approvals", "/api/approvals", 2),
+    ("dashboard", "/api/dashboard", 7),
+)
+
+
+def init_data_header(telegram_id: int, bot_token: str) -> str:
+    """Authorization header value signed the way Telegram signs initData."""
+    fields = {
+        "auth_date": str(int(time.time())),
+        "user": json.dumps({"id": telegram_id, "first_name": "Bench"}),
+    }
+    check = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return "tma " + urlencode(fields)
+
+
+def _summarize(name: str, kind: str, samples: list[float], **extra) -> dict:
+    from bot.metrics import percentile
+
+    ms = [s * 1000 for s in samples]
+    return {
+        "name": name,
+        "kind": kind,
+        "iterations": len(ms),
+        "min_ms": round(min(ms), 3),
+        "p50_ms": round(percentile(ms, 0.5), 3),
+        "p95_ms": round(percentile(ms, 0.95), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "max_ms": round(max(ms), 3),
+        **extra,
+    }
+
+
+async def bench_endpoints(iterations: int, warmup: int, check_budgets: bool = False) -> list[dict]:
+    from aiohttp.test_utils import TestClient, TestServer
+
+    from bench.generate import parent_telegram_id
+    from bot.db_stats import query_budget
+    from webapp.db import get_family_children, read_snapshot
+    from webapp.server import create_app
+
+    child_id = (await get_family_children(1))[0]["id"]
+    # Opens the snapshot connection too, so budgets don't count its PRAGMAs
+    async with read_snapshot():
+        pass
+    headers = {"Authorization": init_data_header(parent_telegram_id(1), BENCH_BOT_TOKEN)}
+
+    results = []
+    async with TestClient(TestServer(create_app())) as client:
+        for name, path, budget in ENDPOINTS:
+            url = path.format(child_id=child_id)
+            limit = budget if check_budgets and budget is not None else sys.maxsize
+            with query_budget(limit, f"GET {path}") as stats:
+                async with client.get(url, headers=headers) as resp:
+                    await resp.read()
+            samples = []
+            for i in range(warmup + iterations):
+                t0 = time.perf_counter()
+                async with client.get(url, headers=headers) as resp:
+                    body = await resp.read()
+                    if resp.status != 200:
+                        raise RuntimeError(f"{url}: HTTP {resp.status} {body[:200]!r}")
+                if i >= warmup:
+                    samples.append(time.perf_counter() - t0)
+            results.append(_summarize(
+                name, "http", samples,
+                path=path, bytes=len(body), queries=stats.queries, query_budget=budget,
+            ))
+            if check_budgets:
+                _check_response_bytes(path, len(body))
+    return results
+
+
+def _check_response_bytes(path: str, size: int) -> None:
+    """The /metrics response-size histogram must have seen this route's bodies."""
+    from webapp.metrics import http_response_bytes
+
+    hist = http_response_bytes("GET", path)
+    if size and (hist is None or hist.sum < size):
+        recorded = hist.sum if hist is not None else None
+        raise RuntimeError(f"GET {path}: response size not recorded ({recorded} for {size} B bodies)")
+
+
+async def bench_jobs(
+    iterations: int, latency: float, fake_telegram: bool = False, flood_every: int = 0
+) -> list[dict]:
+    from bench.stub_bot import StubBot
+    from bot.scheduler import evening_summary, weekly_report
+
+    today = date.today()
+    results = []
+    for name, job in (("evening_summary", evening_summary), ("weekly_report", weekly_report)):
+        samples = []
+        if fake_telegram:
+            async with _fake_telegram_bot(latency, flood_every) as (bot, fake):
+                for _ in range(iterations):
+                    t0 = time.perf_counter()
+                    await job(bot, today=today)
+                    samples.append(time.perf_counter() - t0)
+                extra = {
+                    "telegram_calls": len(fake.calls) // iterations,
+                    "telegram": fake.stats(),
+                }
+        else:
+            bot = StubBot(latency=latency)
+            for _ in range(iterations):
+                t0 = time.perf_counter()
+                await job(bot, today=today)
+                samples.append(time.perf_counter() - t0)
+            extra = {"telegram_calls": len(bot.sent) // iterations}
+        results.append(_summarize(name, "job", samples, **extra))
+    return results
+
+
+@asynccontextmanager
+async def _fake_telegram_bot(latency: float, flood_every: int):
+    """aiogram Bot wired to an in-process FakeTelegram on a loopback port."""
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiohttp.test_utils import TestServer
+
+    from bench.fake_telegram import FakeTelegram
+
+    fake = FakeTelegram(latency=latency, flood_every=flood_every)
+    server = TestServer(fake.app())
+    await server.start_server()
+    base = str(server.make_url("")).rstrip("/")
+    bot = Bot(BENCH_BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+    try:
+        yield bot, fake
+    finally:
+        await bot.session.close()
+        await server.close()
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from bench.generate import generate
+    from bot.database import close_db as close_bot_db
+    from webapp.db import close_db as close_web_db
+
+    try:
+        t0 = time.perf_counter()
+        dataset = await generate(args.families, args.children, args.weeks, args.seed)
+        dataset["generate_s"] = round(time.perf_counter() - t0, 3)
+        results = await bench_endpoints(args.iterations, args.warmup, args.check_budgets)
+        results += await bench_jobs(
+            args.job_iterations,
+            args.telegram_latency_ms / 1000,
+            fake_telegram=args.fake_telegram,
+            flood_every=args.flood_every,
+        )
+    finally:
+        await close_bot_db()
+        await close_web_db()
+
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "job_iterations": args.job_iterations,
+            "telegram_latency_ms": args.telegram_latency_ms,
+            "fake_telegram": args.fake_telegram,
+            "flood_every": args.flood_every,
+        },
+        "dataset": dataset,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--families", type=int, default=50)
+    parser.add_argument("--children", type=int, default=3)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--job-iterations", type=int, default=3)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0)
+    parser.add_argument("--fake-telegram", action="store_true",
+                        help="run jobs with aiogram over HTTP against bench/fake_telegram.py")
+    parser.add_argument("--flood-every", type=int, default=0,
+                        help="with --fake-telegram: answer every Nth call with 429")
+    parser.add_argument("--check-budgets", action="store_true",
+                        help="fail if an endpoint runs more statements than its budget")
+    parser.add_argument("--db", help="database file to create (default: a temp file)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.db and os.path.exists(args.db):
+        parser.error(f"{args.db} exists — benchmarks need a fresh database")
+    tmp_dir = None if args.db else tempfile.TemporaryDirectory(prefix="alanbot-bench-")
+    db_path = args.db or os.path.join(tmp_dir.name, "bench.db")
+
+    # Must be set before bot.config is imported (it reads them at import time)
+    os.environ["DB_PATH"] = db_path
+    os.environ["BOT_TOKEN"] = BENCH_BOT_TOKEN
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""In-process stand-in for aiogram's Bot: records calls, optional latency."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+
+@dataclass
+class StubBot:
+    """Implements the Bot methods the scheduler jobs call."""
+
+    latency: float = 0.0
+    sent: list[tuple[str, int]] = field(default_factory=list)
+    _message_id: int = 0
+
+    async def _call(self, method: str, chat_id: int) -> SimpleNamespace:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.append((method, chat_id))
+        self._message_id += 1
+        return SimpleNamespace(message_id=self._message_id, chat=SimpleNamespace(id=chat_id))
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> SimpleNamespace:
+        return await self._call("sendMessage", chat_id)
+
+    async def send_photo(self, chat_id: int, photo, **kwargs) -> SimpleNamespace:
+        return await self._call("sendPhoto", chat_id)
+
+    async def send_video(self, chat_id: int, video, **kwargs) -> SimpleNamespace:
+        return await self._call("sendVideo", chat_id)
+
+    async def edit_message_caption(self, chat_id: int, message_id: int, **kwargs) -> SimpleNamespace:
+        return await self._call("editMessageCaption", chat_id)
@@ -0,0 +1,187 @@
+"""Bulk approve/reject of pending items, shared by the bot and the web app.
+
+`resolve_pending` applies every state change (completion/extra-task updates,
+ledger events, approval_messages cleanup) in one transaction with a single
+commit, and returns what was resolved so the caller can notify the child once
+and fix up the parents' approval messages. The text helpers keep those
+messages identical between the bot and the web app.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable
+
+import aiosqlite
+
+from . import ledger
+
+EDIT_CONCURRENCY = 8   # parallel editMessageCaption calls, well under Telegram's limits
+
+# edit(chat_id, message_id, caption) — bot.edit_message_caption or webapp.notify's
+CaptionEditor = Callable[[int, int, str], Awaitable[object]]
+
+
+async def resolve_pending(
+    db: aiosqlite.Connection,
+    family_id: int,
+    approve: bool,
+    items: list[tuple[str, int]] | None = None,
+    child_id: int | None = None,
+    day: str | None = None,
+) -> dict:
+    """Approve or reject pending items of a family in one transaction.
+
+    Selects either the given (type, id) items or everything pending for
+    child_id (on `day`, if given). Items resolved concurrently by someone else
+    are skipped. Returns {"items": [...], "messages": [...]}: the resolved rows
+    (type, id, child_id, child_name, telegram_id, date, label, points) and the
+    approval_messages that pointed at them (already deleted).
+    """
+    if items is not None:
+        task_ids = [i for t, i in items if t == "task"]
+        extra_ids = [i for t, i in items if t == "extra"]
+        task_filter = f"AND c.id IN ({','.join('?' * len(task_ids)) or 'NULL'})"
+        extra_filter = f"AND e.id IN ({','.join('?' * len(extra_ids)) or 'NULL'})"
+        params = [family_id, *task_ids, family_id, *extra_ids]
+    else:
+        scope = [child_id] if day is None else [child_id, day]
+        task_filter = "AND c.child_id = ?" + ("" if day is None else " AND c.date = ?")
+        extra_filter = "AND e.child_id = ?" + ("" if day is None else " AND e.date = ?")
+        params = [family_id, *scope, family_id, *scope]
+
+    rows = await db.execute_fetchall(
+        f"""SELECT 'task' AS type, c.id, c.child_id, u.name AS child_name, u.telegram_id,
+                   c.date, c.task_key, COALESCE(ct.label, c.task_key) AS label, NULL AS points
+            FROM completions c
+            JOIN users u ON u.id = c.child_id
+            LEFT JOIN child_tasks ct ON ct.child_id = c.child_id AND ct.task_key = c.task_key
+            WHERE u.family_id = ? AND c.approved = 0 {task_filter}
+            UNION ALL
+            SELECT 'extra', e.id, e.child_id, u.name, u.telegram_id,
+                   e.date, NULL, e.title, e.points
+            FROM extra_tasks e
+            JOIN users u ON u.id = e.child_id
+            WHERE e.family_id = ? AND e.completed = 1 AND e.approved = 0 {extra_filter}
+            ORDER BY 1 DESC, 2""",
+        params,
+    )
+    if not rows:
+        return {"items": [], "messages": []}
+
+    resolved: list[dict] = []
+    try:
+        for r in rows:
+            item = dict(r)
+            if await _apply(db, item, approve):
+                resolved.append(item)
+        messages: list[dict] = []
+        if resolved:
+            where = " OR ".join(["(approval_type = ? AND approval_id = ?)"] * len(resolved))
+            keys = [v for item in resolved for v in (item["type"], item["id"])]
+            messages = [
+                dict(m) for m in await db.execute_fetchall(
+                    f"""SELECT approval_type, approval_id, chat_id, message_id
+                        FROM approval_messages WHERE {where}""",
+                    keys,
+                )
+            ]
+            await db.execute(f"DELETE FROM approval_messages WHERE {where}", keys)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return {"items": resolved, "messages": messages}
+
+
+async def _apply(db: aiosqlite.Connection, item: dict, approve: bool) -> bool:
+    """One item's update and ledger event; False if it was no longer pending."""
+    if item["type"] == "task":
+        if approve:
+            sql = "UPDATE completions SET approved = 1 WHERE id = ? AND approved = 0"
+        else:
+            sql = "DELETE FROM completions WHERE id = ? AND approved = 0"
+    elif approve:
+        sql = "UPDATE extra_tasks SET approved = 1 WHERE id = ? AND completed = 1 AND approved = 0"
+    else:
+        sql = """UPDATE extra_tasks SET completed = 0, photo_file_id = NULL, approved = 0
+                 WHERE id = ? AND completed = 1 AND approved = 0"""
+    cursor = await db.execute(sql, (item["id"],))
+    if not cursor.rowcount:
+        return False
+    # Rejecting a pending item changes no score, so only approvals hit the ledger
+    if approve:
+        await ledger.record_change(
+            db, item["child_id"], item["date"], item["type"], True, "approve",
+            ref_id=item["id"], task_key=item["task_key"], points=item["points"] or 0,
+        )
+    return True
+
+
+# ── Messages ──
+
+
+def item_caption(item: dict, approve: bool) -> str:
+    """Parent-side caption once the item is resolved (same as the single-item flow)."""
+    if approve:
+        points = f" (+{item['points']} б.)" if item["type"] == "extra" else ""
+        return f"✅ Одобрено: {item['child_name']} — <b>{item['label']}</b>{points}"
+    return f"❌ Отклонено: {item['child_name']} — <b>{item['label']}</b>"
+
+
+def child_summary(items: list[dict], approve: bool) -> str:
+    """One message to the child listing everything resolved for them."""
+    if len(items) == 1:
+        item = items[0]
+        if item["type"] == "extra":
+            if approve:
+                return f"✅ Доп. задание «{item['label']}» одобрено родителем! (+{item['points']} б.)"
+            return f"❌ Доп. задание «{item['label']}» отклонено. Попробуй выполнить снова!"
+        if approve:
+            return f"✅ Задача «{item['label']}» одобрена родителем!"
+        return f"❌ Задача «{item['label']}» отклонена. Попробуй выполнить снова!"
+
+    lines = [
+        f"• {item['label']}" + (f" (+{item['points']} б.)" if approve and item["type"] == "extra" else "")
+        for item in items
+    ]
+    if approve:
+        header = f"✅ Родитель одобрил {len(items)} задач(и):"
+    else:
+        header = f"❌ Родитель отклонил {len(items)} задач(и) — попробуй выполнить снова:"
+    return "\n".join([header, *lines])
+
+
+def by_child(items: list[dict]) -> dict[int, list[dict]]:
+    """Resolved items grouped by child telegram_id, in resolve order."""
+    grouped: dict[int, list[dict]] = {}
+    for item in items:
+        grouped.setdefault(item["telegram_id"], []).append(item)
+    return grouped
+
+
+async def edit_captions(
+    edit: CaptionEditor,
+    messages: list[dict],
+    captions: dict[tuple[str, int], str],
+    skip_chat_id: int = 0,
+) -> None:
+    """Edit approval messages concurrently; failures (message gone, too old) are ignored.
+
+    `captions` maps (approval_type, approval_id) to the new caption.
+    """
+    semaphore = asyncio.Semaphore(EDIT_CONCURRENCY)
+
+    async def edit_one(msg: dict) -> None:
+        async with semaphore:
+            try:
+                await edit(
+                    msg["chat_id"], msg["message_id"],
+                    captions[(msg["approval_type"], msg["approval_id"])],
+                )
+            except Exception:
+                pass
+
+    await asyncio.gather(
+        *(edit_one(m) for m in messages if m["chat_id"] != skip_chat_id)
+    )
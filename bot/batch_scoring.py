@@ -0,0 +1,174 @@
+"""Vectorized weekly scoring for many children at once — no DB or I/O.
+
+Mirrors calculate_daily_points / calculate_weekly_result in scoring.py over a
+boolean children × days × tasks matrix; results must match them exactly.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .scoring import tier_table
+from .tasks_config import (
+    POINTS_PER_TASK,
+    SHOWER_KEY,
+    SUNDAY_PENALTY,
+    TaskDef,
+)
+
+
+@dataclass(frozen=True)
+class ChildWeekInput:
+    """One child's week, in the same shape the pure scoring functions take."""
+
+    child_id: int
+    daily_completed: dict[str, set[str]]
+    sunday_done: bool
+    daily_tasks: tuple[TaskDef, ...]
+    shower_required: bool = True
+    extra_points_per_day: dict[str, int] | None = None
+    max_weekly_points: int | None = None
+
+
+@dataclass
+class WeeklyBatch:
+    child_ids: list[int]
+    days: list[str]
+    task_keys: list[str]
+    completed: np.ndarray        # bool (children, days, tasks)
+    enabled: np.ndarray          # bool (children, tasks) — daily tasks that score
+    shower_required: np.ndarray  # bool (children,)
+    sunday_done: np.ndarray      # bool (children,)
+    extra: np.ndarray            # int  (children, days)
+    max_weekly_points: np.ndarray  # int (children,)
+
+
+@dataclass
+class WeeklyBatchResult:
+    child_ids: list[int]
+    days: list[str]
+    daily_points: np.ndarray   # int (children, days)
+    subtotal: np.ndarray       # int (children,)
+    extra_total: np.ndarray
+    penalty: np.ndarray
+    total: np.ndarray
+    money_percent: np.ndarray
+
+    def weekly_result(self, i: int) -> dict:
+        """Row i in the dict format returned by calculate_weekly_result."""
+        return {
+            "daily_points": {
+                day: int(self.daily_points[i, j]) for j, day in enumerate(self.days)
+            },
+            "subtotal": int(self.subtotal[i]),
+            "extra_total": int(self.extra_total[i]),
+            "penalty": int(self.penalty[i]),
+            "total": int(self.total[i]),
+            "money_percent": int(self.money_percent[i]),
+        }
+
+    def by_child(self) -> dict[int, dict]:
+        return {cid: self.weekly_result(i) for i, cid in enumerate(self.child_ids)}
+
+
+def build_weekly_batch(children: list[ChildWeekInput], days: list[str]) -> WeeklyBatch:
+    """Pack per-child inputs into dense arrays over the union of task keys."""
+    key_index: dict[str, int] = {}
+    for child in children:
+        for t in child.daily_tasks:
+            key_index.setdefault(t.key, len(key_index))
+        for keys in child.daily_completed.values():
+            for key in keys:
+                key_index.setdefault(key, len(key_index))
+    key_index.setdefault(SHOWER_KEY, len(key_index))
+    day_index = {d: j for j, d in enumerate(days)}
+
+    n_c, n_d, n_t = len(children), len(days), len(key_index)
+    completed = np.zeros((n_c, n_d, n_t), dtype=bool)
+    enabled = np.zeros((n_c, n_t), dtype=bool)
+    extra = np.zeros((n_c, n_d), dtype=np.int64)
+    shower_required = np.zeros(n_c, dtype=bool)
+    sunday_done = np.zeros(n_c, dtype=bool)
+    max_weekly = np.zeros(n_c, dtype=np.int64)
+
+    for i, child in enumerate(children):
+        for t in child.daily_tasks:
+            enabled[i, key_index[t.key]] = True
+        for day, keys in child.daily_completed.items():
+            j = day_index.get(day)
+            if j is None:
+                continue
+            for key in keys:
+                completed[i, j, key_index[key]] = True
+        for day, pts in (child.extra_points_per_day or {}).items():
+            j = day_index.get(day)
+            if j is not None:
+                extra[i, j] = pts
+        shower_required[i] = child.shower_required
+        sunday_done[i] = child.sunday_done
+        max_weekly[i] = (
+            child.max_weekly_points
+            if child.max_weekly_points is not None
+            else len(child.daily_tasks) * 7
+        )
+
+    return WeeklyBatch(
+        child_ids=[c.child_id for c in children],
+        days=list(days),
+        task_keys=list(key_index),
+        completed=completed,
+        enabled=enabled,
+        shower_required=shower_required,
+        sunday_done=sunday_done,
+        extra=extra,
+        max_weekly_points=max_weekly,
+    )
+
+
+def money_percentage_array(total: np.ndarray, max_weekly_points: np.ndarray) -> np.ndarray:
+    """Vectorized get_money_percentage via one TierTable per distinct max."""
+    pct = np.zeros(total.shape, dtype=np.int64)
+    for max_pts in np.unique(max_weekly_points):
+        table = tier_table(int(max_pts))
+        rows = max_weekly_points == max_pts
+        idx = np.clip(total[rows], 0, table.top)
+        pct[rows] = np.asarray(table.percents, dtype=np.int64)[idx]
+    return pct
+
+
+def score_weekly_batch(batch: WeeklyBatch) -> WeeklyBatchResult:
+    done = batch.completed & batch.enabled[:, None, :]
+    base = done.sum(axis=2, dtype=np.int64) * POINTS_PER_TASK
+
+    shower_col = batch.task_keys.index(SHOWER_KEY)
+    shower_done = batch.completed[:, :, shower_col]
+    gate = shower_done | ~batch.shower_required[:, None]
+    daily_points = np.where(gate, base, 0)
+
+    subtotal = daily_points.sum(axis=1)
+    extra_total = batch.extra.sum(axis=1)
+    penalty = np.where(batch.sunday_done, 0, SUNDAY_PENALTY)
+    total = np.maximum(subtotal + extra_total - penalty, 0)
+    money_percent = np.minimum(
+        money_percentage_array(total, batch.max_weekly_points), 100
+    )
+
+    return WeeklyBatchResult(
+        child_ids=batch.child_ids,
+        days=batch.days,
+        daily_points=daily_points,
+        subtotal=subtotal,
+        extra_total=extra_total,
+        penalty=penalty,
+        total=total,
+        money_percent=money_percent,
+    )
+
+
+def score_weeks(children: list[ChildWeekInput], days: list[str]) -> dict[int, dict]:
+    """Convenience: {child_id: calculate_weekly_result-style dict} for all children."""
+    if not children:
+        return {}
+    return score_weekly_batch(build_weekly_batch(children, days)).by_child()
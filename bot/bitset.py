@@ -0,0 +1,63 @@
+"""Bitmask encoding of a child's per-day completion state — no DB or I/O.
+
+Each child_tasks row owns bit `sort_order`, which is unique per child and never
+changes for an existing task, so a day's state fits in one int.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from .tasks_config import POINTS_PER_TASK, SHOWER_KEY, SUNDAY_TASK
+
+
+class TaskBits:
+    """Stable task_key → bit mapping for one child's enabled task list."""
+
+    __slots__ = ("bit_of", "daily_mask", "shower_bit", "sunday_bit")
+
+    def __init__(self, rows: Iterable[dict]) -> None:
+        self.bit_of: dict[str, int] = {}
+        self.daily_mask = 0
+        for r in rows:
+            bit = 1 << r["sort_order"]
+            self.bit_of[r["task_key"]] = bit
+            if r["task_group"] != "sunday":
+                self.daily_mask |= bit
+        self.shower_bit = self.bit_of.get(SHOWER_KEY, 0)
+        self.sunday_bit = self.bit_of.get(SUNDAY_TASK.key, 0)
+
+    @property
+    def daily_count(self) -> int:
+        return self.daily_mask.bit_count()
+
+    @property
+    def shower_required(self) -> bool:
+        return self.shower_bit != 0
+
+    def encode(self, keys: Iterable[str]) -> int:
+        """Keys not in the child's enabled list (disabled/removed) are dropped."""
+        mask = 0
+        for key in keys:
+            mask |= self.bit_of.get(key, 0)
+        return mask
+
+    def decode(self, mask: int) -> set[str]:
+        return {key for key, bit in self.bit_of.items() if mask & bit}
+
+    def daily_points(self, done_mask: int, shower_required: bool | None = None) -> int:
+        """Mask form of calculate_daily_points (shower gate + popcount)."""
+        if shower_required is None:
+            shower_required = self.shower_required
+        if shower_required and not done_mask & self.shower_bit:
+            return 0
+        return (done_mask & self.daily_mask).bit_count() * POINTS_PER_TASK
+
+    def done_count(self, done_mask: int) -> int:
+        return (done_mask & self.daily_mask).bit_count()
+
+    def remaining_count(self, done_mask: int) -> int:
+        return (self.daily_mask & ~done_mask).bit_count()
+
+    def sunday_done(self, done_mask: int) -> bool:
+        return bool(self.sunday_bit and done_mask & self.sunday_bit)
@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
+# Bot API server root — point at a local Bot API server or bench/fake_telegram.py
+TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
 TIMEZONE: str = os.getenv("TIMEZONE", "Asia/Almaty")
 MORNING_HOUR: int = int(os.getenv("MORNING_HOUR", "7"))
 MORNING_MINUTE: int = int(os.getenv("MORNING_MINUTE", "0"))
@@ -14,8 +16,24 @@ REMINDER_HOURS: list[int] = [
 ]
 DEADLINE_HOUR: int = int(os.getenv("DEADLINE_HOUR", "22"))
 PARENT_PASSWORD: str = os.getenv("PARENT_PASSWORD", "1234")
+# Telegram ids allowed to read admin metrics endpoints (comma-separated)
+ADMIN_TELEGRAM_IDS: set[int] = {
+    int(x) for x in os.getenv("ADMIN_TELEGRAM_IDS", "").split(",") if x.strip()
+}
+LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+# Log per-operation DB statement counts (bot.db_stats at DEBUG) at any LOG_LEVEL
+DB_STATS_LOG: bool = os.getenv("DB_STATS_LOG", "").lower() in ("1", "true", "yes")
+# Statements slower than this are logged (bot.db_stats.slow) with redacted params
+SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Event-loop blocks longer than this are logged with the blocking stack
+LOOP_STALL_MS: float = float(os.getenv("LOOP_STALL_MS", "100"))
+# Scheduler leader lease (seconds) — a standby replica takes over after expiry
+LEADER_LEASE_TTL: int = int(os.getenv("LEADER_LEASE_TTL", "15"))
+# Disk budget (MB) for Telegram media cached by the web app's /api/media proxy
+MEDIA_CACHE_MB: int = int(os.getenv("MEDIA_CACHE_MB", "512"))
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
-DB_PATH = DATA_DIR / "bot.db"
+# Overridable so tools (bench/) can work on a throwaway database
+DB_PATH = Path(os.getenv("DB_PATH", str(DATA_DIR / "bot.db")))
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import asyncio
 import random
 import string
+import time
 from datetime import date, datetime, timedelta
+from typing import Callable
 
 import aiosqlite
 
+from . import approvals, ledger, media_store
+from .bitset import TaskBits
 from .config import DB_PATH
+from .db_stats import instrument
 from .tasks_config import DAILY_TASKS, SUNDAY_TASK
 
 _db: aiosqlite.Connection | None = None
@@ -15,10 +21,11 @@ _db: aiosqlite.Connection | None = None
 async def get_db() -> aiosqlite.Connection:
     global _db
     if _db is None:
-        _db = await aiosqlite.connect(DB_PATH)
+        _db = instrument(await aiosqlite.connect(DB_PATH))
         _db.row_factory = aiosqlite.Row
         await _db.execute("PRAGMA journal_mode=WAL")
         await _db.execute("PRAGMA foreign_keys = ON")
+        await _db.execute("PRAGMA recursive_triggers = ON")  # media refcounts
     return _db
 
 
@@ -72,7 +79,8 @@ async def init_db() -> None:
             completed INTEGER NOT NULL DEFAULT 0,
             photo_file_id TEXT,
             approved INTEGER NOT NULL DEFAULT 0,
-            media_type TEXT DEFAULT 'photo'
+            media_type TEXT DEFAULT 'photo',
+            submissions INTEGER NOT NULL DEFAULT 0
         );
 
         CREATE TABLE IF NOT EXISTS completions (
@@ -106,6 +114,38 @@ async def init_db() -> None:
             sort_order INTEGER NOT NULL DEFAULT 0,
             UNIQUE(child_id, task_key)
         );
+
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            finished_at TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            recipients INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            db_ms REAL NOT NULL DEFAULT 0,
+            telegram_ms REAL NOT NULL DEFAULT 0,
+            p50_ms REAL NOT NULL DEFAULT 0,
+            p95_ms REAL NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS leader_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS loop_lag (
+            instance TEXT PRIMARY KEY,
+            process TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            samples INTEGER NOT NULL DEFAULT 0,
+            p50_ms REAL NOT NULL DEFAULT 0,
+            p95_ms REAL NOT NULL DEFAULT 0,
+            p99_ms REAL NOT NULL DEFAULT 0,
+            max_ms REAL NOT NULL DEFAULT 0,
+            stalls INTEGER NOT NULL DEFAULT 0
+        );
         """
     )
 
@@ -116,6 +156,7 @@ async def init_db() -> None:
         CREATE INDEX IF NOT EXISTS idx_completions_child_date_approved ON completions(child_id, date, approved);
         CREATE INDEX IF NOT EXISTS idx_extra_tasks_child_date ON extra_tasks(child_id, date);
         CREATE INDEX IF NOT EXISTS idx_extra_tasks_family ON extra_tasks(family_id);
+        CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs(job, id);
         """
     )
 
@@ -132,6 +173,30 @@ async def init_db() -> None:
                 f"ALTER TABLE {table} ADD COLUMN media_type TEXT DEFAULT 'photo'"
             )
 
+    # Migration: resubmission counter of extra tasks (versions queued parent notifications)
+    cols = await db.execute_fetchall("PRAGMA table_info(extra_tasks)")
+    if "submissions" not in {c["name"] for c in cols}:
+        await db.execute(
+            "ALTER TABLE extra_tasks ADD COLUMN submissions INTEGER NOT NULL DEFAULT 0"
+        )
+
+    # Migration: per-family timezone and schedule (NULL = global config default)
+    cols = await db.execute_fetchall("PRAGMA table_info(families)")
+    col_names = {c["name"] for c in cols}
+    for col, col_type in (
+        ("timezone", "TEXT"),
+        ("morning_hour", "INTEGER"),
+        ("morning_minute", "INTEGER"),
+        ("reminder_hours", "TEXT"),
+        ("deadline_hour", "INTEGER"),
+    ):
+        if col not in col_names:
+            await db.execute(f"ALTER TABLE families ADD COLUMN {col} {col_type}")
+
+    # Score ledger: on first creation, seed it from the already-approved items
+    await ledger.init_ledger(db)
+    await media_store.init_media_store(db)
+
     await db.commit()
 
 
@@ -172,6 +237,44 @@ async def get_family_invite_code(family_id: int) -> str | None:
     return None
 
 
+async def get_family(family_id: int) -> dict | None:
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        "SELECT * FROM families WHERE id = ?", (family_id,)
+    )
+    if rows:
+        return dict(rows[0])
+    return None
+
+
+async def set_family_schedule(
+    family_id: int,
+    timezone: str | None = None,
+    morning_hour: int | None = None,
+    morning_minute: int | None = None,
+    reminder_hours: str | None = None,
+    deadline_hour: int | None = None,
+) -> None:
+    """Update schedule columns that are not None (other columns are left as is)."""
+    updates = {
+        "timezone": timezone,
+        "morning_hour": morning_hour,
+        "morning_minute": morning_minute,
+        "reminder_hours": reminder_hours,
+        "deadline_hour": deadline_hour,
+    }
+    updates = {k: v for k, v in updates.items() if v is not None}
+    if not updates:
+        return
+    db = await get_db()
+    assignments = ", ".join(f"{col} = ?" for col in updates)
+    await db.execute(
+        f"UPDATE families SET {assignments} WHERE id = ?",
+        (*updates.values(), family_id),
+    )
+    await db.commit()
+
+
 # ── Users ─────────────────────────────────────────────────
 
 
@@ -235,22 +338,33 @@ async def complete_task(
 ) -> int:
     """Insert a completion record (pending approval). Returns the completion id."""
     db = await get_db()
+    was_approved = await is_task_completed(child_id, task_key, today)
     cursor = await db.execute(
         """INSERT OR REPLACE INTO completions
            (child_id, task_key, date, photo_file_id, media_type, approved)
            VALUES (?, ?, ?, ?, ?, 0)""",
         (child_id, task_key, today, photo_file_id, media_type),
     )
+    if was_approved:
+        await ledger.record_change(
+            db, child_id, today, "task", False, "resubmit",
+            ref_id=cursor.lastrowid, task_key=task_key,
+        )
     await db.commit()
     return cursor.lastrowid
 
 
 async def uncomplete_task(child_id: int, task_key: str, today: str) -> None:
     db = await get_db()
+    was_approved = await is_task_completed(child_id, task_key, today)
     await db.execute(
         "DELETE FROM completions WHERE child_id = ? AND task_key = ? AND date = ?",
         (child_id, task_key, today),
     )
+    if was_approved:
+        await ledger.record_change(
+            db, child_id, today, "task", False, "uncomplete", task_key=task_key
+        )
     await db.commit()
 
 
@@ -307,6 +421,73 @@ async def get_completed_keys_for_range(
     return result
 
 
+async def any_activity_before(child_ids: list[int], day: str) -> bool:
+    """Any completion or extra task of these children dated before `day`."""
+    if not child_ids:
+        return False
+    db = await get_db()
+    placeholders = ",".join("?" * len(child_ids))
+    rows = await db.execute_fetchall(
+        f"""SELECT EXISTS(SELECT 1 FROM completions
+                          WHERE child_id IN ({placeholders}) AND date < ?)
+               OR EXISTS(SELECT 1 FROM extra_tasks
+                          WHERE child_id IN ({placeholders}) AND date < ?) AS found""",
+        (*child_ids, day, *child_ids, day),
+    )
+    return bool(rows[0]["found"])
+
+
+async def get_completed_keys_for_children_range(
+    child_ids: list[int], start: str, end: str
+) -> dict[int, dict[str, set[str]]]:
+    """Batch form of get_completed_keys_for_range: {child_id: {date: keys}}."""
+    if not child_ids:
+        return {}
+    db = await get_db()
+    placeholders = ",".join("?" * len(child_ids))
+    rows = await db.execute_fetchall(
+        f"""SELECT child_id, task_key, date FROM completions
+            WHERE child_id IN ({placeholders}) AND date BETWEEN ? AND ? AND approved = 1""",
+        (*child_ids, start, end),
+    )
+    result: dict[int, dict[str, set[str]]] = {cid: {} for cid in child_ids}
+    for r in rows:
+        result[r["child_id"]].setdefault(r["date"], set()).add(r["task_key"])
+    return result
+
+
+async def get_day_masks(child_id: int, day: str, bits: TaskBits) -> tuple[int, int]:
+    """Return (approved_mask, pending_mask) for a date in one query."""
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        "SELECT task_key, approved FROM completions WHERE child_id = ? AND date = ?",
+        (child_id, day),
+    )
+    done = pending = 0
+    for r in rows:
+        bit = bits.bit_of.get(r["task_key"], 0)
+        if r["approved"]:
+            done |= bit
+        else:
+            pending |= bit
+    return done, pending
+
+
+async def get_done_masks_for_range(
+    child_id: int, start: str, end: str, bits: TaskBits
+) -> dict[str, int]:
+    """Return {date_str: approved_mask} for the given range."""
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        "SELECT task_key, date FROM completions WHERE child_id = ? AND date BETWEEN ? AND ? AND approved = 1",
+        (child_id, start, end),
+    )
+    result: dict[str, int] = {}
+    for r in rows:
+        result[r["date"]] = result.get(r["date"], 0) | bits.bit_of.get(r["task_key"], 0)
+    return result
+
+
 async def get_completion_by_id(completion_id: int) -> dict | None:
     db = await get_db()
     rows = await db.execute_fetchall(
@@ -319,17 +500,29 @@ async def get_completion_by_id(completion_id: int) -> dict | None:
 
 async def approve_task(completion_id: int) -> None:
     db = await get_db()
+    row = await get_completion_by_id(completion_id)
     await db.execute(
         "UPDATE completions SET approved = 1 WHERE id = ?", (completion_id,)
     )
+    if row and not row["approved"]:
+        await ledger.record_change(
+            db, row["child_id"], row["date"], "task", True, "approve",
+            ref_id=completion_id, task_key=row["task_key"],
+        )
     await db.commit()
 
 
 async def reject_task(completion_id: int) -> None:
     db = await get_db()
+    row = await get_completion_by_id(completion_id)
     await db.execute(
         "DELETE FROM completions WHERE id = ?", (completion_id,)
     )
+    if row and row["approved"]:
+        await ledger.record_change(
+            db, row["child_id"], row["date"], "task", False, "reject",
+            ref_id=completion_id, task_key=row["task_key"],
+        )
     await db.execute(
         "DELETE FROM approval_messages WHERE approval_type = 'task' AND approval_id = ?",
         (completion_id,),
@@ -404,36 +597,49 @@ async def complete_extra_task(
 ) -> None:
     """Mark extra task as completed (pending approval)."""
     db = await get_db()
+    row = await get_extra_task(task_id)
     await db.execute(
-        "UPDATE extra_tasks SET completed = 1, photo_file_id = ?, media_type = ?, approved = 0 WHERE id = ?",
+        """UPDATE extra_tasks SET completed = 1, photo_file_id = ?, media_type = ?, approved = 0,
+           submissions = submissions + 1 WHERE id = ?""",
         (photo_file_id, media_type, task_id),
     )
+    await _record_extra_unapproved(db, row, "resubmit")
     await db.commit()
 
 
 async def uncomplete_extra_task(task_id: int) -> None:
     db = await get_db()
+    row = await get_extra_task(task_id)
     await db.execute(
         "UPDATE extra_tasks SET completed = 0, photo_file_id = NULL, approved = 0 WHERE id = ?",
         (task_id,),
     )
+    await _record_extra_unapproved(db, row, "uncomplete")
     await db.commit()
 
 
 async def approve_extra_task(task_id: int) -> None:
     db = await get_db()
+    row = await get_extra_task(task_id)
     await db.execute(
         "UPDATE extra_tasks SET approved = 1 WHERE id = ?", (task_id,)
     )
+    if row and row["completed"] and not row["approved"]:
+        await ledger.record_change(
+            db, row["child_id"], row["date"], "extra", True, "approve",
+            ref_id=task_id, points=row["points"],
+        )
     await db.commit()
 
 
 async def reject_extra_task(task_id: int) -> None:
     db = await get_db()
+    row = await get_extra_task(task_id)
     await db.execute(
         "UPDATE extra_tasks SET completed = 0, photo_file_id = NULL, approved = 0 WHERE id = ?",
         (task_id,),
     )
+    await _record_extra_unapproved(db, row, "reject")
     await db.execute(
         "DELETE FROM approval_messages WHERE approval_type = 'extra' AND approval_id = ?",
         (task_id,),
@@ -441,6 +647,17 @@ async def reject_extra_task(task_id: int) -> None:
     await db.commit()
 
 
+async def _record_extra_unapproved(
+    db: aiosqlite.Connection, row: dict | None, action: str
+) -> None:
+    """Ledger event if the extra task (row fetched before the update) had counted."""
+    if row and row["completed"] and row["approved"]:
+        await ledger.record_change(
+            db, row["child_id"], row["date"], "extra", False, action,
+            ref_id=row["id"], points=row["points"],
+        )
+
+
 async def get_extra_points_for_range(
     child_id: int, start: str, end: str
 ) -> dict[str, int]:
@@ -455,6 +672,33 @@ async def get_extra_points_for_range(
     return {r["date"]: r["pts"] for r in rows}
 
 
+async def get_extra_points_for_children_range(
+    child_ids: list[int], start: str, end: str
+) -> dict[int, dict[str, int]]:
+    """Batch form of get_extra_points_for_range: {child_id: {date: points}}."""
+    if not child_ids:
+        return {}
+    db = await get_db()
+    placeholders = ",".join("?" * len(child_ids))
+    rows = await db.execute_fetchall(
+        f"""SELECT child_id, date, SUM(points) as pts FROM extra_tasks
+            WHERE child_id IN ({placeholders}) AND date BETWEEN ? AND ?
+              AND completed = 1 AND approved = 1
+            GROUP BY child_id, date""",
+        (*child_ids, start, end),
+    )
+    result: dict[int, dict[str, int]] = {cid: {} for cid in child_ids}
+    for r in rows:
+        result[r["child_id"]][r["date"]] = r["pts"]
+    return result
+
+
+async def get_score_totals(child_id: int, day: str) -> dict:
+    """Running day/week totals from the score ledger (two primary-key reads)."""
+    db = await get_db()
+    return await ledger.get_score_totals(db, child_id, day)
+
+
 async def get_extra_points_for_date(child_id: int, day: str) -> int:
     """Return total extra points for APPROVED extra tasks on a given date."""
     db = await get_db()
@@ -503,6 +747,27 @@ async def get_child_tasks(child_id: int) -> list[dict]:
     return [dict(r) for r in rows]
 
 
+async def get_children_tasks(child_ids: list[int]) -> dict[int, list[dict]]:
+    """Batch form of get_child_tasks: {child_id: enabled tasks by sort_order}."""
+    if not child_ids:
+        return {}
+    db = await get_db()
+    placeholders = ",".join("?" * len(child_ids))
+    rows = await db.execute_fetchall(
+        f"""SELECT * FROM child_tasks WHERE child_id IN ({placeholders}) AND enabled = 1
+            ORDER BY child_id, sort_order""",
+        tuple(child_ids),
+    )
+    result: dict[int, list[dict]] = {cid: [] for cid in child_ids}
+    for r in rows:
+        result[r["child_id"]].append(dict(r))
+    # Children that were never initialized get the standard set lazily
+    for cid, tasks in result.items():
+        if not tasks:
+            result[cid] = await get_child_tasks(cid)
+    return result
+
+
 async def get_child_all_tasks(child_id: int) -> list[dict]:
     """Return all tasks (including disabled) for management UI."""
     await ensure_child_tasks_initialized(child_id)
@@ -520,6 +785,7 @@ async def toggle_child_task(child_id: int, task_key: str, enabled: bool) -> None
         "UPDATE child_tasks SET enabled = ? WHERE child_id = ? AND task_key = ?",
         (int(enabled), child_id, task_key),
     )
+    await ledger.rebuild_ledger(db, child_id)
     await db.commit()
 
 
@@ -552,6 +818,7 @@ async def remove_custom_child_task(child_id: int, task_key: str) -> None:
         "DELETE FROM child_tasks WHERE child_id = ? AND task_key = ? AND is_standard = 0",
         (child_id, task_key),
     )
+    await ledger.rebuild_ledger(db, child_id)
     await db.commit()
 
 
@@ -561,6 +828,8 @@ async def reset_child_tasks(child_id: int) -> None:
     await db.execute("DELETE FROM child_tasks WHERE child_id = ?", (child_id,))
     await db.commit()
     await initialize_child_tasks(child_id)
+    await ledger.rebuild_ledger(db, child_id)
+    await db.commit()
 
 
 async def save_approval_message(
@@ -574,6 +843,18 @@ async def save_approval_message(
     await db.commit()
 
 
+async def resolve_pending_approvals(
+    family_id: int,
+    approve: bool,
+    items: list[tuple[str, int]] | None = None,
+    child_id: int | None = None,
+    day: str | None = None,
+) -> dict:
+    """Approve/reject many pending items in one transaction (bot.approvals)."""
+    db = await get_db()
+    return await approvals.resolve_pending(db, family_id, approve, items, child_id, day)
+
+
 async def get_approval_messages(approval_type: str, approval_id: int) -> list[dict]:
     db = await get_db()
     rows = await db.execute_fetchall(
@@ -592,6 +873,126 @@ async def delete_approval_messages(approval_type: str, approval_id: int) -> None
     await db.commit()
 
 
+# ── Media store garbage collection ──────────────────────
+
+
+async def collect_media_garbage() -> list[str]:
+    """Forget media unreferenced past the grace period; returns paths to delete."""
+    db = await get_db()
+    paths = await media_store.collect_garbage(db)
+    await db.commit()
+    return paths
+
+
+async def delete_collected_media(paths: list[str], unlink: Callable[[list[str]], None]) -> list[str]:
+    """Run `unlink` (in a thread) on the collected paths no upload has claimed again.
+
+    A new upload of the same bytes registers the path anew after
+    collect_media_garbage forgot it. The check and the unlink share one
+    write transaction on a connection of their own, so the web app's
+    register_media waits for them: a path it registers either shows up here
+    and is kept, or is registered after its old file is gone (the upload then
+    writes the file again). Returns the paths unlinked.
+    """
+    if not paths:
+        return []
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        rows = await db.execute_fetchall(
+            f"SELECT path FROM media WHERE path IN ({','.join('?' * len(paths))})", paths
+        )
+        reclaimed = {r[0] for r in rows}
+        doomed = [p for p in paths if p not in reclaimed]
+        try:
+            await asyncio.to_thread(unlink, doomed)
+        finally:
+            await db.commit()
+    return doomed
+
+
+# ── Scheduler job metrics ─────────────────────────────
+
+JOB_RUNS_KEEP = 1000
+
+
+async def save_job_run(run: dict) -> None:
+    """Persist one job run summary (see bot.metrics.JobRun.summary)."""
+    db = await get_db()
+    await db.execute(
+        """INSERT INTO job_runs
+           (job, started_at, finished_at, duration_ms, recipients, errors,
+            db_ms, telegram_ms, p50_ms, p95_ms)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            run["job"], run["started_at"], run["finished_at"], run["duration_ms"],
+            run["recipients"], run["errors"], run["db_ms"], run["telegram_ms"],
+            run["p50_ms"], run["p95_ms"],
+        ),
+    )
+    # Keep the table small: only the most recent runs are retained
+    await db.execute(
+        "DELETE FROM job_runs WHERE id <= (SELECT MAX(id) FROM job_runs) - ?",
+        (JOB_RUNS_KEEP,),
+    )
+    await db.commit()
+
+
+# ── Event-loop lag reports (bot process → web app /metrics) ──
+
+LOOP_LAG_MAX_AGE = 600   # seconds; rows of stopped processes are dropped after this
+
+
+async def save_loop_lag(summary: dict) -> None:
+    """Upsert one process's bot.loop_monitor.LoopMonitor.summary()."""
+    db = await get_db()
+    now = time.time()
+    await db.execute(
+        """INSERT OR REPLACE INTO loop_lag
+           (instance, process, updated_at, samples, p50_ms, p95_ms, p99_ms, max_ms, stalls)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            summary["instance"], summary["process"], now, summary["samples"],
+            summary["p50_ms"], summary["p95_ms"], summary["p99_ms"],
+            summary["max_ms"], summary["stalls"],
+        ),
+    )
+    await db.execute("DELETE FROM loop_lag WHERE updated_at < ?", (now - LOOP_LAG_MAX_AGE,))
+    await db.commit()
+
+
+# ── Leader lease (one scheduler across replicas) ────────
+
+
+async def acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    """Take or renew lease `name` for `holder`. Returns True if holder owns it.
+
+    The upsert only overwrites a row that is already ours or has expired, so
+    concurrent replicas cannot both win.
+    """
+    db = await get_db()
+    now = time.time()
+    await db.execute(
+        """INSERT INTO leader_leases (name, holder, expires_at) VALUES (?, ?, ?)
+           ON CONFLICT(name) DO UPDATE
+           SET holder = excluded.holder, expires_at = excluded.expires_at
+           WHERE leader_leases.holder = excluded.holder OR leader_leases.expires_at < ?""",
+        (name, holder, now + ttl, now),
+    )
+    await db.commit()
+    rows = await db.execute_fetchall(
+        "SELECT holder FROM leader_leases WHERE name = ?", (name,)
+    )
+    return bool(rows) and rows[0]["holder"] == holder
+
+
+async def release_lease(name: str, holder: str) -> None:
+    db = await get_db()
+    await db.execute(
+        "DELETE FROM leader_leases WHERE name = ? AND holder = ?", (name, holder)
+    )
+    await db.commit()
+
+
 async def delete_family(family_id: int) -> list[int]:
     """Delete family and all related data. Returns telegram_ids of all members."""
     db = await get_db()
@@ -618,6 +1019,7 @@ async def delete_family(family_id: int) -> list[int]:
             )
         await db.execute("DELETE FROM completions WHERE child_id = ?", (cid,))
         await db.execute("DELETE FROM child_tasks WHERE child_id = ?", (cid,))
+        await ledger.delete_child_ledger(db, cid)
     # Clean up approval_messages for extra tasks
     extra_rows = await db.execute_fetchall(
         "SELECT id FROM extra_tasks WHERE family_id = ?", (family_id,)
@@ -0,0 +1,250 @@
+"""Statement counting and timing for the DB layer (bot.database and webapp.db).
+
+`instrument(conn)` wraps a connection's execute methods so every statement is
+timed and reported. `db_operation(name)` attributes counts to one logical
+operation (an HTTP request, a bot update, a scheduler job) and logs them at
+DEBUG; `query_budget(n)` fails when a block runs more than n statements.
+
+Per process, statements are also grouped by normalized text into a timing
+histogram (`statement_stats()`), and anything slower than SLOW_QUERY_MS is
+logged to bot.db_stats.slow with parameter values redacted.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .config import DB_STATS_LOG, SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(f"{__name__}.slow")
+if DB_STATS_LOG:
+    # Per-operation counts in production without turning on DEBUG everywhere
+    logger.setLevel(logging.DEBUG)
+
+# Called as listener(sql, parameters, seconds) after every statement
+StatementListener = Callable[[str, Any, float], None]
+
+_listeners: list[StatementListener] = []
+
+_TRACED_METHODS = ("execute", "execute_fetchall", "executemany", "executescript", "execute_insert")
+
+
+def add_listener(listener: StatementListener) -> StatementListener:
+    """Subscribe to every statement executed on instrumented connections."""
+    _listeners.append(listener)
+    return listener
+
+
+def first_line(sql: str) -> str:
+    """Collapse whitespace of a statement for log lines."""
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+@dataclass
+class QueryStats:
+    name: str
+    queries: int = 0
+    seconds: float = 0.0
+    statements: list[str] = field(default_factory=list)
+
+    def add(self, sql: str, seconds: float) -> None:
+        self.queries += 1
+        self.seconds += seconds
+        self.statements.append(sql)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+_current_op: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar(
+    "db_operation", default=None
+)
+# Budgets count across tasks: a test's request is served in another task
+_budgets: list[QueryStats] = []
+
+
+def _record(sql: str, parameters: Any, seconds: float) -> None:
+    op = _current_op.get()
+    if op is not None:
+        op.add(sql, seconds)
+    for budget in _budgets:
+        budget.add(sql, seconds)
+    for listener in _listeners:
+        try:
+            listener(sql, parameters, seconds)
+        except Exception:
+            logger.exception("DB statement listener failed")
+
+
+def _traced(method):
+    @functools.wraps(method)
+    async def wrapper(sql: str, parameters: Any = None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            if parameters is None:
+                return await method(sql, *args, **kwargs)
+            return await method(sql, parameters, *args, **kwargs)
+        finally:
+            _record(sql, parameters, time.perf_counter() - start)
+
+    return wrapper
+
+
+def instrument(conn):
+    """Time every statement run through `conn` (an aiosqlite connection)."""
+    for name in _TRACED_METHODS:
+        setattr(conn, name, _traced(getattr(conn, name)))
+    return conn
+
+
+def current_operation() -> QueryStats | None:
+    return _current_op.get()
+
+
+@contextmanager
+def db_operation(name: str):
+    """Count statements of one logical operation; nested ones roll up into it."""
+    parent = _current_op.get()
+    stats = QueryStats(name)
+    token = _current_op.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_op.reset(token)
+        if parent is not None:
+            parent.queries += stats.queries
+            parent.seconds += stats.seconds
+            parent.statements += stats.statements
+        elif stats.queries:
+            logger.debug(
+                "%s: %d queries, %.1f ms in DB", name, stats.queries, stats.seconds * 1000
+            )
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "block"):
+    """Raise QueryBudgetExceeded if more than max_queries statements run inside.
+
+    Counts every instrumented statement while active, from any task — meant
+    for sequential checks such as bench/ or ad-hoc regression scripts:
+
+        with query_budget(4, "/api/children"):
+            await client.get("/api/children", headers=...)
+    """
+    stats = QueryStats(label)
+    _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        _budgets.remove(stats)
+    if stats.queries > max_queries:
+        listing = "\n".join(f"  {first_line(s)[:120]}" for s in stats.statements)
+        raise QueryBudgetExceeded(
+            f"{label}: {stats.queries} queries, budget {max_queries}\n{listing}"
+        )
+
+
+# ── Per-statement histogram and slow-query log ──
+
+STATEMENT_SAMPLES = 512   # recent durations kept per statement for percentiles
+MAX_STATEMENTS = 500      # distinct normalized statements tracked
+
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def normalize(sql: str) -> str:
+    """Statement shape: literals become ?, IN (?, ?, ...) lists collapse."""
+    sql = _STRING.sub("?", first_line(sql))
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("IN (?...)", sql)
+
+
+def redact(parameters: Any) -> str:
+    """Parameter types/sizes only — values never reach the logs."""
+    if parameters is None:
+        return "()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return f"<{len(parameters)} rows>"  # executemany
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return f"<{type(parameters).__name__}>"  # executemany iterables
+
+
+@dataclass
+class StatementStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    samples: deque = field(default_factory=lambda: deque(maxlen=STATEMENT_SAMPLES))
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self) -> dict:
+        from .metrics import percentile  # bot.metrics imports the DB layer
+
+        values = list(self.samples)
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+_statements: dict[str, StatementStats] = {}
+
+
+@add_listener
+def _histogram(sql: str, parameters: Any, seconds: float) -> None:
+    key = normalize(sql)
+    stats = _statements.get(key)
+    if stats is None:
+        if len(_statements) >= MAX_STATEMENTS:
+            key = "<other>"
+        stats = _statements.setdefault(key, StatementStats())
+    stats.add(seconds)
+
+
+@add_listener
+def _slow_query_log(sql: str, parameters: Any, seconds: float) -> None:
+    if seconds * 1000 < SLOW_QUERY_MS:
+        return
+    op = _current_op.get()
+    slow_logger.warning(
+        "Slow query %.1f ms%s: %s params=%s",
+        seconds * 1000,
+        f" in {op.name}" if op else "",
+        first_line(sql)[:500],
+        redact(parameters),
+    )
+
+
+def statement_stats() -> list[dict]:
+    """Histogram rows for this process, most total time first."""
+    rows = [{"statement": sql, **stats.summary()} for sql, stats in _statements.items()]
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows
+
+
+def reset_statement_stats() -> None:
+    _statements.clear()
@@ -0,0 +1,132 @@
+"""Per-family timezone and schedule settings (falls back to global config)."""
+
+from __future__ import annotations
+
+import zoneinfo
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+
+from .config import (
+    DEADLINE_HOUR,
+    MORNING_HOUR,
+    MORNING_MINUTE,
+    REMINDER_HOURS,
+    TIMEZONE,
+)
+
+# Weekly report goes out on Sunday at this local hour
+WEEKLY_REPORT_HOUR = 20
+
+# Scheduled job kinds, in the order they are dispatched within one minute
+JOB_MORNING = "morning"
+JOB_REMINDER = "reminder"
+JOB_EVENING = "evening"
+JOB_WEEKLY = "weekly"
+
+
+@dataclass(frozen=True)
+class FamilySchedule:
+    timezone: str
+    morning_hour: int
+    morning_minute: int
+    reminder_hours: tuple[int, ...]
+    deadline_hour: int
+
+    @property
+    def tz(self) -> zoneinfo.ZoneInfo:
+        return zoneinfo.ZoneInfo(self.timezone)
+
+    def local_now(self, now: datetime | None = None) -> datetime:
+        """Current time (or the given aware datetime) in the family's timezone."""
+        if now is None:
+            now = datetime.now(timezone.utc)
+        return now.astimezone(self.tz)
+
+    def local_today(self, now: datetime | None = None) -> date:
+        return self.local_now(now).date()
+
+    def is_past_deadline(self, now: datetime | None = None) -> bool:
+        return self.local_now(now).hour >= self.deadline_hour
+
+    def due_jobs(self, local: datetime) -> list[str]:
+        """Return job kinds that fire at the given local minute."""
+        jobs: list[str] = []
+        if (local.hour, local.minute) == (self.morning_hour, self.morning_minute):
+            jobs.append(JOB_MORNING)
+        if local.minute == 0 and local.hour in self.reminder_hours:
+            jobs.append(JOB_REMINDER)
+        if local.minute == 0 and local.hour == self.deadline_hour:
+            jobs.append(JOB_EVENING)
+        if local.minute == 0 and local.hour == WEEKLY_REPORT_HOUR and local.weekday() == 6:
+            jobs.append(JOB_WEEKLY)
+        return jobs
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        zoneinfo.ZoneInfo(name)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def parse_reminder_hours(raw: str | None) -> tuple[int, ...] | None:
+    """Parse "12,17" into (12, 17). Returns None for empty/invalid input."""
+    if not raw:
+        return None
+    try:
+        hours = tuple(sorted({int(h) for h in raw.split(",") if h.strip()}))
+    except ValueError:
+        return None
+    if not hours or any(h < 0 or h > 23 for h in hours):
+        return None
+    return hours
+
+
+DEFAULT_SCHEDULE = FamilySchedule(
+    timezone=TIMEZONE,
+    morning_hour=MORNING_HOUR,
+    morning_minute=MORNING_MINUTE,
+    reminder_hours=tuple(REMINDER_HOURS),
+    deadline_hour=DEADLINE_HOUR,
+)
+
+
+def schedule_for(family: dict | None) -> FamilySchedule:
+    """Build a FamilySchedule from a families row; NULL columns use config defaults."""
+    if not family:
+        return DEFAULT_SCHEDULE
+
+    tz_name = family.get("timezone")
+    if not tz_name or not is_valid_timezone(tz_name):
+        tz_name = DEFAULT_SCHEDULE.timezone
+
+    def _int(col: str, default: int) -> int:
+        val = family.get(col)
+        return default if val is None else int(val)
+
+    return FamilySchedule(
+        timezone=tz_name,
+        morning_hour=_int("morning_hour", DEFAULT_SCHEDULE.morning_hour),
+        morning_minute=_int("morning_minute", DEFAULT_SCHEDULE.morning_minute),
+        reminder_hours=(
+            parse_reminder_hours(family.get("reminder_hours"))
+            or DEFAULT_SCHEDULE.reminder_hours
+        ),
+        deadline_hour=_int("deadline_hour", DEFAULT_SCHEDULE.deadline_hour),
+    )
+
+
+def local_today(tz_name: str | None) -> date:
+    """Today in a family's timezone (NULL/invalid → the configured default)."""
+    return schedule_for({"timezone": tz_name}).local_today()
+
+
+def schedule_to_dict(schedule: FamilySchedule) -> dict:
+    return {
+        "timezone": schedule.timezone,
+        "morning_hour": schedule.morning_hour,
+        "morning_minute": schedule.morning_minute,
+        "reminder_hours": list(schedule.reminder_hours),
+        "deadline_hour": schedule.deadline_hour,
+    }
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from datetime import date, datetime
+import html
+from datetime import date
 
 from aiogram import Bot, F, Router
 from aiogram.filters import Command
@@ -8,7 +9,6 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
-from ..config import DEADLINE_HOUR, TIMEZONE
 from ..child_tasks import get_active_tasks_for_child, get_child_all_task_keys, get_task_label
 from ..database import (
     complete_extra_task,
@@ -16,6 +16,7 @@ from ..database import (
     get_completed_keys_for_date,
     get_extra_task,
     get_extra_tasks_for_date,
+    get_family,
     get_family_parents,
     get_pending_keys_for_date,
     get_user,
@@ -23,6 +24,7 @@ from ..database import (
     uncomplete_extra_task,
     uncomplete_task,
 )
+from ..family_schedule import FamilySchedule, schedule_for
 from ..keyboards import approval_kb, checklist_kb
 
 router = Router()
@@ -32,16 +34,17 @@ class PhotoSubmit(StatesGroup):
     waiting_photo = State()
 
 
-def _is_sunday(d: date | None = None) -> bool:
-    return (d or date.today()).weekday() == 6
+def _is_sunday(d: date) -> bool:
+    return d.weekday() == 6
 
 
-def _is_past_deadline() -> bool:
-    """Check if current time is past DEADLINE_HOUR in the configured timezone."""
-    import zoneinfo
-    tz = zoneinfo.ZoneInfo(TIMEZONE)
-    now = datetime.now(tz)
-    return now.hour >= DEADLINE_HOUR
+async def _family_schedule(family_id: int) -> FamilySchedule:
+    return schedule_for(await get_family(family_id))
+
+
+async def _family_today(family_id: int) -> date:
+    """Today in the family's timezone — the day submissions are stored under."""
+    return (await _family_schedule(family_id)).local_today()
 
 
 async def _require_child(message_or_cb) -> dict | None:
@@ -74,18 +77,25 @@ async def _build_checklist_kb(user_id: int, today: date):
     )
 
 
-async def send_checklist(bot: Bot, child_telegram_id: int) -> None:
-    """Send today's checklist to a child. Used by scheduler and /checklist."""
+async def send_checklist(bot: Bot, child_telegram_id: int, note: str = "") -> None:
+    """Send today's checklist to a child. Used by scheduler and /checklist.
+
+    A plain-text note (e.g. what a parent just approved) goes above it in
+    the same message.
+    """
     user = await get_user(child_telegram_id)
     if not user or user["role"] != "child":
         return
 
-    today = date.today()
+    today = await _family_today(user["family_id"])
     kb = await _build_checklist_kb(user["id"], today)
 
+    text = "📋 <b>Твой чеклист на сегодня:</b>"
+    if note:
+        text = f"{html.escape(note)}\n\n{text}"
     await bot.send_message(
         child_telegram_id,
-        "📋 <b>Твой чеклист на сегодня:</b>",
+        text,
         reply_markup=kb,
         parse_mode="HTML",
     )
@@ -160,7 +170,7 @@ async def done_task_cb(callback: CallbackQuery) -> None:
         await callback.answer("Неизвестная задача.", show_alert=True)
         return
 
-    today = date.today()
+    today = await _family_today(user["family_id"])
     await uncomplete_task(user["id"], task_key, today.isoformat())
 
     kb = await _build_checklist_kb(user["id"], today)
@@ -203,7 +213,7 @@ async def exdone_task_cb(callback: CallbackQuery) -> None:
     extra_id = int(callback.data.split(":", 1)[1])
     await uncomplete_extra_task(extra_id)
 
-    today = date.today()
+    today = await _family_today(user["family_id"])
     kb = await _build_checklist_kb(user["id"], today)
     await callback.message.edit_reply_markup(reply_markup=kb)
 
@@ -215,8 +225,8 @@ async def exdone_task_cb(callback: CallbackQuery) -> None:
 async def receive_media(message: Message, state: FSMContext) -> None:
     user = await get_user(message.from_user.id)
     data = await state.get_data()
-    today = date.today()
-    today_str = today.isoformat()
+    schedule = await _family_schedule(user["family_id"])
+    today_str = schedule.local_today().isoformat()
 
     # Determine media type and file_id
     if message.photo:
@@ -247,15 +257,19 @@ async def receive_media(message: Message, state: FSMContext) -> None:
 
     await state.clear()
 
-    late = _is_past_deadline()
-    late_warn = "\n⚠️ Задача сдана после 22:00" if late else ""
+    late = schedule.is_past_deadline()
+    deadline = f"{schedule.deadline_hour:02d}:00"
+    late_warn = f"\n⚠️ Задача сдана после {deadline}" if late else ""
     await message.answer(f"🕐 Задача «{label}» отправлена на проверку родителю!{late_warn}")
 
     # Notify parents with media + approval buttons
     parents = await get_family_parents(user["family_id"])
-    kb = approval_kb(completion_id, is_extra=is_extra)
+    kb = approval_kb(
+        completion_id, is_extra=is_extra,
+        child_id=user["id"], child_name=user["name"], day=today_str,
+    )
     approval_type = "extra" if is_extra else "task"
-    late_caption = "\n⚠️ Сдано после 22:00" if late else ""
+    late_caption = f"\n⚠️ Сдано после {deadline}" if late else ""
     for parent in parents:
         try:
             caption = f"🕐 {user['name']} выполнил(а): <b>{label}</b>\nОжидает одобрения{late_caption}"
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import date, timedelta
 
 from aiogram import F, Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 
+from ..approvals import by_child, child_summary, edit_captions, item_caption
+from ..bitset import TaskBits
 from ..child_tasks import (
     child_has_shower,
     child_has_sunday_task,
@@ -17,18 +20,24 @@ from ..child_tasks import (
 from ..database import (
     add_custom_child_task,
     add_extra_task,
+    any_activity_before,
     approve_extra_task,
     approve_task,
     delete_approval_messages,
     delete_family,
     get_approval_messages,
     get_child_all_tasks,
+    get_child_tasks,
+    get_completed_keys_for_children_range,
     get_completed_keys_for_date,
     get_completed_keys_for_range,
     get_completion_by_id,
+    get_day_masks,
+    get_extra_points_for_children_range,
     get_extra_points_for_date,
     get_extra_points_for_range,
     get_extra_task,
+    get_family,
     get_family_children,
     get_family_invite_code,
     get_family_parents,
@@ -38,9 +47,12 @@ from ..database import (
     reject_task,
     remove_custom_child_task,
     reset_child_tasks,
+    resolve_pending_approvals,
     set_family_password,
+    set_family_schedule,
     toggle_child_task,
 )
+from ..family_schedule import is_valid_timezone, schedule_for
 from ..keyboards import child_picker_kb, task_manager_kb
 from ..scoring import format_daily_summary, format_weekly_report
 from ..tasks_config import SUNDAY_TASK
@@ -69,6 +81,11 @@ class ManageTasks(StatesGroup):
 # ── Helpers ───────────────────────────────────────────────
 
 
+async def _family_today(family_id: int) -> date:
+    """Today in the family's timezone — the day children's submissions are stored under."""
+    return schedule_for(await get_family(family_id)).local_today()
+
+
 async def _require_parent(message_or_cb) -> dict | None:
     tg_id = message_or_cb.from_user.id
     user = await get_user(tg_id)
@@ -155,6 +172,37 @@ async def cmd_invite(message: Message) -> None:
     )
 
 
+# ── /timezone — per-family timezone ─────────────────────
+
+
+@router.message(Command("timezone"))
+async def cmd_timezone(message: Message, command: CommandObject) -> None:
+    user = await _require_parent(message)
+    if not user:
+        return
+
+    tz_name = (command.args or "").strip()
+    if tz_name:
+        if not is_valid_timezone(tz_name):
+            await message.answer(
+                "❌ Неизвестный часовой пояс. Пример: <code>/timezone Europe/Moscow</code>",
+                parse_mode="HTML",
+            )
+            return
+        await set_family_schedule(user["family_id"], timezone=tz_name)
+
+    schedule = schedule_for(await get_family(user["family_id"]))
+    reminders = ", ".join(f"{h:02d}:00" for h in schedule.reminder_hours)
+    await message.answer(
+        f"🕒 Часовой пояс семьи: <b>{schedule.timezone}</b>\n"
+        f"Чеклист: {schedule.morning_hour:02d}:{schedule.morning_minute:02d}\n"
+        f"Напоминания: {reminders}\n"
+        f"Итоги дня: {schedule.deadline_hour:02d}:00\n\n"
+        "Сменить: <code>/timezone Europe/Moscow</code>",
+        parse_mode="HTML",
+    )
+
+
 # ── /children — view children with today's progress ─────
 
 
@@ -169,14 +217,14 @@ async def cmd_children(message: Message) -> None:
         await message.answer("В семье пока нет детей.")
         return
 
-    today_str = date.today().isoformat()
+    today_str = (await _family_today(user["family_id"])).isoformat()
     lines = ["👨‍👩‍👧‍👦 <b>Дети:</b>\n"]
 
     for child in children:
-        completed = await get_completed_keys_for_date(child["id"], today_str)
-        daily_tasks = await get_active_daily_tasks(child["id"])
-        total = len(daily_tasks)
-        done = sum(1 for t in daily_tasks if t.key in completed)
+        bits = TaskBits(await get_child_tasks(child["id"]))
+        done_mask, _ = await get_day_masks(child["id"], today_str, bits)
+        total = bits.daily_count
+        done = bits.done_count(done_mask)
         check = " ✅" if done == total else ""
         lines.append(f"  {child['name']}: {done}/{total} задач{check}")
 
@@ -197,7 +245,7 @@ async def cmd_today(message: Message) -> None:
         await message.answer("В семье пока нет детей.")
         return
 
-    today = date.today()
+    today = await _family_today(user["family_id"])
     today_str = today.isoformat()
     is_sunday = today.weekday() == 6
 
@@ -229,7 +277,7 @@ async def cmd_report(message: Message) -> None:
     if not user:
         return
 
-    today = date.today()
+    today = await _family_today(user["family_id"])
     start = today - timedelta(days=today.weekday())
     end = start + timedelta(days=6)
 
@@ -276,38 +324,54 @@ async def cmd_history(message: Message) -> None:
     user = await _require_parent(message)
     if not user:
         return
+    today = await _family_today(user["family_id"])
+    await _send_history(message, user, today - timedelta(days=today.weekday()))
+
+
+@router.callback_query(F.data.startswith("history:"))
+async def history_earlier(callback: CallbackQuery) -> None:
+    await callback.answer()
+    user = await _require_parent(callback)
+    if not user:
+        return
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await _send_history(callback.message, user, date.fromisoformat(callback.data.split(":", 1)[1]))
+
 
+async def _send_history(message: Message, user: dict, before_week: date) -> None:
+    """HISTORY_WEEKS full weeks before the week starting `before_week`."""
     children = await get_family_children(user["family_id"])
     if not children:
         await message.answer("В семье пока нет детей.")
         return
 
-    today = date.today()
-    current_week_start = today - timedelta(days=today.weekday())
+    # Whole range for every child in two queries, bucketed per week below
+    child_ids = [c["id"] for c in children]
+    oldest = before_week - timedelta(weeks=HISTORY_WEEKS)
+    range_start, range_end = oldest.isoformat(), (before_week - timedelta(days=1)).isoformat()
+    completed_by_child = await get_completed_keys_for_children_range(child_ids, range_start, range_end)
+    extra_by_child = await get_extra_points_for_children_range(child_ids, range_start, range_end)
+    has_more = await any_activity_before(child_ids, range_start)
 
-    for child in children:
+    for n, child in enumerate(children, 1):
         parts = [f"📜 <b>История — {child['name']}</b>\n"]
         daily_tasks = await get_active_daily_tasks(child["id"])
         shower_req = await child_has_shower(child["id"])
         has_sunday = await child_has_sunday_task(child["id"])
+        completed_by_day = completed_by_child[child["id"]]
+        extra_by_day = extra_by_child[child["id"]]
 
         for w in range(1, HISTORY_WEEKS + 1):
-            start = current_week_start - timedelta(weeks=w)
+            start = before_week - timedelta(weeks=w)
             end = start + timedelta(days=6)
+            week_days = [(start + timedelta(days=i)).isoformat() for i in range(7)]
 
-            daily_completed = await get_completed_keys_for_range(
-                child["id"], start.isoformat(), end.isoformat()
-            )
-            for i in range(7):
-                d = (start + timedelta(days=i)).isoformat()
-                daily_completed.setdefault(d, set())
+            daily_completed = {d: completed_by_day.get(d, set()) for d in week_days}
 
             sunday_str = end.isoformat()
             sunday_done = has_sunday and SUNDAY_TASK.key in daily_completed.get(sunday_str, set())
 
-            extra_pts = await get_extra_points_for_range(
-                child["id"], start.isoformat(), end.isoformat()
-            )
+            extra_pts = {d: extra_by_day[d] for d in week_days if d in extra_by_day}
             max_weekly = len(daily_tasks) * 7
 
             text = format_weekly_report(
@@ -319,7 +383,12 @@ async def cmd_history(message: Message) -> None:
             )
             parts.append(text)
 
-        await message.answer("\n\n".join(parts), parse_mode="HTML")
+        earlier_kb = None
+        if has_more and n == len(children):
+            earlier_kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(
+                text="⬅️ Ранее", callback_data=f"history:{oldest.isoformat()}"
+            )]])
+        await message.answer("\n\n".join(parts), parse_mode="HTML", reply_markup=earlier_kb)
 
 
 # ── /extra — assign bonus task to child ──────────────────
@@ -401,7 +470,7 @@ async def extra_points(message: Message, state: FSMContext) -> None:
 
     user = await get_user(message.from_user.id)
     data = await state.get_data()
-    today = date.today().isoformat()
+    today = (await _family_today(user["family_id"])).isoformat()
 
     task_id = await add_extra_task(
         user["family_id"], data["child_id"], data["title"], points, today
@@ -863,3 +932,42 @@ async def reject_extra_cb(callback: CallbackQuery) -> None:
             await send_checklist(callback.bot, child["telegram_id"])
         except Exception:
             pass
+
+
+# ── Approve everything a child sent today ────────────────
+
+
+@router.callback_query(F.data.startswith("approve_all:"))
+async def approve_all_cb(callback: CallbackQuery) -> None:
+    user = await _require_parent(callback)
+    if not user:
+        await callback.answer()
+        return
+
+    _, child_id, day = callback.data.split(":", 2)
+    result = await resolve_pending_approvals(
+        user["family_id"], True, child_id=int(child_id), day=day,
+    )
+    if not result["items"]:
+        await callback.answer("Нечего одобрять — всё уже проверено.", show_alert=True)
+        return
+    await callback.answer(f"Одобрено: {len(result['items'])}")
+
+    async def edit(chat_id: int, message_id: int, caption: str) -> None:
+        await callback.bot.edit_message_caption(
+            chat_id=chat_id, message_id=message_id, caption=caption, parse_mode="HTML",
+        )
+
+    from .child import send_checklist
+
+    async def notify_child(telegram_id: int, items: list[dict]) -> None:
+        try:
+            await send_checklist(callback.bot, telegram_id, note=child_summary(items, approve=True))
+        except Exception:
+            pass
+
+    captions = {(i["type"], i["id"]): item_caption(i, approve=True) for i in result["items"]}
+    await asyncio.gather(
+        edit_captions(edit, result["messages"], captions),
+        *(notify_child(tg, items) for tg, items in by_child(result["items"]).items()),
+    )
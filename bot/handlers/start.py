@@ -93,7 +93,8 @@ async def process_parent_password(message: Message, state: FSMContext) -> None:
         f"/report — недельный отчёт\n"
         f"/history — история за прошлые недели\n"
         f"/extra — назначить доп. задание\n"
-        f"/password — сменить пароль",
+        f"/password — сменить пароль\n"
+        f"/timezone — часовой пояс семьи",
         parse_mode="HTML",
     )
 
@@ -164,7 +165,8 @@ async def process_join_family_password(message: Message, state: FSMContext) -> N
         f"/report — недельный отчёт\n"
         f"/history — история за прошлые недели\n"
         f"/extra — назначить доп. задание\n"
-        f"/password — сменить пароль",
+        f"/password — сменить пароль\n"
+        f"/timezone — часовой пояс семьи",
         parse_mode="HTML",
     )
 
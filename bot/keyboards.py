@@ -172,22 +172,38 @@ def child_picker_kb(children: list[dict], prefix: str) -> InlineKeyboardMarkup:
 # ── Parent: approval buttons ─────────────────────────────
 
 
-def approval_kb(completion_id: int, is_extra: bool = False) -> InlineKeyboardMarkup:
-    """Inline keyboard with Approve / Reject buttons for parent."""
+def approval_kb(
+    completion_id: int,
+    is_extra: bool = False,
+    child_id: int | None = None,
+    child_name: str = "",
+    day: str = "",
+) -> InlineKeyboardMarkup:
+    """Inline keyboard with Approve / Reject buttons for parent.
+
+    With child_id/day, adds a button approving everything the child has
+    pending for that day at once.
+    """
     if is_extra:
         approve_cb = f"approve_extra:{completion_id}"
         reject_cb = f"reject_extra:{completion_id}"
     else:
         approve_cb = f"approve_task:{completion_id}"
         reject_cb = f"reject_task:{completion_id}"
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✅ Одобрить", callback_data=approve_cb),
-                InlineKeyboardButton(text="❌ Отклонить", callback_data=reject_cb),
-            ]
+    rows = [
+        [
+            InlineKeyboardButton(text="✅ Одобрить", callback_data=approve_cb),
+            InlineKeyboardButton(text="❌ Отклонить", callback_data=reject_cb),
         ]
-    )
+    ]
+    if child_id is not None and day:
+        rows.append([
+            InlineKeyboardButton(
+                text=f"✅ Одобрить всё от {child_name} за сегодня",
+                callback_data=f"approve_all:{child_id}:{day}",
+            )
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 # ── Parent: task manager ─────────────────────────────────
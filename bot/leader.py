@@ -0,0 +1,69 @@
+"""Lease-based leader election so only one bot replica runs scheduled jobs."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from .config import LEADER_LEASE_TTL
+from .database import acquire_lease, release_lease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """Holds a named lease row in the shared SQLite DB.
+
+    Every replica runs `run()`; the holder renews the lease every ttl/3
+    seconds, the others retry at the same pace and take over once it expires.
+    """
+
+    def __init__(self, name: str = "scheduler", ttl: float = LEADER_LEASE_TTL) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._expires_at = 0.0
+        self._stopped = asyncio.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        # Leadership lapses locally at lease expiry even if renewals fail
+        return time.time() < self._expires_at
+
+    async def try_acquire(self) -> bool:
+        was_leader = self.is_leader
+        attempt_at = time.time()
+        try:
+            won = await acquire_lease(self.name, self.holder, self.ttl)
+        except Exception as e:
+            logger.warning("Lease %s renewal failed: %s", self.name, e)
+            return self.is_leader
+        self._expires_at = attempt_at + self.ttl if won else 0.0
+        if won and not was_leader:
+            logger.info("Acquired %s lease as %s", self.name, self.holder)
+        elif was_leader and not won:
+            logger.warning("Lost %s lease (holder %s)", self.name, self.holder)
+        return won
+
+    async def run(self) -> None:
+        interval = max(self.ttl / 3, 1)
+        while not self._stopped.is_set():
+            await self.try_acquire()
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        """Stop renewing and hand the lease over immediately."""
+        self._stopped.set()
+        if self.is_leader:
+            self._expires_at = 0.0
+            try:
+                await release_lease(self.name, self.holder)
+            except Exception as e:
+                logger.warning("Lease %s release failed: %s", self.name, e)
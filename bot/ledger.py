@@ -0,0 +1,321 @@
+"""Append-only score ledger with running day/week totals per child.
+
+Every change to an item's approved state appends a score_events row and folds
+its delta into score_days / score_weeks, so today's and this week's points are
+primary-key reads. score_years keeps one byte per day of the year (the day's
+total, capped at 255) for the calendar heatmap. Events store facts (which item,
+approved or not), not just deltas, so `rebuild_ledger` can replay them under
+the current scoring rules.
+
+Functions take an open aiosqlite connection and do not commit: they run inside
+the caller's write (bot.database and webapp.db share them).
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import aiosqlite
+
+from .scoring import calculate_daily_points
+from .tasks_config import DAILY_TASKS, SHOWER_KEY, SUNDAY_TASK, TaskDef
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS score_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    child_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('task', 'extra')),
+    ref_id INTEGER,
+    task_key TEXT,
+    points INTEGER NOT NULL DEFAULT 0,
+    approved INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    base_delta INTEGER NOT NULL DEFAULT 0,
+    extra_delta INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS score_days (
+    child_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    base_points INTEGER NOT NULL DEFAULT 0,
+    extra_points INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (child_id, date)
+);
+
+CREATE TABLE IF NOT EXISTS score_weeks (
+    child_id INTEGER NOT NULL,
+    week_start TEXT NOT NULL,
+    base_points INTEGER NOT NULL DEFAULT 0,
+    extra_points INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (child_id, week_start)
+);
+
+CREATE TABLE IF NOT EXISTS score_years (
+    child_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    intensity BLOB NOT NULL,
+    PRIMARY KEY (child_id, year)
+);
+
+CREATE INDEX IF NOT EXISTS idx_score_events_child ON score_events(child_id, id);
+"""
+
+YEAR_BYTES = 366
+
+
+async def init_ledger(db: aiosqlite.Connection) -> None:
+    """Create ledger tables; seed or backfill the ones missing on an older DB."""
+    rows = await db.execute_fetchall(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name IN ('score_events', 'score_years')"
+    )
+    existing = {r["name"] for r in rows}
+    await db.executescript(LEDGER_SCHEMA)
+    if "score_events" not in existing:
+        await seed_ledger(db)
+    elif "score_years" not in existing:
+        await rebuild_year_vectors(db)
+
+
+def _year_slot(day: date) -> tuple[int, int]:
+    return day.year, day.timetuple().tm_yday - 1
+
+
+def week_start_of(day: str) -> str:
+    d = date.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+async def _daily_rules(
+    db: aiosqlite.Connection, child_id: int
+) -> tuple[tuple[TaskDef, ...], bool]:
+    """(daily tasks, shower_required) from the child's current enabled tasks."""
+    rows = await db.execute_fetchall(
+        "SELECT task_key, label, task_group FROM child_tasks WHERE child_id = ? AND enabled = 1",
+        (child_id,),
+    )
+    if rows:
+        tasks = [TaskDef(r["task_key"], r["label"], r["task_group"]) for r in rows]
+    else:
+        # Not initialized yet — the standard set is what it will get lazily
+        tasks = list(DAILY_TASKS) + [SUNDAY_TASK]
+    daily = tuple(t for t in tasks if t.group != "sunday")
+    return daily, any(t.key == SHOWER_KEY for t in tasks)
+
+
+async def _day_points(db: aiosqlite.Connection, child_id: int, day: str) -> tuple[int, int]:
+    """Recompute (base, extra) points for one child-day from the source tables."""
+    daily_tasks, shower_req = await _daily_rules(db, child_id)
+    rows = await db.execute_fetchall(
+        "SELECT task_key FROM completions WHERE child_id = ? AND date = ? AND approved = 1",
+        (child_id, day),
+    )
+    base = calculate_daily_points({r["task_key"] for r in rows}, daily_tasks, shower_req)
+    rows = await db.execute_fetchall(
+        """SELECT SUM(points) AS pts FROM extra_tasks
+           WHERE child_id = ? AND date = ? AND completed = 1 AND approved = 1""",
+        (child_id, day),
+    )
+    return base, (rows[0]["pts"] or 0) if rows else 0
+
+
+async def _apply_delta(
+    db: aiosqlite.Connection, child_id: int, day: str, base_delta: int, extra_delta: int
+) -> None:
+    for table, key_col, key in (
+        ("score_days", "date", day),
+        ("score_weeks", "week_start", week_start_of(day)),
+    ):
+        await db.execute(
+            f"""INSERT INTO {table} (child_id, {key_col}, base_points, extra_points)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(child_id, {key_col}) DO UPDATE SET
+                    base_points = base_points + excluded.base_points,
+                    extra_points = extra_points + excluded.extra_points""",
+            (child_id, key, base_delta, extra_delta),
+        )
+
+
+async def record_change(
+    db: aiosqlite.Connection,
+    child_id: int,
+    day: str,
+    kind: str,
+    approved: bool,
+    action: str,
+    ref_id: int | None = None,
+    task_key: str | None = None,
+    points: int = 0,
+) -> None:
+    """Append an event for an item whose approved state just changed.
+
+    Call after the source row was updated. The day is re-scored (the shower
+    gate makes task points non-additive) and the difference is folded in.
+    """
+    rows = await db.execute_fetchall(
+        "SELECT base_points, extra_points FROM score_days WHERE child_id = ? AND date = ?",
+        (child_id, day),
+    )
+    old_base, old_extra = (rows[0]["base_points"], rows[0]["extra_points"]) if rows else (0, 0)
+    new_base, new_extra = await _day_points(db, child_id, day)
+    base_delta, extra_delta = new_base - old_base, new_extra - old_extra
+
+    await db.execute(
+        """INSERT INTO score_events
+           (child_id, date, kind, ref_id, task_key, points, approved, action, base_delta, extra_delta)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (child_id, day, kind, ref_id, task_key, points, int(approved), action,
+         base_delta, extra_delta),
+    )
+    if base_delta or extra_delta:
+        await _apply_delta(db, child_id, day, base_delta, extra_delta)
+        await _store_intensity(db, child_id, day, new_base + new_extra)
+
+
+async def _store_intensity(db: aiosqlite.Connection, child_id: int, day: str, total: int) -> None:
+    year, i = _year_slot(date.fromisoformat(day))
+    rows = await db.execute_fetchall(
+        "SELECT intensity FROM score_years WHERE child_id = ? AND year = ?",
+        (child_id, year),
+    )
+    vector = bytearray(rows[0]["intensity"]) if rows else bytearray(YEAR_BYTES)
+    vector[i] = max(0, min(total, 255))
+    await db.execute(
+        "INSERT OR REPLACE INTO score_years (child_id, year, intensity) VALUES (?, ?, ?)",
+        (child_id, year, bytes(vector)),
+    )
+
+
+async def rebuild_year_vectors(db: aiosqlite.Connection, child_id: int | None = None) -> None:
+    """Rewrite score_years from score_days."""
+    where, params = ("WHERE child_id = ?", (child_id,)) if child_id is not None else ("", ())
+    await db.execute(f"DELETE FROM score_years {where}", params)
+    rows = await db.execute_fetchall(
+        f"SELECT child_id, date, base_points + extra_points AS total FROM score_days {where}",
+        params,
+    )
+    vectors: dict[tuple[int, int], bytearray] = {}
+    for r in rows:
+        year, i = _year_slot(date.fromisoformat(r["date"]))
+        vector = vectors.setdefault((r["child_id"], year), bytearray(YEAR_BYTES))
+        vector[i] = max(0, min(r["total"], 255))
+    await db.executemany(
+        "INSERT INTO score_years (child_id, year, intensity) VALUES (?, ?, ?)",
+        [(cid, year, bytes(v)) for (cid, year), v in vectors.items()],
+    )
+
+
+async def get_intensity_range(
+    db: aiosqlite.Connection, child_id: int, start: date, end: date
+) -> bytes:
+    """One byte per day in [start, end] — day totals, 0 where nothing counted."""
+    rows = await db.execute_fetchall(
+        "SELECT year, intensity FROM score_years WHERE child_id = ? AND year BETWEEN ? AND ?",
+        (child_id, start.year, end.year),
+    )
+    by_year = {r["year"]: r["intensity"] for r in rows}
+    out = bytearray()
+    for year in range(start.year, end.year + 1):
+        vector = by_year.get(year, bytes(YEAR_BYTES))
+        first = _year_slot(start)[1] if year == start.year else 0
+        last = _year_slot(end)[1] if year == end.year else _year_slot(date(year, 12, 31))[1]
+        out += vector[first:last + 1]
+    return bytes(out)
+
+
+async def get_score_totals(db: aiosqlite.Connection, child_id: int, day: str) -> dict:
+    """Day and week running totals (week = Mon..day's Sunday, before penalty)."""
+    day_rows = await db.execute_fetchall(
+        "SELECT base_points, extra_points FROM score_days WHERE child_id = ? AND date = ?",
+        (child_id, day),
+    )
+    week_rows = await db.execute_fetchall(
+        "SELECT base_points, extra_points FROM score_weeks WHERE child_id = ? AND week_start = ?",
+        (child_id, week_start_of(day)),
+    )
+    day_base, day_extra = (day_rows[0]["base_points"], day_rows[0]["extra_points"]) if day_rows else (0, 0)
+    week_base, week_extra = (week_rows[0]["base_points"], week_rows[0]["extra_points"]) if week_rows else (0, 0)
+    return {
+        "day_base": day_base,
+        "day_extra": day_extra,
+        "day_total": day_base + day_extra,
+        "week_base": week_base,
+        "week_extra": week_extra,
+        "week_total": week_base + week_extra,
+    }
+
+
+async def seed_ledger(db: aiosqlite.Connection) -> None:
+    """One 'seed' event per currently approved item (ledger created on an old DB)."""
+    await db.execute(
+        """INSERT INTO score_events (child_id, date, kind, ref_id, task_key, approved, action)
+           SELECT child_id, date, 'task', id, task_key, 1, 'seed'
+           FROM completions WHERE approved = 1 ORDER BY id"""
+    )
+    await db.execute(
+        """INSERT INTO score_events (child_id, date, kind, ref_id, points, approved, action)
+           SELECT child_id, date, 'extra', id, points, 1, 'seed'
+           FROM extra_tasks WHERE completed = 1 AND approved = 1 ORDER BY id"""
+    )
+    await rebuild_ledger(db)
+
+
+async def rebuild_ledger(db: aiosqlite.Connection, child_id: int | None = None) -> None:
+    """Replay score_events under the current rules and rewrite day/week totals."""
+    where, params = ("WHERE child_id = ?", (child_id,)) if child_id is not None else ("", ())
+    await db.execute(f"DELETE FROM score_days {where}", params)
+    await db.execute(f"DELETE FROM score_weeks {where}", params)
+
+    events = await db.execute_fetchall(
+        f"SELECT child_id, date, kind, ref_id, task_key, points, approved FROM score_events {where} ORDER BY id",
+        params,
+    )
+    task_state: dict[tuple[int, str], set[str]] = {}
+    extra_state: dict[tuple[int, str], dict[int, int]] = {}
+    for e in events:
+        key = (e["child_id"], e["date"])
+        if e["kind"] == "task":
+            keys = task_state.setdefault(key, set())
+            if e["approved"]:
+                keys.add(e["task_key"])
+            else:
+                keys.discard(e["task_key"])
+        else:
+            extras = extra_state.setdefault(key, {})
+            if e["approved"]:
+                extras[e["ref_id"]] = e["points"]
+            else:
+                extras.pop(e["ref_id"], None)
+
+    rules: dict[int, tuple[tuple[TaskDef, ...], bool]] = {}
+    for cid, day in set(task_state) | set(extra_state):
+        if cid not in rules:
+            rules[cid] = await _daily_rules(db, cid)
+        daily_tasks, shower_req = rules[cid]
+        base = calculate_daily_points(task_state.get((cid, day), set()), daily_tasks, shower_req)
+        extra = sum(extra_state.get((cid, day), {}).values())
+        if base or extra:
+            await _apply_delta(db, cid, day, base, extra)
+    await rebuild_year_vectors(db, child_id)
+
+
+async def delete_child_ledger(db: aiosqlite.Connection, child_id: int) -> None:
+    for table in ("score_events", "score_days", "score_weeks", "score_years"):
+        await db.execute(f"DELETE FROM {table} WHERE child_id = ?", (child_id,))
+
+
+if __name__ == "__main__":
+    # python -m bot.ledger — replay all events after a scoring-rule change
+    import asyncio
+
+    from .database import close_db, get_db
+
+    async def _main() -> None:
+        db = await get_db()
+        await rebuild_ledger(db)
+        await db.commit()
+        await close_db()
+        print("Score ledger rebuilt")
+
+    asyncio.run(_main())
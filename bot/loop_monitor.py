@@ -0,0 +1,160 @@
+"""Event-loop lag monitor shared by the bot and the web app.
+
+A coroutine sleeps LOOP_SAMPLE_INTERVAL at a time and records how late it
+wakes up: that delay is how long other callbacks held the loop. The samples
+alone only show a stall after it ended, so a watchdog thread also checks the
+sampler's heartbeat; when the loop has been blocked longer than LOOP_STALL_MS
+it logs the loop thread's current stack and task while they are still the
+culprits.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Awaitable, Callable
+
+from .config import LOOP_STALL_MS
+
+logger = logging.getLogger(__name__)
+
+LOOP_SAMPLE_INTERVAL = 0.1     # seconds between lag samples
+LOOP_LAG_SAMPLES = 600         # window for percentiles (~1 minute)
+LOOP_REPORT_INTERVAL = 60.0    # seconds between report() calls
+STACK_LIMIT = 30               # frames logged per stall
+
+Reporter = Callable[[dict], Awaitable[None]]
+
+_monitors: list["LoopMonitor"] = []
+
+
+class LoopMonitor:
+    """Samples scheduling delay of the running loop; see module docstring.
+
+    `report`, if given, receives summary() every LOOP_REPORT_INTERVAL seconds
+    (the bot uses it to persist its numbers for the web app's /metrics).
+    """
+
+    def __init__(
+        self,
+        process: str,
+        stall_ms: float = LOOP_STALL_MS,
+        interval: float = LOOP_SAMPLE_INTERVAL,
+        report: Reporter | None = None,
+    ) -> None:
+        self.process = process
+        self.instance = f"{socket.gethostname()}:{os.getpid()}"
+        self.stall = stall_ms / 1000
+        self.interval = interval
+        self.samples: deque[float] = deque(maxlen=LOOP_LAG_SAMPLES)
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._report = report
+        self._heartbeat = time.monotonic()
+        self._stall_logged = False
+        self._stopped = threading.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+
+    # ── Lifecycle ──
+
+    def start(self) -> None:
+        """Start sampling on the running loop (call from inside it)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = self._loop.create_task(self._run(), name=f"loop-monitor-{self.process}")
+        self._watchdog = threading.Thread(
+            target=self._watch, name=f"loop-watchdog-{self.process}", daemon=True
+        )
+        self._watchdog.start()
+        _monitors.append(self)
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self in _monitors:
+            _monitors.remove(self)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+
+    # ── Sampling ──
+
+    async def _run(self) -> None:
+        last_report = time.monotonic()
+        while not self._stopped.is_set():
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.stall:
+                self.stalls += 1
+                if self._stall_logged:
+                    logger.warning("%s event loop stall ended after %.0f ms", self.process, lag * 1000)
+            self._stall_logged = False
+            if self._report is not None and now - last_report >= LOOP_REPORT_INTERVAL:
+                last_report = now
+                try:
+                    await self._report(self.summary())
+                except Exception as e:
+                    logger.warning("Loop lag report failed: %s", e)
+
+    def _watch(self) -> None:
+        poll = max(min(self.stall / 4, self.interval), 0.01)
+        while not self._stopped.wait(poll):
+            blocked = time.monotonic() - self._heartbeat - self.interval
+            if blocked >= self.stall and not self._stall_logged:
+                self._stall_logged = True
+                self._log_stall(blocked)
+
+    def _log_stall(self, blocked: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT)) if frame else "  <no frame>\n"
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        logger.warning(
+            "%s event loop blocked for %.0f ms (still running) in task %s:\n%s",
+            self.process,
+            blocked * 1000,
+            task.get_name() if task is not None else "<none>",
+            stack.rstrip(),
+        )
+
+    # ── Reporting ──
+
+    def summary(self) -> dict:
+        from .metrics import percentile  # bot.metrics imports the DB layer
+
+        values = list(self.samples)
+        return {
+            "process": self.process,
+            "instance": self.instance,
+            "samples": len(values),
+            "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            "max_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stalls,
+        }
+
+
+def running_monitors() -> list[LoopMonitor]:
+    """Monitors started in this process."""
+    return list(_monitors)
@@ -3,15 +3,20 @@ import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from .config import BOT_TOKEN
-from .database import close_db, init_db
+from .config import BOT_TOKEN, LOG_LEVEL, TELEGRAM_API_URL
+from .database import close_db, init_db, save_loop_lag
 from .handlers import get_all_routers
+from .leader import LeaderLease
+from .loop_monitor import LoopMonitor
+from .metrics import db_stats_middleware
 from .scheduler import setup_scheduler
 
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
 logger = logging.getLogger(__name__)
@@ -23,9 +28,11 @@ async def main() -> None:
 
     bot = Bot(
         token=BOT_TOKEN,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)),
         default=DefaultBotProperties(parse_mode=None),
     )
     dp = Dispatcher(storage=MemoryStorage())
+    dp.update.outer_middleware(db_stats_middleware)
 
     # Register routers
     for router in get_all_routers():
@@ -35,10 +42,16 @@ async def main() -> None:
     await init_db()
     logger.info("Database initialized")
 
-    # Start scheduler
-    scheduler = setup_scheduler(bot)
+    loop_monitor = LoopMonitor("bot", report=save_loop_lag)
+    loop_monitor.start()
+
+    # Start scheduler — every replica ticks, only the lease holder dispatches
+    lease = LeaderLease("scheduler")
+    await lease.try_acquire()
+    lease_task = asyncio.create_task(lease.run())
+    scheduler = setup_scheduler(bot, lease)
     scheduler.start()
-    logger.info("Scheduler started")
+    logger.info("Scheduler started (leader: %s)", lease.is_leader)
 
     # Start polling
     logger.info("Bot is starting...")
@@ -46,6 +59,9 @@ async def main() -> None:
         await dp.start_polling(bot)
     finally:
         scheduler.shutdown()
+        await lease.stop()
+        await lease_task
+        await loop_monitor.stop()
         await close_db()
         await bot.session.close()
 
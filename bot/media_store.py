@@ -0,0 +1,165 @@
+"""Content-addressed store for uploaded photos/videos.
+
+Web app uploads are stored once per content hash, under
+uploads/media/<aa>/<sha256>.<ext>, and completions / extra_tasks point at
+that path in photo_file_id. The `media` row keeps a reference count from
+those two tables, maintained by triggers so every write path (both DB
+modules, family deletion, INSERT OR REPLACE resubmissions) stays counted,
+and the Telegram file_id the bytes got on their first upload, so later
+sends reuse it instead of uploading the file again.
+
+Rows left unreferenced for MEDIA_GC_GRACE are collected by
+`collect_garbage`; until then a resubmission of the same bytes (typical
+after a rejection) is deduplicated against them.
+
+Functions take an open aiosqlite connection and do not commit, like ledger.
+The triggers need PRAGMA recursive_triggers on every connection: without it
+the row that INSERT OR REPLACE deletes never fires the delete trigger.
+"""
+
+from __future__ import annotations
+
+import time
+
+import aiosqlite
+
+MEDIA_PREFIX = "uploads/media/"
+MEDIA_GC_GRACE = 7 * 86400  # seconds an unreferenced file is kept for reuse
+MEDIA_GC_BATCH = 500
+
+_REF_TRIGGERS = "\n".join(
+    f"""
+CREATE TRIGGER IF NOT EXISTS media_ref_{table}_insert AFTER INSERT ON {table}
+WHEN NEW.photo_file_id LIKE '{MEDIA_PREFIX}%'
+BEGIN
+    UPDATE media SET refcount = refcount + 1 WHERE path = NEW.photo_file_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS media_ref_{table}_delete AFTER DELETE ON {table}
+WHEN OLD.photo_file_id LIKE '{MEDIA_PREFIX}%'
+BEGIN
+    UPDATE media SET refcount = refcount - 1, last_used = strftime('%s', 'now')
+    WHERE path = OLD.photo_file_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS media_ref_{table}_update AFTER UPDATE OF photo_file_id ON {table}
+WHEN OLD.photo_file_id IS NOT NEW.photo_file_id
+BEGIN
+    UPDATE media SET refcount = refcount - 1, last_used = strftime('%s', 'now')
+    WHERE path = OLD.photo_file_id;
+    UPDATE media SET refcount = refcount + 1 WHERE path = NEW.photo_file_id;
+END;
+"""
+    for table in ("completions", "extra_tasks")
+)
+
+MEDIA_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS media (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    content_type TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    telegram_file_id TEXT,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_media_unreferenced ON media(refcount, last_used);
+{_REF_TRIGGERS}
+"""
+
+
+def media_path(sha256: str, ext: str) -> str:
+    """Store path (relative to data/) for content with this hash."""
+    return f"{MEDIA_PREFIX}{sha256[:2]}/{sha256}.{ext}"
+
+
+# Downscaled copies (webapp.thumbnails): longest side in px, per size name
+THUMB_SIZES = {"thumb": 640, "preview": 1280}
+THUMB_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def store_sha256(path: str) -> str | None:
+    """Content hash of a store path, None for anything else (dated uploads, file_ids)."""
+    if not path.startswith(MEDIA_PREFIX):
+        return None
+    return path.rsplit("/", 1)[-1].split(".", 1)[0]
+
+
+def thumb_path(sha256: str, size: str, fmt: str) -> str:
+    """Thumbnail path (relative to data/); the web app links these directly."""
+    return f"uploads/thumbs/{sha256[:2]}/{sha256}-{size}.{fmt}"
+
+
+def thumb_paths(sha256: str) -> list[str]:
+    return [thumb_path(sha256, size, fmt) for size in THUMB_SIZES for fmt in THUMB_FORMATS]
+
+
+async def init_media_store(db: aiosqlite.Connection) -> None:
+    await db.executescript(MEDIA_SCHEMA)
+
+
+async def register(
+    db: aiosqlite.Connection,
+    sha256: str,
+    path: str,
+    content_type: str,
+    media_type: str,
+    size: int,
+) -> dict:
+    """Add the content (or touch it, if already stored) and return its row."""
+    await db.execute(
+        """INSERT INTO media (sha256, path, content_type, media_type, size, last_used)
+           VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT(sha256) DO UPDATE SET last_used = excluded.last_used""",
+        (sha256, path, content_type, media_type, size, time.time()),
+    )
+    rows = await db.execute_fetchall("SELECT * FROM media WHERE sha256 = ?", (sha256,))
+    return dict(rows[0])
+
+
+async def get_by_path(db: aiosqlite.Connection, path: str) -> dict | None:
+    rows = await db.execute_fetchall("SELECT * FROM media WHERE path = ?", (path,))
+    return dict(rows[0]) if rows else None
+
+
+async def set_telegram_file_id(db: aiosqlite.Connection, path: str, file_id: str) -> None:
+    await db.execute(
+        "UPDATE media SET telegram_file_id = ? WHERE path = ? AND telegram_file_id IS NULL",
+        (file_id, path),
+    )
+
+
+async def collect_garbage(db: aiosqlite.Connection, grace: float = MEDIA_GC_GRACE) -> list[str]:
+    """Delete rows unreferenced for `grace` seconds; returns their paths.
+
+    Counts are re-derived from completions/extra_tasks first, so a drifted
+    counter can delay collection but never drop a file still in use. The
+    caller removes the files after committing.
+    """
+    candidates = await db.execute_fetchall(
+        "SELECT sha256, path FROM media WHERE refcount <= 0 AND last_used < ? LIMIT ?",
+        (time.time() - grace, MEDIA_GC_BATCH),
+    )
+    if not candidates:
+        return []
+    placeholders = ",".join("?" * len(candidates))
+    paths = [r["path"] for r in candidates]
+    rows = await db.execute_fetchall(
+        f"""SELECT photo_file_id AS path, COUNT(*) AS n FROM (
+                SELECT photo_file_id FROM completions WHERE photo_file_id IN ({placeholders})
+                UNION ALL
+                SELECT photo_file_id FROM extra_tasks WHERE photo_file_id IN ({placeholders})
+            ) GROUP BY photo_file_id""",
+        paths + paths,
+    )
+    in_use = {r["path"]: r["n"] for r in rows}
+    for path, n in in_use.items():
+        await db.execute("UPDATE media SET refcount = ? WHERE path = ?", (n, path))
+    garbage = [p for p in paths if p not in in_use]
+    if garbage:
+        await db.execute(
+            f"DELETE FROM media WHERE path IN ({','.join('?' * len(garbage))})", garbage
+        )
+    return garbage
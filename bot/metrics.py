@@ -0,0 +1,143 @@
+"""Per-run metrics for scheduled broadcast jobs (timings, recipients, errors)."""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from .database import save_job_run
+from .db_stats import db_operation
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..1) of an unsorted list; 0.0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[idx]
+
+
+@dataclass
+class JobRun:
+    job: str
+    started_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    recipients: int = 0
+    errors: int = 0
+    db_time: float = 0.0
+    telegram_time: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+
+    @contextmanager
+    def db(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.db_time += time.perf_counter() - start
+
+    @contextmanager
+    def telegram(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.telegram_time += time.perf_counter() - start
+
+    @contextmanager
+    def recipient(self):
+        """Time the whole processing of one recipient (child)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.recipients += 1
+            self.latencies.append(time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        finished = self.finished_at or time.time()
+        return {
+            "job": self.job,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "finished_at": datetime.fromtimestamp(finished, timezone.utc).isoformat(),
+            "duration_ms": round((finished - self.started_at) * 1000, 1),
+            "recipients": self.recipients,
+            "errors": self.errors,
+            "db_ms": round(self.db_time * 1000, 1),
+            "telegram_ms": round(self.telegram_time * 1000, 1),
+            "p50_ms": round(percentile(self.latencies, 0.5) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 0.95) * 1000, 1),
+        }
+
+
+_current_run: contextvars.ContextVar[JobRun | None] = contextvars.ContextVar(
+    "current_job_run", default=None
+)
+
+
+def current_job_run() -> JobRun:
+    """The JobRun of the enclosing @tracked_job (a throwaway one outside jobs)."""
+    run = _current_run.get()
+    return run if run is not None else JobRun("untracked")
+
+
+def tracked_job(name: str):
+    """Decorator: record a JobRun for every call and persist it to job_runs."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            run = JobRun(name)
+            token = _current_run.set(run)
+            try:
+                with db_operation(f"job {name}"):
+                    return await func(*args, **kwargs)
+            except Exception:
+                run.errors += 1
+                raise
+            finally:
+                _current_run.reset(token)
+                run.finished_at = time.time()
+                summary = run.summary()
+                logger.info(
+                    "Job %s: %d recipients, %d errors in %.0f ms "
+                    "(db %.0f ms, telegram %.0f ms, p95 %.0f ms)",
+                    name, summary["recipients"], summary["errors"],
+                    summary["duration_ms"], summary["db_ms"],
+                    summary["telegram_ms"], summary["p95_ms"],
+                )
+                try:
+                    await save_job_run(summary)
+                except Exception as e:
+                    logger.warning("Failed to save metrics for job %s: %s", name, e)
+
+        return wrapper
+
+    return decorator
+
+
+def _update_name(update) -> str:
+    """Short label for a bot update: '/command', 'callback prefix' or event type."""
+    if update.message is not None:
+        text = update.message.text or ""
+        if text.startswith("/"):
+            return f"message {text.split()[0]}"
+        return f"message {update.message.content_type}"
+    if update.callback_query is not None:
+        return f"callback {(update.callback_query.data or '').split(':')[0]}"
+    return update.event_type
+
+
+async def db_stats_middleware(handler, event, data):
+    """aiogram outer middleware: one db_operation per update."""
+    with db_operation(_update_name(event)):
+        return await handler(event, data)
@@ -1,41 +1,47 @@
 import asyncio
 import logging
 import random
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
 
 from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from .child_tasks import (
-    child_has_shower,
-    child_has_sunday_task,
-    get_active_daily_tasks,
-)
-from .config import (
-    DEADLINE_HOUR,
-    MORNING_HOUR,
-    MORNING_MINUTE,
-    REMINDER_HOURS,
-    TIMEZONE,
-)
+from .bitset import TaskBits
+from .config import DATA_DIR, TIMEZONE
+from .batch_scoring import ChildWeekInput, score_weeks
 from .database import (
+    collect_media_garbage,
+    delete_collected_media,
     get_all_families,
-    get_completed_keys_for_date,
-    get_completed_keys_for_range,
+    get_child_tasks,
+    get_children_tasks,
+    get_completed_keys_for_children_range,
+    get_day_masks,
+    get_extra_points_for_children_range,
     get_extra_points_for_date,
-    get_extra_points_for_range,
     get_family_children,
     get_family_parents,
+    get_score_totals,
+)
+from .family_schedule import (
+    DEFAULT_SCHEDULE,
+    JOB_EVENING,
+    JOB_MORNING,
+    JOB_REMINDER,
+    JOB_WEEKLY,
+    schedule_for,
 )
 from .handlers.child import send_checklist
+from .leader import LeaderLease
+from .media_store import store_sha256, thumb_paths
+from .metrics import current_job_run, tracked_job
 from .scoring import (
-    calculate_daily_points,
     format_child_evening_summary,
     format_daily_summary,
     format_weekly_report,
 )
-from .tasks_config import REMINDER_MESSAGES, SUNDAY_TASK
+from .tasks_config import REMINDER_MESSAGES, SHOWER_KEY, SUNDAY_TASK, TaskDef
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +63,7 @@ async def _send_with_retry(coro_factory, description: str) -> bool:
                 )
                 await asyncio.sleep(RETRY_DELAY)
             else:
+                current_job_run().errors += 1
                 logger.error(
                     "%s failed after %d attempts: %s",
                     description, MAX_RETRIES + 1, e,
@@ -64,235 +71,351 @@ async def _send_with_retry(coro_factory, description: str) -> bool:
     return False
 
 
-def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
+def setup_scheduler(bot: Bot, lease: LeaderLease | None = None) -> AsyncIOScheduler:
     scheduler = AsyncIOScheduler(timezone=TIMEZONE)
 
-    # Morning checklist at 7:00
-    scheduler.add_job(
-        morning_checklist,
-        CronTrigger(hour=MORNING_HOUR, minute=MORNING_MINUTE, timezone=TIMEZONE),
-        args=[bot],
-        id="morning_checklist",
-        replace_existing=True,
-    )
-
-    # Reminders for incomplete tasks (default: 12:00, 17:00)
-    for i, hour in enumerate(REMINDER_HOURS):
-        scheduler.add_job(
-            send_reminders,
-            CronTrigger(hour=hour, minute=0, timezone=TIMEZONE),
-            args=[bot],
-            id=f"reminder_{i}",
-            replace_existing=True,
-        )
-
-    # Evening summary at DEADLINE_HOUR (default 22:00) — to parents AND child
+    # One tick per minute: families are bucketed by timezone and each bucket's
+    # morning/reminder/evening/weekly jobs fire on its own local clock.
     scheduler.add_job(
-        evening_summary,
-        CronTrigger(hour=DEADLINE_HOUR, minute=0, timezone=TIMEZONE),
-        args=[bot],
-        id="evening_summary",
+        dispatch_family_jobs,
+        CronTrigger(minute="*", timezone="UTC"),
+        args=[bot, lease],
+        id="family_clock",
         replace_existing=True,
+        misfire_grace_time=30,
+        coalesce=True,
     )
-
-    # Weekly report: Sunday at 20:00
     scheduler.add_job(
-        weekly_report,
-        CronTrigger(day_of_week="sun", hour=20, minute=0, timezone=TIMEZONE),
-        args=[bot],
-        id="weekly_report",
+        collect_media,
+        CronTrigger(hour=3, minute=30, timezone="UTC"),
+        args=[lease],
+        id="media_gc",
         replace_existing=True,
+        misfire_grace_time=3600,
+        coalesce=True,
     )
 
     return scheduler
 
 
-async def morning_checklist(bot: Bot) -> None:
-    """Send checklist to all children in all families."""
-    logger.info("Sending morning checklists")
-    families = await get_all_families()
+def _bucket_due_families(
+    families: list[dict], now: datetime
+) -> dict[tuple[str, str], tuple[date, list[dict]]]:
+    """Group families into {(job_kind, timezone): (local_today, families)}."""
+    buckets: dict[tuple[str, str], tuple[date, list[dict]]] = {}
+    local_by_tz: dict[str, datetime] = {}
     for family in families:
-        children = await get_family_children(family["id"])
-        for child in children:
-            await _send_with_retry(
-                lambda c=child: send_checklist(bot, c["telegram_id"]),
-                f"morning checklist to {child['telegram_id']}",
-            )
-
+        schedule = schedule_for(family)
+        local = local_by_tz.get(schedule.timezone)
+        if local is None:
+            local = schedule.local_now(now)
+            local_by_tz[schedule.timezone] = local
+        for kind in schedule.due_jobs(local):
+            key = (kind, schedule.timezone)
+            buckets.setdefault(key, (local.date(), []))[1].append(family)
+    return buckets
+
+
+_JOBS = {
+    JOB_MORNING: lambda bot, fams, today: morning_checklist(bot, fams),
+    JOB_REMINDER: lambda bot, fams, today: send_reminders(bot, fams, today),
+    JOB_EVENING: lambda bot, fams, today: evening_summary(bot, fams, today),
+    JOB_WEEKLY: lambda bot, fams, today: weekly_report(bot, fams, today),
+}
+
+# Keep references to running bucket tasks so they are not garbage-collected
+_running_jobs: set[asyncio.Task] = set()
+
+
+async def dispatch_family_jobs(bot: Bot, lease: LeaderLease | None = None) -> None:
+    """Minute tick: start every (job, timezone) bucket that is due right now.
+
+    Buckets run as background tasks so a long evening broadcast never makes
+    the next minute's tick miss its window. With a lease, only the replica
+    holding it dispatches.
+    """
+    if lease is not None and not lease.is_leader:
+        return
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    families = await get_all_families()
+    buckets = _bucket_due_families(families, now)
+    for (kind, tz_name), (local_today, bucket) in buckets.items():
+        logger.info(
+            "Dispatching %s for %d families in %s", kind, len(bucket), tz_name
+        )
+        task = asyncio.create_task(_JOBS[kind](bot, bucket, local_today))
+        _running_jobs.add(task)
+        task.add_done_callback(_running_jobs.discard)
 
-async def send_reminders(bot: Bot) -> None:
-    """Send motivational reminders to children with incomplete tasks."""
-    logger.info("Sending reminders")
-    today = date.today()
-    today_str = today.isoformat()
 
-    families = await get_all_families()
+@tracked_job("morning_checklist")
+async def morning_checklist(bot: Bot, families: list[dict] | None = None) -> None:
+    """Send checklist to all children in the given (default: all) families."""
+    logger.info("Sending morning checklists")
+    run = current_job_run()
+    if families is None:
+        with run.db():
+            families = await get_all_families()
     for family in families:
-        children = await get_family_children(family["id"])
+        with run.db():
+            children = await get_family_children(family["id"])
         for child in children:
-            try:
-                completed = await get_completed_keys_for_date(child["id"], today_str)
-                daily_tasks = await get_active_daily_tasks(child["id"])
-                all_daily_keys = {t.key for t in daily_tasks}
-                remaining = all_daily_keys - completed
-                if not remaining:
-                    continue
-
-                msg = random.choice(REMINDER_MESSAGES)
-                remaining_count = len(remaining)
-                text = (
-                    f"{msg}\n\n"
-                    f"⬜ Осталось задач: <b>{remaining_count}</b> из {len(daily_tasks)}"
-                )
-                await bot.send_message(
-                    child["telegram_id"], text, parse_mode="HTML"
-                )
-            except Exception as e:
-                logger.error(
-                    "Failed to send reminder to %s: %s",
-                    child["telegram_id"],
-                    e,
+            with run.recipient(), run.telegram():
+                await _send_with_retry(
+                    lambda c=child: send_checklist(bot, c["telegram_id"]),
+                    f"morning checklist to {child['telegram_id']}",
                 )
 
 
-async def evening_summary(bot: Bot) -> None:
-    """Send daily summary to parents + child evening report with deficit."""
-    logger.info("Sending evening summaries")
-    today = date.today()
-    today_str = today.isoformat()
-    is_sunday = today.weekday() == 6
-
-    # Days left in the week (today is already counted)
-    days_left = 6 - today.weekday()  # 0=Mon..6=Sun
+@tracked_job("send_reminders")
+async def send_reminders(
+    bot: Bot, families: list[dict] | None = None, today: date | None = None
+) -> None:
+    """Send motivational reminders to children with incomplete tasks.
 
-    # Week start (Monday)
-    week_start = today - timedelta(days=today.weekday())
+    `today` is the families' local date; without it each family's own is used.
+    """
+    logger.info("Sending reminders")
+    run = current_job_run()
 
-    families = await get_all_families()
+    if families is None:
+        with run.db():
+            families = await get_all_families()
     for family in families:
-        children = await get_family_children(family["id"])
-        parents = await get_family_parents(family["id"])
+        today_str = (today or schedule_for(family).local_today()).isoformat()
+        with run.db():
+            children = await get_family_children(family["id"])
         for child in children:
-            try:
-                completed_today = await get_completed_keys_for_date(
-                    child["id"], today_str
-                )
-                daily_tasks = await get_active_daily_tasks(child["id"])
-                shower_req = await child_has_shower(child["id"])
-                has_sunday = await child_has_sunday_task(child["id"])
-
-                # Extra points for today
-                extra_pts_today = await get_extra_points_for_date(
-                    child["id"], today_str
-                )
-
-                # Parent summary
-                parent_text = format_daily_summary(
-                    child["name"],
-                    today,
-                    completed_today,
-                    is_sunday and has_sunday,
-                    daily_tasks=daily_tasks,
-                    shower_required=shower_req,
-                    extra_points=extra_pts_today,
-                )
-                for parent in parents:
-                    try:
+            with run.recipient():
+                try:
+                    with run.db():
+                        bits = TaskBits(await get_child_tasks(child["id"]))
+                        done, _ = await get_day_masks(child["id"], today_str, bits)
+                    remaining_count = bits.remaining_count(done)
+                    if not remaining_count:
+                        continue
+
+                    msg = random.choice(REMINDER_MESSAGES)
+                    text = (
+                        f"{msg}\n\n"
+                        f"⬜ Осталось задач: <b>{remaining_count}</b> из {bits.daily_count}"
+                    )
+                    with run.telegram():
                         await bot.send_message(
-                            parent["telegram_id"], parent_text, parse_mode="HTML"
-                        )
-                    except Exception as e:
-                        logger.error(
-                            "Failed to send summary to parent %s: %s",
-                            parent["telegram_id"],
-                            e,
+                            child["telegram_id"], text, parse_mode="HTML"
                         )
-
-                # Calculate weekly points so far (excluding today)
-                weekly_points_so_far = 0
-                extra_weekly_so_far = 0
-                for i in range(today.weekday()):
-                    d = (week_start + timedelta(days=i)).isoformat()
-                    day_keys = await get_completed_keys_for_date(child["id"], d)
-                    weekly_points_so_far += calculate_daily_points(
-                        day_keys, daily_tasks, shower_req
-                    )
-                    extra_weekly_so_far += await get_extra_points_for_date(
-                        child["id"], d
+                except Exception as e:
+                    run.errors += 1
+                    logger.error(
+                        "Failed to send reminder to %s: %s",
+                        child["telegram_id"],
+                        e,
                     )
 
-                max_weekly = len(daily_tasks) * 7
-
-                # Child evening summary
-                child_text = format_child_evening_summary(
-                    child["name"],
-                    today,
-                    completed_today,
-                    weekly_points_so_far + extra_weekly_so_far,
-                    days_left,
-                    daily_tasks=daily_tasks,
-                    shower_required=shower_req,
-                    extra_points_today=extra_pts_today,
-                    extra_weekly=extra_weekly_so_far + extra_pts_today,
-                    max_weekly_points=max_weekly,
-                )
-                await bot.send_message(
-                    child["telegram_id"], child_text, parse_mode="HTML"
-                )
-            except Exception as e:
-                logger.error(
-                    "Failed to send evening summary for child %s: %s",
-                    child["telegram_id"],
-                    e,
-                )
 
+@tracked_job("evening_summary")
+async def evening_summary(
+    bot: Bot, families: list[dict] | None = None, today: date | None = None
+) -> None:
+    """Send daily summary to parents + child evening report with deficit.
 
-async def weekly_report(bot: Bot) -> None:
-    """Send weekly report to all parents."""
-    logger.info("Sending weekly reports")
-    today = date.today()
-    start = today - timedelta(days=today.weekday())  # Monday
-    end = start + timedelta(days=6)  # Sunday
+    `today` is the families' local date; without it each family's own is used.
+    """
+    logger.info("Sending evening summaries")
+    run = current_job_run()
 
-    families = await get_all_families()
+    if families is None:
+        with run.db():
+            families = await get_all_families()
     for family in families:
-        children = await get_family_children(family["id"])
-        parents = await get_family_parents(family["id"])
+        day = today or schedule_for(family).local_today()
+        today_str = day.isoformat()
+        is_sunday = day.weekday() == 6
+        # Days left in the week (today is already counted)
+        days_left = 6 - day.weekday()  # 0=Mon..6=Sun
+        with run.db():
+            children = await get_family_children(family["id"])
+            parents = await get_family_parents(family["id"])
         for child in children:
-            daily_completed = await get_completed_keys_for_range(
-                child["id"], start.isoformat(), end.isoformat()
-            )
-            for i in range(7):
-                d = (start + timedelta(days=i)).isoformat()
-                daily_completed.setdefault(d, set())
-
-            sunday_str = end.isoformat()
-            has_sunday = await child_has_sunday_task(child["id"])
-            sunday_done = has_sunday and SUNDAY_TASK.key in daily_completed.get(sunday_str, set())
-
-            daily_tasks = await get_active_daily_tasks(child["id"])
-            shower_req = await child_has_shower(child["id"])
+            with run.recipient():
+                try:
+                    with run.db():
+                        rows = await get_child_tasks(child["id"])
+                        bits = TaskBits(rows)
+                        done_today, _ = await get_day_masks(child["id"], today_str, bits)
+
+                        # Extra points for today
+                        extra_pts_today = await get_extra_points_for_date(
+                            child["id"], today_str
+                        )
+                    completed_today = bits.decode(done_today)
+                    daily_tasks = tuple(
+                        TaskDef(key=r["task_key"], label=r["label"], group=r["task_group"])
+                        for r in rows
+                        if r["task_group"] != "sunday"
+                    )
+                    shower_req = bits.shower_required
+                    has_sunday = bits.sunday_bit != 0
+
+                    # Parent summary
+                    parent_text = format_daily_summary(
+                        child["name"],
+                        day,
+                        completed_today,
+                        is_sunday and has_sunday,
+                        daily_tasks=daily_tasks,
+                        shower_required=shower_req,
+                        extra_points=extra_pts_today,
+                    )
+                    for parent in parents:
+                        try:
+                            with run.telegram():
+                                await bot.send_message(
+                                    parent["telegram_id"], parent_text, parse_mode="HTML"
+                                )
+                        except Exception as e:
+                            run.errors += 1
+                            logger.error(
+                                "Failed to send summary to parent %s: %s",
+                                parent["telegram_id"],
+                                e,
+                            )
+
+                    # Weekly points so far (excluding today) from the score ledger
+                    with run.db():
+                        totals = await get_score_totals(child["id"], today_str)
+                    weekly_points_so_far = totals["week_base"] - totals["day_base"]
+                    extra_weekly_so_far = totals["week_extra"] - totals["day_extra"]
+
+                    max_weekly = len(daily_tasks) * 7
+
+                    # Child evening summary
+                    child_text = format_child_evening_summary(
+                        child["name"],
+                        day,
+                        completed_today,
+                        weekly_points_so_far + extra_weekly_so_far,
+                        days_left,
+                        daily_tasks=daily_tasks,
+                        shower_required=shower_req,
+                        extra_points_today=extra_pts_today,
+                        extra_weekly=extra_weekly_so_far + extra_pts_today,
+                        max_weekly_points=max_weekly,
+                    )
+                    with run.telegram():
+                        await bot.send_message(
+                            child["telegram_id"], child_text, parse_mode="HTML"
+                        )
+                except Exception as e:
+                    run.errors += 1
+                    logger.error(
+                        "Failed to send evening summary for child %s: %s",
+                        child["telegram_id"],
+                        e,
+                    )
 
-            extra_pts = await get_extra_points_for_range(
-                child["id"], start.isoformat(), end.isoformat()
-            )
-            max_weekly = len(daily_tasks) * 7
 
+@tracked_job("weekly_report")
+async def weekly_report(
+    bot: Bot, families: list[dict] | None = None, today: date | None = None
+) -> None:
+    """Send weekly report to all parents (scores computed in one batch)."""
+    logger.info("Sending weekly reports")
+    run = current_job_run()
+    # One week for all the given families; the dispatcher buckets them by timezone
+    today = today or DEFAULT_SCHEDULE.local_today()
+    start = today - timedelta(days=today.weekday())  # Monday
+    end = start + timedelta(days=6)  # Sunday
+    days = [(start + timedelta(days=i)).isoformat() for i in range(7)]
+    sunday_str = end.isoformat()
+
+    with run.db():
+        if families is None:
+            families = await get_all_families()
+        recipients: list[tuple[dict, list[dict]]] = []
+        for family in families:
+            children = await get_family_children(family["id"])
+            parents = await get_family_parents(family["id"])
+            recipients.extend((child, parents) for child in children)
+
+        child_ids = [child["id"] for child, _ in recipients]
+        completed_by_child = await get_completed_keys_for_children_range(
+            child_ids, start.isoformat(), end.isoformat()
+        )
+        extra_by_child = await get_extra_points_for_children_range(
+            child_ids, start.isoformat(), end.isoformat()
+        )
+        tasks_by_child = await get_children_tasks(child_ids)
+
+    inputs: list[ChildWeekInput] = []
+    for child, _ in recipients:
+        rows = tasks_by_child[child["id"]]
+        daily_completed = completed_by_child[child["id"]]
+        for d in days:
+            daily_completed.setdefault(d, set())
+        daily_tasks = tuple(
+            TaskDef(key=r["task_key"], label=r["label"], group=r["task_group"])
+            for r in rows
+            if r["task_group"] != "sunday"
+        )
+        has_sunday = any(r["task_key"] == SUNDAY_TASK.key for r in rows)
+        inputs.append(ChildWeekInput(
+            child_id=child["id"],
+            daily_completed=daily_completed,
+            sunday_done=has_sunday and SUNDAY_TASK.key in daily_completed[sunday_str],
+            daily_tasks=daily_tasks,
+            shower_required=any(r["task_key"] == SHOWER_KEY for r in rows),
+            extra_points_per_day=extra_by_child[child["id"]],
+            max_weekly_points=len(daily_tasks) * 7,
+        ))
+    results = score_weeks(inputs, days)
+
+    for (child, parents), week in zip(recipients, inputs):
+        with run.recipient():
             text = format_weekly_report(
-                child["name"], start, end, daily_completed, sunday_done,
-                daily_tasks=daily_tasks,
-                shower_required=shower_req,
-                extra_points_per_day=extra_pts,
-                max_weekly_points=max_weekly,
+                child["name"], start, end, week.daily_completed, week.sunday_done,
+                daily_tasks=week.daily_tasks,
+                shower_required=week.shower_required,
+                extra_points_per_day=week.extra_points_per_day,
+                max_weekly_points=week.max_weekly_points,
+                result=results[child["id"]],
             )
             for parent in parents:
                 try:
-                    await bot.send_message(
-                        parent["telegram_id"], text, parse_mode="HTML"
-                    )
+                    with run.telegram():
+                        await bot.send_message(
+                            parent["telegram_id"], text, parse_mode="HTML"
+                        )
                 except Exception as e:
+                    run.errors += 1
                     logger.error(
                         "Failed to send report to %s: %s",
                         parent["telegram_id"],
                         e,
                     )
+
+
+async def collect_media(lease: LeaderLease | None = None) -> None:
+    """Delete uploaded media no completion/extra task has used for a while."""
+    # Checked outside the tracked job, so standby replicas record no job_runs row
+    if lease is not None and not lease.is_leader:
+        return
+    await _collect_media()
+
+
+@tracked_job("media_gc")
+async def _collect_media() -> None:
+    paths = await collect_media_garbage()
+
+    def unlink_all(doomed: list[str]) -> None:
+        for path in doomed:
+            (DATA_DIR / path).unlink(missing_ok=True)
+            for thumb in thumb_paths(store_sha256(path) or ""):
+                (DATA_DIR / thumb).unlink(missing_ok=True)
+
+    removed = await delete_collected_media(paths, unlink_all)
+    if paths:
+        logger.info(
+            "Media GC removed %d unreferenced files (%d uploaded again meanwhile)",
+            len(removed), len(paths) - len(removed),
+        )
@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import date
+from functools import lru_cache
 from math import ceil
 
 from .tasks_config import (
@@ -38,18 +40,14 @@ def calculate_daily_total(
     return calculate_daily_points(completed_keys, daily_tasks, shower_required) + extra_points
 
 
-def get_money_percentage(total_points: int, max_weekly_points: int | None = None) -> int:
-    """Compute money percentage using adaptive thresholds.
+def _default_max_weekly() -> int:
+    return len(DAILY_TASKS) * 7
 
-    If max_weekly_points is given, thresholds are computed dynamically.
-    Otherwise falls back to default max (len(DAILY_TASKS) * 7).
-    """
-    if max_weekly_points is None:
-        max_weekly_points = len(DAILY_TASKS) * 7
 
+def _compute_money_percentage(total_points: int, max_weekly_points: int) -> int:
+    """Reference tier rule: first threshold in TIER_THRESHOLDS that is reached."""
     if max_weekly_points <= 0:
         return 0
-
     for fraction, pct in TIER_THRESHOLDS:
         threshold = ceil(max_weekly_points * fraction)
         if total_points >= threshold:
@@ -57,16 +55,12 @@ def get_money_percentage(total_points: int, max_weekly_points: int | None = None
     return 0
 
 
-def points_to_next_tier(total_points: int, max_weekly_points: int | None = None) -> tuple[int, int] | None:
-    """Return (points_needed, next_percentage) or None if already at max."""
-    if max_weekly_points is None:
-        max_weekly_points = len(DAILY_TASKS) * 7
-
-    current_pct = get_money_percentage(total_points, max_weekly_points)
-
-    # Sort thresholds ascending by percentage
-    sorted_tiers = sorted(TIER_THRESHOLDS, key=lambda t: t[1])
-    for fraction, pct in sorted_tiers:
+def _compute_points_to_next_tier(
+    total_points: int, max_weekly_points: int
+) -> tuple[int, int] | None:
+    """Reference rule: cheapest higher tier that still needs points."""
+    current_pct = _compute_money_percentage(total_points, max_weekly_points)
+    for fraction, pct in sorted(TIER_THRESHOLDS, key=lambda t: t[1]):
         if pct > current_pct:
             threshold = ceil(max_weekly_points * fraction)
             deficit = threshold - total_points
@@ -75,6 +69,68 @@ def points_to_next_tier(total_points: int, max_weekly_points: int | None = None)
     return None
 
 
+@dataclass(frozen=True)
+class TierTable:
+    """Tier lookups for one max_weekly_points, precomputed for every point total.
+
+    Index = weekly points from 0 up to the highest threshold; any total above
+    it reaches every tier, so it maps to the last entry.
+    """
+
+    max_weekly_points: int
+    percents: tuple[int, ...]
+    next_tiers: tuple[tuple[int, int] | None, ...]
+
+    @property
+    def top(self) -> int:
+        return len(self.percents) - 1
+
+    def lookup(self, total_points: int) -> tuple[int, tuple[int, int] | None]:
+        """Return (money_percent, (points_needed, next_percent) or None)."""
+        if total_points < 0:
+            return (
+                _compute_money_percentage(total_points, self.max_weekly_points),
+                _compute_points_to_next_tier(total_points, self.max_weekly_points),
+            )
+        i = min(total_points, self.top)
+        return self.percents[i], self.next_tiers[i]
+
+
+@lru_cache(maxsize=256)
+def tier_table(max_weekly_points: int) -> TierTable:
+    """Compiled (and cached) TierTable for a max_weekly_points value."""
+    top = max(
+        [0] + [ceil(max_weekly_points * fraction) for fraction, _ in TIER_THRESHOLDS]
+    )
+    return TierTable(
+        max_weekly_points=max_weekly_points,
+        percents=tuple(
+            _compute_money_percentage(p, max_weekly_points) for p in range(top + 1)
+        ),
+        next_tiers=tuple(
+            _compute_points_to_next_tier(p, max_weekly_points) for p in range(top + 1)
+        ),
+    )
+
+
+def get_money_percentage(total_points: int, max_weekly_points: int | None = None) -> int:
+    """Compute money percentage using adaptive thresholds.
+
+    If max_weekly_points is given, thresholds are computed dynamically.
+    Otherwise falls back to default max (len(DAILY_TASKS) * 7).
+    """
+    if max_weekly_points is None:
+        max_weekly_points = _default_max_weekly()
+    return tier_table(max_weekly_points).lookup(total_points)[0]
+
+
+def points_to_next_tier(total_points: int, max_weekly_points: int | None = None) -> tuple[int, int] | None:
+    """Return (points_needed, next_percentage) or None if already at max."""
+    if max_weekly_points is None:
+        max_weekly_points = _default_max_weekly()
+    return tier_table(max_weekly_points).lookup(total_points)[1]
+
+
 def calculate_weekly_result(
     daily_completed: dict[str, set[str]],
     sunday_done: bool,
@@ -195,10 +251,9 @@ def format_child_evening_summary(
     total = weekly_points_so_far + today_total
     lines.append(f"За неделю пока: <b>{total}</b> баллов")
 
-    current_pct = get_money_percentage(total, max_weekly_points)
+    current_pct, next_tier = tier_table(max_weekly_points).lookup(total)
     lines.append(f"Сейчас твой уровень: <b>{current_pct}%</b> карманных денег")
 
-    next_tier = points_to_next_tier(total, max_weekly_points)
     if next_tier:
         deficit, next_pct = next_tier
         if days_left > 0:
@@ -229,12 +284,15 @@ def format_weekly_report(
     shower_required: bool = True,
     extra_points_per_day: dict[str, int] | None = None,
     max_weekly_points: int | None = None,
+    result: dict | None = None,
 ) -> str:
-    result = calculate_weekly_result(
-        daily_completed, sunday_done, daily_tasks, shower_required,
-        extra_points_per_day=extra_points_per_day,
-        max_weekly_points=max_weekly_points,
-    )
+    """Weekly report text. `result` may be passed in precomputed (batch scoring)."""
+    if result is None:
+        result = calculate_weekly_result(
+            daily_completed, sunday_done, daily_tasks, shower_required,
+            extra_points_per_day=extra_points_per_day,
+            max_weekly_points=max_weekly_points,
+        )
     dp = result["daily_points"]
     tasks = daily_tasks if daily_tasks is not None else DAILY_TASKS
     max_pts = len(tasks)
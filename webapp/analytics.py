@@ -0,0 +1,297 @@
+"""Long-range child analytics, aggregated in SQLite.
+
+Everything is computed by window functions and aggregates over completions,
+child_tasks and the score ledger (score_weeks), so a multi-year range costs a
+handful of indexed queries regardless of how many days it spans. Scores use the
+child's current task list, like the weekly report.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import date, timedelta
+
+from bot.scoring import tier_table
+from bot.tasks_config import POINTS_PER_TASK, SHOWER_KEY, SUNDAY_PENALTY, SUNDAY_TASK
+from webapp.db import get_db
+
+MAX_RANGE_DAYS = 3660
+
+WEEKDAY_NAMES = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+# One row per calendar day in [:start, :end] with that day's approved daily
+# tasks (enabled, non-Sunday) and the shower gate applied.
+_DAYS_CTE = """
+WITH RECURSIVE cal(day) AS (
+    SELECT :start
+    UNION ALL
+    SELECT date(day, '+1 day') FROM cal WHERE day < :end
+),
+rules AS (
+    SELECT
+        COALESCE(SUM(task_key = :shower), 0) AS shower_req,
+        COALESCE(SUM(task_group != 'sunday'), 0) AS daily_count
+    FROM child_tasks WHERE child_id = :child_id AND enabled = 1
+),
+done AS (
+    SELECT c.date, COUNT(*) AS n_done, MAX(c.task_key = :shower) AS shower_done
+    FROM completions c
+    JOIN child_tasks ct
+      ON ct.child_id = c.child_id AND ct.task_key = c.task_key
+     AND ct.enabled = 1 AND ct.task_group != 'sunday'
+    WHERE c.child_id = :child_id AND c.approved = 1 AND c.date BETWEEN :start AND :end
+    GROUP BY c.date
+),
+days AS (
+    SELECT
+        cal.day,
+        CAST(strftime('%w', cal.day) AS INTEGER) AS dow,
+        COALESCE(done.n_done, 0) AS n_done,
+        rules.shower_req AND NOT COALESCE(done.shower_done, 0) AS gated,
+        rules.daily_count > 0 AND COALESCE(done.n_done, 0) = rules.daily_count AS full
+    FROM cal CROSS JOIN rules LEFT JOIN done ON done.date = cal.day
+),
+scored AS (
+    SELECT *, CASE WHEN gated THEN 0 ELSE n_done * :ppt END AS points FROM days
+)
+"""
+
+
+async def _task_stats(params: dict) -> list[dict]:
+    """Per enabled task: approved days, best and current streak (gaps-and-islands).
+
+    The Sunday task streaks over consecutive Sundays instead of days.
+    """
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        """
+        WITH hits AS (
+            SELECT ct.task_key, c.date,
+                   CASE WHEN ct.task_group = 'sunday'
+                        THEN CAST(julianday(c.date) AS INTEGER) / 7
+                        ELSE CAST(julianday(c.date) AS INTEGER) END
+                   - ROW_NUMBER() OVER (PARTITION BY ct.task_key ORDER BY c.date) AS grp,
+                   ct.task_group = 'sunday' AS weekly
+            FROM completions c
+            JOIN child_tasks ct ON ct.child_id = c.child_id AND ct.task_key = c.task_key
+            WHERE c.child_id = :child_id AND c.approved = 1 AND ct.enabled = 1
+              AND c.date BETWEEN :start AND :end
+        ),
+        runs AS (
+            SELECT task_key, COUNT(*) AS len, MAX(date) AS last_day, MAX(weekly) AS weekly
+            FROM hits GROUP BY task_key, grp
+        ),
+        per_task AS (
+            SELECT task_key,
+                   SUM(len) AS done_days,
+                   MAX(len) AS best_streak,
+                   MAX(CASE WHEN last_day >= date(:end, CASE WHEN weekly THEN '-7 days' ELSE '-1 day' END)
+                            THEN len ELSE 0 END) AS current_streak
+            FROM runs GROUP BY task_key
+        )
+        SELECT ct.task_key, ct.label, ct.task_group,
+               COALESCE(p.done_days, 0) AS done_days,
+               COALESCE(p.best_streak, 0) AS best_streak,
+               COALESCE(p.current_streak, 0) AS current_streak
+        FROM child_tasks ct LEFT JOIN per_task p ON p.task_key = ct.task_key
+        WHERE ct.child_id = :child_id AND ct.enabled = 1
+        ORDER BY ct.sort_order
+        """,
+        params,
+    )
+    return [dict(r) for r in rows]
+
+
+async def _weekday_breakdown(params: dict) -> list[dict]:
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        _DAYS_CTE + """
+        SELECT dow, COUNT(*) AS days, AVG(points) AS avg_points, AVG(full) AS full_rate
+        FROM scored GROUP BY dow
+        """,
+        params,
+    )
+    by_dow = {r["dow"]: r for r in rows}
+    # Monday-first, like the reports; %w is Sunday = 0
+    return [
+        {
+            "weekday": WEEKDAY_NAMES[i],
+            "days": by_dow[(i + 1) % 7]["days"],
+            "avg_points": round(by_dow[(i + 1) % 7]["avg_points"], 2),
+            "full_rate": round(by_dow[(i + 1) % 7]["full_rate"], 3),
+        }
+        for i in range(7)
+        if (i + 1) % 7 in by_dow
+    ]
+
+
+async def _day_summary(params: dict) -> dict:
+    """Weekday/weekend split, shower-gate misses and full-day streaks."""
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        _DAYS_CTE + """
+        , full_runs AS (
+            SELECT COUNT(*) AS len, MAX(day) AS last_day
+            FROM (
+                SELECT day, CAST(julianday(day) AS INTEGER)
+                            - ROW_NUMBER() OVER (ORDER BY day) AS grp
+                FROM scored WHERE full
+            )
+            GROUP BY grp
+        )
+        SELECT
+            COUNT(*) AS days,
+            SUM(points) AS points,
+            AVG(CASE WHEN dow NOT IN (0, 6) THEN points END) AS weekday_avg,
+            AVG(CASE WHEN dow IN (0, 6) THEN points END) AS weekend_avg,
+            AVG(CASE WHEN dow NOT IN (0, 6) THEN full END) AS weekday_full_rate,
+            AVG(CASE WHEN dow IN (0, 6) THEN full END) AS weekend_full_rate,
+            SUM(full) AS full_days,
+            SUM(gated AND n_done > 0) AS shower_misses,
+            SUM(CASE WHEN gated THEN n_done * :ppt ELSE 0 END) AS points_lost,
+            (SELECT COALESCE(MAX(len), 0) FROM full_runs) AS best_full_streak,
+            (SELECT COALESCE(MAX(len), 0) FROM full_runs
+              WHERE last_day >= date(:end, '-1 day')) AS current_full_streak
+        FROM scored
+        """,
+        params,
+    )
+    r = rows[0]
+
+    def _r(value, digits: int) -> float | None:
+        return round(value, digits) if value is not None else None
+
+    return {
+        "days": r["days"],
+        "points": r["points"] or 0,
+        "weekday": {"avg_points": _r(r["weekday_avg"], 2), "full_rate": _r(r["weekday_full_rate"], 3)},
+        "weekend": {"avg_points": _r(r["weekend_avg"], 2), "full_rate": _r(r["weekend_full_rate"], 3)},
+        "full_days": {
+            "count": r["full_days"] or 0,
+            "best_streak": r["best_full_streak"],
+            "current_streak": r["current_full_streak"],
+        },
+        "shower_misses": {"days": r["shower_misses"] or 0, "points_lost": r["points_lost"] or 0},
+    }
+
+
+async def _monthly_trend(params: dict, first_monday: date, last_monday: date) -> list[dict]:
+    """Money percent per finished week (from score_weeks), averaged per month.
+
+    Weeks belong to the month of their Monday; `rolling_percent` is the
+    three-month moving average.
+    """
+    if last_monday < first_monday:
+        return []
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        """
+        WITH RECURSIVE weeks(week_start) AS (
+            SELECT :first_monday
+            UNION ALL
+            SELECT date(week_start, '+7 days') FROM weeks WHERE week_start < :last_monday
+        ),
+        sundays AS (
+            SELECT date FROM completions
+            WHERE child_id = :child_id AND task_key = :sunday_key AND approved = 1
+              AND date BETWEEN :first_monday AND date(:last_monday, '+6 days')
+        ),
+        weekly AS (
+            SELECT w.week_start,
+                   MAX(COALESCE(sw.base_points + sw.extra_points, 0)
+                       - CASE WHEN :has_sunday AND s.date IS NOT NULL THEN 0 ELSE :penalty END,
+                       0) AS total
+            FROM weeks w
+            LEFT JOIN score_weeks sw ON sw.child_id = :child_id AND sw.week_start = w.week_start
+            LEFT JOIN sundays s ON s.date = date(w.week_start, '+6 days')
+        ),
+        priced AS (
+            SELECT week_start, total,
+                   json_extract(:percents, '$[' || MIN(total, :top) || ']') AS money_percent
+            FROM weekly
+        )
+        SELECT strftime('%Y-%m', week_start) AS month,
+               COUNT(*) AS weeks,
+               AVG(total) AS avg_points,
+               AVG(money_percent) AS avg_percent,
+               MIN(money_percent) AS min_percent,
+               MAX(money_percent) AS max_percent,
+               AVG(AVG(money_percent)) OVER (
+                   ORDER BY strftime('%Y-%m', week_start)
+                   ROWS BETWEEN 2 PRECEDING AND CURRENT ROW
+               ) AS rolling_percent
+        FROM priced
+        GROUP BY month
+        ORDER BY month
+        """,
+        {
+            **params,
+            "first_monday": first_monday.isoformat(),
+            "last_monday": last_monday.isoformat(),
+        },
+    )
+    return [
+        {
+            "month": r["month"],
+            "weeks": r["weeks"],
+            "avg_points": round(r["avg_points"], 1),
+            "avg_percent": round(r["avg_percent"], 1),
+            "min_percent": r["min_percent"],
+            "max_percent": r["max_percent"],
+            "rolling_percent": round(r["rolling_percent"], 1),
+        }
+        for r in rows
+    ]
+
+
+def _count_weekday(start: date, end: date, weekday: int) -> int:
+    """How many dates in [start, end] fall on `weekday` (0 = Monday)."""
+    first = start + timedelta(days=(weekday - start.weekday()) % 7)
+    return 0 if first > end else (end - first).days // 7 + 1
+
+
+async def child_analytics(child_id: int, start: date, end: date) -> dict:
+    """All analytics sections for one child over [start, end] (inclusive)."""
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        "SELECT task_key, task_group FROM child_tasks WHERE child_id = ? AND enabled = 1",
+        (child_id,),
+    )
+    daily_count = sum(1 for r in rows if r["task_group"] != "sunday")
+    has_sunday = any(r["task_key"] == SUNDAY_TASK.key for r in rows)
+    table = tier_table(daily_count * 7)
+
+    params = {
+        "child_id": child_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "shower": SHOWER_KEY,
+        "ppt": POINTS_PER_TASK,
+        "sunday_key": SUNDAY_TASK.key,
+        "has_sunday": int(has_sunday),
+        "penalty": SUNDAY_PENALTY,
+        "percents": json.dumps(table.percents),
+        "top": table.top,
+    }
+
+    n_days = (end - start).days + 1
+    n_sundays = _count_weekday(start, end, 6)
+    tasks = await _task_stats(params)
+    for t in tasks:
+        possible = n_sundays if t["task_group"] == "sunday" else n_days
+        t["possible_days"] = possible
+        t["rate"] = round(t["done_days"] / possible, 3) if possible else None
+
+    # Only weeks fully inside the range count toward the money trend
+    first_monday = start + timedelta(days=(7 - start.weekday()) % 7)
+    last_monday = end - timedelta(days=(end.weekday() + 1) % 7) - timedelta(days=6)
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "max_daily": daily_count,
+        "tasks": tasks,
+        "weekdays": await _weekday_breakdown(params),
+        "summary": await _day_summary(params),
+        "monthly": await _monthly_trend(params, first_monday, last_monday),
+    }
@@ -1,17 +1,24 @@
-"""Telegram Mini App initData validation (HMAC-SHA256)."""
+"""Telegram Mini App initData validation (HMAC-SHA256) and signed media links."""
 
 from __future__ import annotations
 
 import hashlib
 import hmac
 import json
-from urllib.parse import parse_qs, unquote
+import time
+from urllib.parse import parse_qs, quote, unquote, urlencode
 
 from aiohttp import web
 
 from bot.config import BOT_TOKEN
 from .db import get_user_by_telegram_id
 
+MEDIA_PREFIX = "/api/media/"
+# Signed /api/media links expire on TTL boundaries, between one and two TTLs
+# after issue, so a link stays byte-identical (and browser-cached) for a while
+MEDIA_LINK_TTL = 6 * 3600
+_MEDIA_KEY = hmac.new(b"MediaLink", BOT_TOKEN.encode(), hashlib.sha256).digest()
+
 
 def _validate_init_data(init_data: str) -> dict | None:
     """Validate Telegram WebApp initData and return parsed data or None."""
@@ -53,20 +60,61 @@ def _validate_init_data(init_data: str) -> dict | None:
     }
 
 
+def _media_signature(file_id: str, telegram_id: int, expires: int) -> str:
+    message = f"{file_id}\n{telegram_id}\n{expires}".encode()
+    return hmac.new(_MEDIA_KEY, message, hashlib.sha256).hexdigest()
+
+
+def media_url(file_id: str | None, telegram_id: int) -> str | None:
+    """Browser URL of a photo/video for <img>/<video>, which can't send the tma header.
+
+    Local uploads are static files; Telegram file_ids get an /api/media link
+    signed for this user.
+    """
+    if not file_id:
+        return None
+    if file_id.startswith("uploads/"):
+        return f"/{file_id}"
+    expires = (int(time.time()) // MEDIA_LINK_TTL + 2) * MEDIA_LINK_TTL
+    query = urlencode({
+        "u": telegram_id, "exp": expires, "sig": _media_signature(file_id, telegram_id, expires),
+    })
+    return f"{MEDIA_PREFIX}{quote(file_id, safe='')}?{query}"
+
+
+def _validate_media_link(request: web.Request) -> dict | None:
+    """tg_data-like dict for a valid signed /api/media link, else None."""
+    try:
+        telegram_id = int(request.query["u"])
+        expires = int(request.query["exp"])
+        sig = request.query["sig"]
+    except (KeyError, ValueError):
+        return None
+    if expires < time.time():
+        return None
+    file_id = request.match_info.get("file_id", "")
+    if not hmac.compare_digest(_media_signature(file_id, telegram_id, expires), sig):
+        return None
+    return {"telegram_id": telegram_id}
+
+
 @web.middleware
 async def auth_middleware(request: web.Request, handler):
-    """Middleware: validate Authorization header for /api/* routes."""
+    """Middleware: validate Authorization header (or a signed media link) for /api/* routes."""
     if not request.path.startswith("/api/"):
         return await handler(request)
 
     auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("tma "):
+    if request.path.startswith(MEDIA_PREFIX) and "sig" in request.query:
+        tg_data = _validate_media_link(request)
+        if not tg_data:
+            return web.json_response({"error": "Invalid or expired media link"}, status=401)
+    elif not auth_header.startswith("tma "):
         return web.json_response({"error": "Missing authorization"}, status=401)
-
-    init_data = auth_header[4:]
-    tg_data = _validate_init_data(init_data)
-    if not tg_data:
-        return web.json_response({"error": "Invalid initData"}, status=401)
+    else:
+        tg_data = _validate_init_data(auth_header[4:])
+        if not tg_data:
+            return web.json_response({"error": "Invalid initData"}, status=401)
 
     telegram_id = tg_data["telegram_id"]
     if not telegram_id:
@@ -2,37 +2,94 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+
 import aiosqlite
 
+from bot import approvals, ledger, media_store
+from bot.bitset import TaskBits
 from bot.config import DB_PATH
+from bot.db_stats import instrument
 
 _db: aiosqlite.Connection | None = None
+# Dedicated connection for read_snapshot(); the shared one can't hold a
+# transaction open while other requests write through it.
+_snapshot_db: aiosqlite.Connection | None = None
+_snapshot_lock = asyncio.Lock()
+_snapshot_conn: contextvars.ContextVar[aiosqlite.Connection | None] = contextvars.ContextVar(
+    "snapshot_conn", default=None
+)
+
+
+async def _connect() -> aiosqlite.Connection:
+    db = instrument(await aiosqlite.connect(DB_PATH))
+    db.row_factory = aiosqlite.Row
+    await db.execute("PRAGMA journal_mode=WAL")
+    await db.execute("PRAGMA foreign_keys = ON")
+    await db.execute("PRAGMA recursive_triggers = ON")  # media refcounts
+    return db
 
 
 async def get_db() -> aiosqlite.Connection:
     global _db
+    snapshot = _snapshot_conn.get()
+    if snapshot is not None:
+        return snapshot
     if _db is None:
-        _db = await aiosqlite.connect(DB_PATH)
-        _db.row_factory = aiosqlite.Row
-        await _db.execute("PRAGMA journal_mode=WAL")
-        await _db.execute("PRAGMA foreign_keys = ON")
+        _db = await _connect()
     return _db
 
 
+@asynccontextmanager
+async def read_snapshot():
+    """Serve every query in the block from one read transaction.
+
+    All get_db() callers in the block see the database as of its first read,
+    so a multi-query response can't mix states from before and after a
+    concurrent write. Blocks are serialized on one connection; keep them short,
+    and read-only: a commit inside one would end the snapshot early.
+    """
+    global _snapshot_db
+    if _snapshot_conn.get() is not None:
+        yield
+        return
+    async with _snapshot_lock:
+        if _snapshot_db is None:
+            _snapshot_db = await _connect()
+        await _snapshot_db.execute("BEGIN")
+        token = _snapshot_conn.set(_snapshot_db)
+        try:
+            yield
+        finally:
+            _snapshot_conn.reset(token)
+            await _snapshot_db.rollback()
+
+
 async def close_db() -> None:
-    global _db
+    global _db, _snapshot_db
     if _db is not None:
         await _db.close()
         _db = None
+    if _snapshot_db is not None:
+        await _snapshot_db.close()
+        _snapshot_db = None
 
 
 # ── User queries ────────────────────────────────────────
 
 
 async def get_user_by_telegram_id(telegram_id: int) -> dict | None:
+    """The user row plus family_timezone, so routes know the family's date without a query."""
     db = await get_db()
     rows = await db.execute_fetchall(
-        "SELECT * FROM users WHERE telegram_id = ?", (telegram_id,)
+        """SELECT u.*, f.timezone AS family_timezone
+           FROM users u LEFT JOIN families f ON f.id = u.family_id
+           WHERE u.telegram_id = ?""",
+        (telegram_id,),
     )
     return dict(rows[0]) if rows else None
 
@@ -64,6 +121,15 @@ async def get_family_parents(family_id: int) -> list[dict]:
     return [dict(r) for r in rows]
 
 
+async def get_family_members(family_id: int) -> list[dict]:
+    """Parents and children of a family in one query (split on `role`)."""
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        "SELECT * FROM users WHERE family_id = ? ORDER BY id", (family_id,)
+    )
+    return [dict(r) for r in rows]
+
+
 async def get_family_invite_code(family_id: int) -> str | None:
     db = await get_db()
     rows = await db.execute_fetchall(
@@ -72,6 +138,41 @@ async def get_family_invite_code(family_id: int) -> str | None:
     return rows[0]["invite_code"] if rows else None
 
 
+async def get_family(family_id: int) -> dict | None:
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        "SELECT * FROM families WHERE id = ?", (family_id,)
+    )
+    return dict(rows[0]) if rows else None
+
+
+async def set_family_schedule(
+    family_id: int,
+    timezone: str | None = None,
+    morning_hour: int | None = None,
+    morning_minute: int | None = None,
+    reminder_hours: str | None = None,
+    deadline_hour: int | None = None,
+) -> None:
+    updates = {
+        "timezone": timezone,
+        "morning_hour": morning_hour,
+        "morning_minute": morning_minute,
+        "reminder_hours": reminder_hours,
+        "deadline_hour": deadline_hour,
+    }
+    updates = {k: v for k, v in updates.items() if v is not None}
+    if not updates:
+        return
+    db = await get_db()
+    assignments = ", ".join(f"{col} = ?" for col in updates)
+    await db.execute(
+        f"UPDATE families SET {assignments} WHERE id = ?",
+        (*updates.values(), family_id),
+    )
+    await db.commit()
+
+
 # ── Completions ─────────────────────────────────────────
 
 
@@ -107,29 +208,99 @@ async def get_completed_keys_for_range(
     return result
 
 
+async def get_children_day_keys(
+    day: str, child_ids: list[int]
+) -> dict[int, tuple[set[str], set[str]]]:
+    """{child_id: (approved keys, pending keys)} for one day, in one query."""
+    if not child_ids:
+        return {}
+    db = await get_db()
+    placeholders = ",".join("?" * len(child_ids))
+    rows = await db.execute_fetchall(
+        f"""SELECT child_id, task_key, approved FROM completions
+            WHERE date = ? AND child_id IN ({placeholders})""",
+        (day, *child_ids),
+    )
+    keys: dict[int, tuple[set[str], set[str]]] = {cid: (set(), set()) for cid in child_ids}
+    for r in rows:
+        keys[r["child_id"]][0 if r["approved"] else 1].add(r["task_key"])
+    return keys
+
+
+async def has_activity_before(child_id: int, day: str) -> bool:
+    """Any completion or extra task of the child dated before `day`."""
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        """SELECT EXISTS(SELECT 1 FROM completions WHERE child_id = ? AND date < ?)
+               OR EXISTS(SELECT 1 FROM extra_tasks WHERE child_id = ? AND date < ?) AS found""",
+        (child_id, day, child_id, day),
+    )
+    return bool(rows[0]["found"])
+
+
+async def get_children_day_masks(
+    day: str, bits_by_child: dict[int, TaskBits]
+) -> dict[int, tuple[int, int]]:
+    """Batch form of get_day_masks: {child_id: (approved_mask, pending_mask)}."""
+    if not bits_by_child:
+        return {}
+    db = await get_db()
+    placeholders = ",".join("?" * len(bits_by_child))
+    rows = await db.execute_fetchall(
+        f"""SELECT child_id, task_key, approved FROM completions
+            WHERE date = ? AND child_id IN ({placeholders})""",
+        (day, *bits_by_child),
+    )
+    masks = {cid: [0, 0] for cid in bits_by_child}
+    for r in rows:
+        bit = bits_by_child[r["child_id"]].bit_of.get(r["task_key"], 0)
+        masks[r["child_id"]][0 if r["approved"] else 1] |= bit
+    return {cid: (done, pending) for cid, (done, pending) in masks.items()}
+
+
 async def complete_task(
     child_id: int, task_key: str, today: str, photo_file_id: str | None = None, media_type: str = "photo"
 ) -> int:
     db = await get_db()
+    was_approved = await _is_task_approved(child_id, task_key, today)
     cursor = await db.execute(
         """INSERT OR REPLACE INTO completions
            (child_id, task_key, date, photo_file_id, media_type, approved)
            VALUES (?, ?, ?, ?, ?, 0)""",
         (child_id, task_key, today, photo_file_id, media_type),
     )
+    if was_approved:
+        await ledger.record_change(
+            db, child_id, today, "task", False, "resubmit",
+            ref_id=cursor.lastrowid, task_key=task_key,
+        )
     await db.commit()
     return cursor.lastrowid
 
 
 async def uncomplete_task(child_id: int, task_key: str, today: str) -> None:
     db = await get_db()
+    was_approved = await _is_task_approved(child_id, task_key, today)
     await db.execute(
         "DELETE FROM completions WHERE child_id = ? AND task_key = ? AND date = ?",
         (child_id, task_key, today),
     )
+    if was_approved:
+        await ledger.record_change(
+            db, child_id, today, "task", False, "uncomplete", task_key=task_key
+        )
     await db.commit()
 
 
+async def _is_task_approved(child_id: int, task_key: str, day: str) -> bool:
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        "SELECT 1 FROM completions WHERE child_id = ? AND task_key = ? AND date = ? AND approved = 1",
+        (child_id, task_key, day),
+    )
+    return bool(rows)
+
+
 async def get_completion_by_id(completion_id: int) -> dict | None:
     db = await get_db()
     rows = await db.execute_fetchall(
@@ -140,13 +311,25 @@ async def get_completion_by_id(completion_id: int) -> dict | None:
 
 async def approve_completion(completion_id: int) -> None:
     db = await get_db()
+    row = await get_completion_by_id(completion_id)
     await db.execute("UPDATE completions SET approved = 1 WHERE id = ?", (completion_id,))
+    if row and not row["approved"]:
+        await ledger.record_change(
+            db, row["child_id"], row["date"], "task", True, "approve",
+            ref_id=completion_id, task_key=row["task_key"],
+        )
     await db.commit()
 
 
 async def reject_completion(completion_id: int) -> None:
     db = await get_db()
+    row = await get_completion_by_id(completion_id)
     await db.execute("DELETE FROM completions WHERE id = ?", (completion_id,))
+    if row and row["approved"]:
+        await ledger.record_change(
+            db, row["child_id"], row["date"], "task", False, "reject",
+            ref_id=completion_id, task_key=row["task_key"],
+        )
     await db.execute(
         "DELETE FROM approval_messages WHERE approval_type = 'task' AND approval_id = ?",
         (completion_id,),
@@ -166,6 +349,25 @@ async def get_extra_tasks_for_date(child_id: int, day: str) -> list[dict]:
     return [dict(r) for r in rows]
 
 
+async def get_children_extra_tasks_for_date(
+    day: str, child_ids: list[int]
+) -> dict[int, list[dict]]:
+    """Batch form of get_extra_tasks_for_date: {child_id: extras by id}."""
+    if not child_ids:
+        return {}
+    db = await get_db()
+    placeholders = ",".join("?" * len(child_ids))
+    rows = await db.execute_fetchall(
+        f"""SELECT * FROM extra_tasks WHERE date = ? AND child_id IN ({placeholders})
+            ORDER BY id""",
+        (day, *child_ids),
+    )
+    result: dict[int, list[dict]] = {cid: [] for cid in child_ids}
+    for r in rows:
+        result[r["child_id"]].append(dict(r))
+    return result
+
+
 async def get_extra_task(task_id: int) -> dict | None:
     db = await get_db()
     rows = await db.execute_fetchall(
@@ -174,36 +376,52 @@ async def get_extra_task(task_id: int) -> dict | None:
     return dict(rows[0]) if rows else None
 
 
-async def complete_extra_task(task_id: int, photo_file_id: str, media_type: str = "photo") -> None:
+async def complete_extra_task(task_id: int, photo_file_id: str, media_type: str = "photo") -> int:
+    """Mark the extra task completed; returns its submission number (1, 2, ... per resubmit)."""
     db = await get_db()
-    await db.execute(
-        "UPDATE extra_tasks SET completed = 1, photo_file_id = ?, media_type = ?, approved = 0 WHERE id = ?",
+    row = await get_extra_task(task_id)
+    cursor = await db.execute(
+        """UPDATE extra_tasks SET completed = 1, photo_file_id = ?, media_type = ?, approved = 0,
+           submissions = submissions + 1 WHERE id = ? RETURNING submissions""",
         (photo_file_id, media_type, task_id),
     )
+    (submission,) = await cursor.fetchone()
+    await _record_extra_unapproved(db, row, "resubmit")
     await db.commit()
+    return submission
 
 
 async def uncomplete_extra_task(task_id: int) -> None:
     db = await get_db()
+    row = await get_extra_task(task_id)
     await db.execute(
         "UPDATE extra_tasks SET completed = 0, photo_file_id = NULL, approved = 0 WHERE id = ?",
         (task_id,),
     )
+    await _record_extra_unapproved(db, row, "uncomplete")
     await db.commit()
 
 
 async def approve_extra_task(task_id: int) -> None:
     db = await get_db()
+    row = await get_extra_task(task_id)
     await db.execute("UPDATE extra_tasks SET approved = 1 WHERE id = ?", (task_id,))
+    if row and row["completed"] and not row["approved"]:
+        await ledger.record_change(
+            db, row["child_id"], row["date"], "extra", True, "approve",
+            ref_id=task_id, points=row["points"],
+        )
     await db.commit()
 
 
 async def reject_extra_task(task_id: int) -> None:
     db = await get_db()
+    row = await get_extra_task(task_id)
     await db.execute(
         "UPDATE extra_tasks SET completed = 0, photo_file_id = NULL, approved = 0 WHERE id = ?",
         (task_id,),
     )
+    await _record_extra_unapproved(db, row, "reject")
     await db.execute(
         "DELETE FROM approval_messages WHERE approval_type = 'extra' AND approval_id = ?",
         (task_id,),
@@ -211,6 +429,16 @@ async def reject_extra_task(task_id: int) -> None:
     await db.commit()
 
 
+async def _record_extra_unapproved(
+    db: aiosqlite.Connection, row: dict | None, action: str
+) -> None:
+    if row and row["completed"] and row["approved"]:
+        await ledger.record_change(
+            db, row["child_id"], row["date"], "extra", False, action,
+            ref_id=row["id"], points=row["points"],
+        )
+
+
 async def add_extra_task(
     family_id: int, child_id: int, title: str, points: int, today: str
 ) -> int:
@@ -248,37 +476,111 @@ async def get_extra_points_for_range(
 # ── Pending approvals ───────────────────────────────────
 
 
-async def get_pending_approvals(family_id: int) -> list[dict]:
-    """Get all pending completions and extra tasks for a family."""
+async def get_score_totals(child_id: int, day: str) -> dict:
+    db = await get_db()
+    return await ledger.get_score_totals(db, child_id, day)
+
+
+async def get_day_intensities(child_id: int, start: date, end: date) -> bytes:
     db = await get_db()
-    # Pending regular completions
+    return await ledger.get_intensity_range(db, child_id, start, end)
+
+
+async def count_pending_approvals(family_id: int) -> int:
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        """SELECT
+             (SELECT COUNT(*) FROM completions c JOIN users u ON u.id = c.child_id
+              WHERE u.family_id = ? AND c.approved = 0)
+           + (SELECT COUNT(*) FROM extra_tasks
+              WHERE family_id = ? AND completed = 1 AND approved = 0) AS n""",
+        (family_id, family_id),
+    )
+    return rows[0]["n"]
+
+
+async def get_pending_approvals(
+    family_id: int,
+    child_id: int | None = None,
+    after: tuple[int, str, int] | None = None,
+    limit: int | None = None,
+) -> list[dict]:
+    """Pending completions (newest first), then pending extra tasks, in one query.
+
+    Task rows carry their label from child_tasks (disabled tasks included,
+    falling back to the key). Each row has `sort_key` (kind, ts, id); pass the
+    last row's as `after` to continue, and `total` counts the whole list.
+    """
+    db = await get_db()
+    child_filter = "" if child_id is None else "AND {alias}.child_id = :child_id"
+    cursor_filter = "" if after is None else """
+        WHERE kind > :kind
+           OR (kind = :kind AND (sort_ts < :ts OR (sort_ts = :ts AND id < :id)))"""
     rows = await db.execute_fetchall(
-        """SELECT c.id, c.child_id, c.task_key, c.date, c.photo_file_id, c.media_type,
-                  u.name as child_name, 'task' as type
-           FROM completions c
-           JOIN users u ON u.id = c.child_id
-           WHERE u.family_id = ? AND c.approved = 0
-           ORDER BY c.completed_at DESC""",
-        (family_id,),
-    )
-    results = [dict(r) for r in rows]
-    # Pending extra tasks
-    rows2 = await db.execute_fetchall(
-        """SELECT e.id, e.child_id, e.title, e.points, e.date, e.photo_file_id, e.media_type,
-                  u.name as child_name, 'extra' as type
-           FROM extra_tasks e
-           JOIN users u ON u.id = e.child_id
-           WHERE e.family_id = ? AND e.completed = 1 AND e.approved = 0
-           ORDER BY e.id DESC""",
-        (family_id,),
-    )
-    results.extend(dict(r) for r in rows2)
+        f"""SELECT * FROM (
+              SELECT *, COUNT(*) OVER () AS total FROM (
+                SELECT 0 AS kind, COALESCE(c.completed_at, '') AS sort_ts, c.id, 'task' AS type,
+                       c.child_id, u.name AS child_name, c.date, c.photo_file_id, c.media_type,
+                       c.task_key, COALESCE(ct.label, c.task_key) AS label,
+                       NULL AS title, NULL AS points
+                FROM completions c
+                JOIN users u ON u.id = c.child_id
+                LEFT JOIN child_tasks ct ON ct.child_id = c.child_id AND ct.task_key = c.task_key
+                WHERE u.family_id = :family_id AND c.approved = 0 {child_filter.format(alias="c")}
+                UNION ALL
+                SELECT 1, '', e.id, 'extra',
+                       e.child_id, u.name, e.date, e.photo_file_id, e.media_type,
+                       NULL, e.title, e.title, e.points
+                FROM extra_tasks e
+                JOIN users u ON u.id = e.child_id
+                WHERE e.family_id = :family_id AND e.completed = 1 AND e.approved = 0
+                      {child_filter.format(alias="e")}
+              )
+            ){cursor_filter}
+            ORDER BY kind, sort_ts DESC, id DESC
+            LIMIT :limit""",
+        {
+            "family_id": family_id,
+            "child_id": child_id,
+            "kind": after[0] if after else None,
+            "ts": after[1] if after else None,
+            "id": after[2] if after else None,
+            "limit": -1 if limit is None else limit,
+        },
+    )
+    results = []
+    for r in rows:
+        item = dict(r)
+        item["sort_key"] = (item.pop("kind"), item.pop("sort_ts"), item["id"])
+        results.append(item)
     return results
 
 
+async def resolve_pending_approvals(
+    family_id: int,
+    approve: bool,
+    items: list[tuple[str, int]] | None = None,
+    child_id: int | None = None,
+    day: str | None = None,
+) -> dict:
+    """Approve/reject many pending items in one transaction (bot.approvals)."""
+    db = await get_db()
+    return await approvals.resolve_pending(db, family_id, approve, items, child_id, day)
+
+
 # ── Child tasks (per-child checklist) ───────────────────
 
 
+def _standard_tasks(child_id: int) -> list[dict]:
+    """The child_tasks rows ensure_child_tasks_initialized would insert (id aside)."""
+    from bot.tasks_config import DAILY_TASKS, SUNDAY_TASK
+    return [
+        {"id": None, "child_id": child_id, "task_key": t.key, "label": t.label,
+         "task_group": t.group, "is_standard": 1, "enabled": 1, "sort_order": i}
+        for i, t in enumerate(list(DAILY_TASKS) + [SUNDAY_TASK])
+    ]
+
+
 async def ensure_child_tasks_initialized(child_id: int) -> None:
     from bot.tasks_config import DAILY_TASKS, SUNDAY_TASK
     db = await get_db()
@@ -307,6 +609,32 @@ async def get_child_enabled_tasks(child_id: int) -> list[dict]:
     return [dict(r) for r in rows]
 
 
+async def get_children_enabled_tasks(child_ids: list[int]) -> dict[int, list[dict]]:
+    """Batch form of get_child_enabled_tasks: {child_id: tasks by sort_order}."""
+    if not child_ids:
+        return {}
+    db = await get_db()
+    placeholders = ",".join("?" * len(child_ids))
+    rows = await db.execute_fetchall(
+        f"""SELECT * FROM child_tasks WHERE child_id IN ({placeholders})
+            ORDER BY child_id, sort_order""",
+        tuple(child_ids),
+    )
+    result: dict[int, list[dict]] = {cid: [] for cid in child_ids}
+    initialized = set()
+    for r in rows:
+        initialized.add(r["child_id"])
+        if r["enabled"]:
+            result[r["child_id"]].append(dict(r))
+    # Children that were never initialized get the standard set lazily.
+    # Inside a read_snapshot() it is only shown, not written: the next
+    # read outside one stores it.
+    in_snapshot = _snapshot_conn.get() is not None
+    for cid in result.keys() - initialized:
+        result[cid] = _standard_tasks(cid) if in_snapshot else await get_child_enabled_tasks(cid)
+    return result
+
+
 async def get_child_all_tasks(child_id: int) -> list[dict]:
     await ensure_child_tasks_initialized(child_id)
     db = await get_db()
@@ -323,6 +651,7 @@ async def toggle_child_task(child_id: int, task_key: str, enabled: bool) -> None
         "UPDATE child_tasks SET enabled = ? WHERE child_id = ? AND task_key = ?",
         (int(enabled), child_id, task_key),
     )
+    await ledger.rebuild_ledger(db, child_id)
     await db.commit()
 
 
@@ -351,6 +680,7 @@ async def remove_custom_child_task(child_id: int, task_key: str) -> None:
         "DELETE FROM child_tasks WHERE child_id = ? AND task_key = ? AND is_standard = 0",
         (child_id, task_key),
     )
+    await ledger.rebuild_ledger(db, child_id)
     await db.commit()
 
 
@@ -359,6 +689,72 @@ async def reset_child_tasks(child_id: int) -> None:
     await db.execute("DELETE FROM child_tasks WHERE child_id = ?", (child_id,))
     await db.commit()
     await ensure_child_tasks_initialized(child_id)
+    await ledger.rebuild_ledger(db, child_id)
+    await db.commit()
+
+
+# ── Media store (content-addressed uploads, bot.media_store) ──
+
+
+async def register_media(
+    sha256: str, path: str, content_type: str, media_type: str, size: int
+) -> dict:
+    db = await get_db()
+    row = await media_store.register(db, sha256, path, content_type, media_type, size)
+    await db.commit()
+    return row
+
+
+async def get_media(path: str) -> dict | None:
+    db = await get_db()
+    return await media_store.get_by_path(db, path)
+
+
+async def set_media_telegram_file_id(path: str, file_id: str) -> None:
+    db = await get_db()
+    await media_store.set_telegram_file_id(db, path, file_id)
+    await db.commit()
+
+
+# ── Scheduler job metrics (written by the bot process) ──
+
+
+async def get_job_runs(limit: int = 50, job: str | None = None) -> list[dict]:
+    db = await get_db()
+    if job:
+        rows = await db.execute_fetchall(
+            "SELECT * FROM job_runs WHERE job = ? ORDER BY id DESC LIMIT ?",
+            (job, limit),
+        )
+    else:
+        rows = await db.execute_fetchall(
+            "SELECT * FROM job_runs ORDER BY id DESC LIMIT ?", (limit,)
+        )
+    return [dict(r) for r in rows]
+
+
+async def get_job_run_stats() -> list[dict]:
+    """Latest run per job plus run/recipient/error totals over retained runs."""
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        """SELECT r.*, t.runs, t.total_recipients, t.total_errors
+           FROM job_runs r
+           JOIN (SELECT job, MAX(id) AS last_id, COUNT(*) AS runs,
+                        SUM(recipients) AS total_recipients, SUM(errors) AS total_errors
+                 FROM job_runs GROUP BY job) t ON t.last_id = r.id
+           ORDER BY r.job"""
+    )
+    return [dict(r) for r in rows]
+
+
+async def get_loop_lag_reports(max_age: float = 600) -> list[dict]:
+    """Loop lag summaries other processes saved recently (bot.database.save_loop_lag)."""
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        "SELECT * FROM loop_lag WHERE updated_at >= ? ORDER BY process, instance",
+        (time.time() - max_age,),
+    )
+    return [dict(r) for r in rows]
 
 
 async def get_approval_messages(approval_type: str, approval_id: int) -> list[dict]:
@@ -401,6 +797,7 @@ async def delete_family(family_id: int) -> list[int]:
             )
         await db.execute("DELETE FROM completions WHERE child_id = ?", (cid,))
         await db.execute("DELETE FROM child_tasks WHERE child_id = ?", (cid,))
+        await ledger.delete_child_ledger(db, cid)
     extra_rows = await db.execute_fetchall(
         "SELECT id FROM extra_tasks WHERE family_id = ?", (family_id,)
     )
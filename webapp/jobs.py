@@ -0,0 +1,148 @@
+"""In-process background jobs for work that must not hold up a response.
+
+Upload routes persist the file and commit the row, then `enqueue` the
+follow-up (parent notifications and their approval_messages). A few worker
+tasks run jobs in order; a job that raises is retried after RETRY_DELAYS and
+given up (with `on_failure`, if any) once they run out, or at once if it
+raises JobGaveUp. The queue lives in
+this process only: jobs still queued when it exits are lost, which costs a
+parent notification, never the child's submission.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 4
+RETRY_DELAYS = (1, 5, 30)   # seconds before attempt 2, 3, 4
+DRAIN_TIMEOUT = 10.0        # seconds shutdown waits for queued jobs
+
+JobFunc = Callable[[], Awaitable[None]]
+
+
+class JobFailed(Exception):
+    """Raised by a job to ask for a retry without a traceback in the log."""
+
+
+class JobGaveUp(Exception):
+    """Raised by a job that can't succeed: no retries, straight to `on_failure`."""
+
+
+@dataclass
+class Job:
+    name: str
+    run: JobFunc
+    on_failure: JobFunc | None = None
+    attempts: int = 0
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS) -> None:
+        self.queue: asyncio.Queue[Job] = asyncio.Queue()
+        self.workers = [
+            asyncio.create_task(self._work(), name=f"background-job-{i}") for i in range(workers)
+        ]
+        self.delayed: set[asyncio.Task] = set()
+        self.running = 0
+        # (job name, outcome) -> count; outcome is done / retried / failed
+        self.outcomes: Counter[tuple[str, str]] = Counter()
+
+    def put(self, job: Job) -> None:
+        self.queue.put_nowait(job)
+
+    async def _work(self) -> None:
+        while True:
+            job = await self.queue.get()
+            self.running += 1
+            try:
+                await self._run(job)
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.attempts += 1
+        try:
+            await job.run()
+        except Exception as e:
+            if job.attempts <= len(RETRY_DELAYS) and not isinstance(e, JobGaveUp):
+                delay = RETRY_DELAYS[job.attempts - 1]
+                logger.warning(
+                    "%s failed (attempt %d/%d): %s — retrying in %ds",
+                    job.name, job.attempts, len(RETRY_DELAYS) + 1, e, delay,
+                )
+                self.outcomes[(job.name, "retried")] += 1
+                self._retry_later(job, delay)
+                return
+            if isinstance(e, (JobFailed, JobGaveUp)):
+                logger.error("%s failed after %d attempts: %s", job.name, job.attempts, e)
+            else:
+                logger.exception("%s failed after %d attempts", job.name, job.attempts)
+            self.outcomes[(job.name, "failed")] += 1
+            if job.on_failure is not None:
+                try:
+                    await job.on_failure()
+                except Exception:
+                    logger.exception("%s failure handler failed", job.name)
+            return
+        self.outcomes[(job.name, "done")] += 1
+
+    def _retry_later(self, job: Job, delay: float) -> None:
+        async def requeue() -> None:
+            await asyncio.sleep(delay)
+            self.put(job)
+
+        task = asyncio.create_task(requeue())
+        self.delayed.add(task)
+        task.add_done_callback(self.delayed.discard)
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT) -> None:
+        """Finish queued jobs (not pending retries), then stop the workers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %d background jobs still queued", self.queue.qsize())
+        for task in (*self.workers, *self.delayed):
+            task.cancel()
+        await asyncio.gather(*self.workers, *self.delayed, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "running": self.running,
+            "waiting_retry": len(self.delayed),
+            "outcomes": dict(self.outcomes),
+        }
+
+
+_queue: JobQueue | None = None
+
+
+def get_queue() -> JobQueue:
+    """The process's queue, started on first use (like webapp.db.get_db)."""
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
+
+
+def enqueue(name: str, run: JobFunc, on_failure: JobFunc | None = None) -> None:
+    """Run `run()` in the background; see the module docstring for retries."""
+    get_queue().put(Job(name, run, on_failure))
+
+
+def job_stats() -> dict | None:
+    return _queue.stats() if _queue is not None else None
+
+
+async def stop_jobs() -> None:
+    global _queue
+    if _queue is not None:
+        await _queue.drain()
+        _queue = None
@@ -0,0 +1,338 @@
+"""Telegram media for the web app: streamed through, then served from disk.
+
+Media sent through the bot is stored as a Telegram file_id, which the browser
+can only get through /api/media. The first view streams the file from the
+Bot API file server to the client and, at the same time, into a size-bounded
+LRU cache under data/cache/media (keyed by file_id). Later views are served
+from that copy with FileResponse (sendfile, Range for video seeking).
+
+A Range request that misses the cache is passed through upstream as is,
+while a background download fills the cache so the next seek is local.
+Concurrent requests for one file_id share a single download (Singleflight),
+and all upstream traffic shares one ClientSession.
+
+The cache index is rebuilt from the directory on first use (recency from
+mtime, which hits refresh), so it survives restarts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import uuid
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+from bot.config import MEDIA_CACHE_MB
+from webapp.notify import forget_file_url, get_file_url
+from webapp.singleflight import Singleflight
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CACHE_DIR = DATA_DIR / "cache" / "media"
+WRITE_BATCH = 256 * 1024      # bytes buffered per thread-pool write
+CHUNK_SIZE = 64 * 1024
+UPSTREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=10, sock_read=60)
+# Telegram file_ids are permanent and point at fixed bytes
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Passed through on a Range miss
+_RANGE_HEADERS = ("Content-Range", "Content-Length", "Accept-Ranges")
+
+
+class MediaCache:
+    """Size-bounded LRU of downloaded files; index in memory, files on disk."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, tuple[Path, int]] = OrderedDict()  # key -> (file, size)
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(file_id: str) -> str:
+        return hashlib.sha256(file_id.encode()).hexdigest()
+
+    def load(self) -> None:
+        """Index files already on disk, oldest first; drops leftovers of interrupted fills."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.root.iterdir():
+            if path.suffix == ".part":
+                path.unlink(missing_ok=True)
+                continue
+            st = path.stat()
+            found.append((st.st_mtime, path.name.split(".", 1)[0], path, st.st_size))
+        for _, key, path, size in sorted(found):
+            self.entries[key] = (path, size)
+            self.total += size
+
+    def get(self, file_id: str) -> Path | None:
+        entry = self.entries.get(self.key(file_id))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(self.key(file_id))
+        self.hits += 1
+        return entry[0]
+
+    def tmp_path(self) -> Path:
+        return self.root / f"{uuid.uuid4().hex}.part"
+
+    def add(self, file_id: str, size: int, suffix: str) -> list[Path]:
+        """Index a finished download; returns the files to evict for it."""
+        key = self.key(file_id)
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.total -= old[1]
+        self.entries[key] = (self.root / f"{key}{suffix}", size)
+        self.total += size
+        evicted = []
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            _, (path, old_size) = self.entries.popitem(last=False)
+            self.total -= old_size
+            evicted.append(path)
+        return evicted
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.entries),
+            "bytes": self.total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache: MediaCache | None = None
+_cache_loading: asyncio.Task | None = None
+_session: aiohttp.ClientSession | None = None
+_flights = Singleflight("media")
+
+
+async def _load_cache() -> MediaCache:
+    global _cache
+    cache = MediaCache(CACHE_DIR, MEDIA_CACHE_MB * 1024 * 1024)
+    await asyncio.to_thread(cache.load)
+    _cache = cache
+    return cache
+
+
+async def get_cache() -> MediaCache:
+    """The process's cache; the first callers share one directory scan."""
+    global _cache_loading
+    if _cache is not None:
+        return _cache
+    if _cache_loading is None or _cache_loading.cancelled():
+        _cache_loading = asyncio.create_task(_load_cache())
+    return await asyncio.shield(_cache_loading)
+
+
+def _get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=UPSTREAM_TIMEOUT)
+    return _session
+
+
+def media_cache_stats() -> dict | None:
+    return _cache.stats() if _cache is not None else None
+
+
+async def close_media_proxy() -> None:
+    global _session
+    await _flights.stop()
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+# ── Cache files ──
+
+
+def _write(f: BinaryIO, data: bytes) -> None:
+    f.write(data)
+
+
+def _touch(path: Path) -> bool:
+    """Refresh recency for the next restart; False if the file is gone."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _place(tmp: Path, final: Path, evicted: list[Path]) -> None:
+    os.replace(tmp, final)
+    for path in evicted:
+        if path != final:
+            path.unlink(missing_ok=True)
+
+
+def _suffix(url: str) -> str:
+    """Extension of the Bot API file_path (photos/file_1.jpg → .jpg), for the content type."""
+    suffix = Path(urlsplit(url).path).suffix
+    return suffix if suffix[1:].isalnum() else ""
+
+
+async def _commit(cache: MediaCache, file_id: str, tmp: Path, size: int, url: str) -> None:
+    suffix = _suffix(url)
+    if size > cache.max_bytes:
+        await asyncio.to_thread(tmp.unlink, missing_ok=True)
+        return
+    evicted = cache.add(file_id, size, suffix)
+    await asyncio.to_thread(_place, tmp, cache.root / f"{cache.key(file_id)}{suffix}", evicted)
+
+
+# ── Serving ──
+
+
+async def serve_telegram_file(request: web.Request, file_id: str) -> web.StreamResponse:
+    """Response for a Telegram file_id: from the cache, else streamed from the Bot API.
+
+    Only one download per file_id runs at a time: requests arriving during it
+    wait for it and are then served from the cache.
+    """
+    cache = await get_cache()
+    cached = await _cached(cache, file_id)
+    if cached is None and await _flights.wait(file_id):
+        cached = await _cached(cache, file_id)
+    if cached is not None:
+        return web.FileResponse(cached, headers={"Cache-Control": CACHE_CONTROL})
+
+    # No await between the checks above and starting the flight, so requests
+    # arriving from here on find it running
+    if request.headers.get("Range"):
+        _flights.start(file_id, partial(_fill, file_id))
+    elif _flights.running(file_id) is None:
+        return await _flights.do(file_id, partial(_stream_and_cache, request, cache, file_id))
+
+    # A Range miss, or the download we waited for failed and another request retries it
+    url = await get_file_url(file_id)
+    if not url:
+        return web.json_response({"error": "Cannot get file"}, status=404)
+    return await _stream_through(request, url)
+
+
+async def _cached(cache: MediaCache, file_id: str) -> Path | None:
+    cached = cache.get(file_id)
+    if cached is not None and await asyncio.to_thread(_touch, cached):
+        return cached
+    return None
+
+
+def _content_type(url: str, upstream: aiohttp.ClientResponse) -> str:
+    # The file server mostly answers application/octet-stream; the path knows better
+    return (
+        mimetypes.guess_type(urlsplit(url).path)[0]
+        or upstream.headers.get("Content-Type")
+        or "application/octet-stream"
+    )
+
+
+async def _stream_and_cache(
+    request: web.Request, cache: MediaCache, file_id: str
+) -> web.StreamResponse:
+    url = await get_file_url(file_id)
+    if not url:
+        return web.json_response({"error": "Cannot get file"}, status=404)
+    async with _get_session().get(url) as upstream:
+        if upstream.status != 200:
+            forget_file_url(file_id)
+            return web.json_response({"error": "Download failed"}, status=502)
+        response = web.StreamResponse(headers={
+            "Content-Type": _content_type(url, upstream),
+            "Cache-Control": CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+        })
+        if upstream.content_length is not None:
+            response.content_length = upstream.content_length
+        await response.prepare(request)
+
+        tmp = cache.tmp_path()
+        f = None
+        size = 0
+        buffer = bytearray()
+        done = False
+        try:
+            f = await asyncio.to_thread(open, tmp, "wb")
+            async for chunk in upstream.content.iter_chunked(CHUNK_SIZE):
+                await response.write(chunk)
+                size += len(chunk)
+                buffer += chunk
+                if len(buffer) >= WRITE_BATCH:
+                    await asyncio.to_thread(_write, f, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(_write, f, bytes(buffer))
+            await asyncio.to_thread(f.close)
+            done = True
+        except ConnectionResetError:
+            return response  # the client went away (closed the view); nothing to answer
+        finally:
+            if not done:
+                # Never cache a partial file
+                if f is not None:
+                    f.close()
+                tmp.unlink(missing_ok=True)
+        await _commit(cache, file_id, tmp, size, url)
+        await response.write_eof()
+        return response
+
+
+async def _stream_through(request: web.Request, url: str) -> web.StreamResponse:
+    """Pass the file (or the requested Range of it) through without caching."""
+    headers = {"Range": request.headers["Range"]} if "Range" in request.headers else None
+    async with _get_session().get(url, headers=headers) as upstream:
+        if upstream.status not in (200, 206, 416):
+            return web.json_response({"error": "Download failed"}, status=502)
+        headers = {h: upstream.headers[h] for h in _RANGE_HEADERS if h in upstream.headers}
+        headers["Content-Type"] = _content_type(url, upstream)
+        response = web.StreamResponse(status=upstream.status, headers=headers)
+        await response.prepare(request)
+        async for chunk in upstream.content.iter_chunked(CHUNK_SIZE):
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+
+async def _fill(file_id: str) -> None:
+    """Background download of a whole file into the cache (after a Range miss)."""
+    cache = await get_cache()
+    if cache.key(file_id) in cache.entries:
+        return
+    url = await get_file_url(file_id)
+    if not url:
+        return
+    tmp = cache.tmp_path()
+    size = 0
+    try:
+        async with _get_session().get(url) as upstream:
+            if upstream.status != 200:
+                forget_file_url(file_id)
+                logger.warning("Caching %s failed: HTTP %d", file_id, upstream.status)
+                return
+            with await asyncio.to_thread(open, tmp, "wb") as f:
+                async for chunk in upstream.content.iter_chunked(WRITE_BATCH):
+                    await asyncio.to_thread(_write, f, chunk)
+                    size += len(chunk)
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+        tmp.unlink(missing_ok=True)
+        logger.warning("Caching %s failed: %s", file_id, e)
+        return
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    await _commit(cache, file_id, tmp, size, url)
@@ -0,0 +1,375 @@
+"""Prometheus text exposition for the web app (served at local-only /metrics)."""
+
+from __future__ import annotations
+
+import bisect
+import time
+from collections import Counter
+from typing import Awaitable, Callable
+
+from aiohttp import web
+
+from bot.db_stats import db_operation, statement_stats
+from bot.loop_monitor import running_monitors
+
+from .db import get_job_run_stats, get_loop_lag_reports
+from .jobs import job_stats
+from .media_proxy import media_cache_stats
+from .singleflight import singleflight_stats
+
+# A collector returns Prometheus text lines; collectors are rendered in order
+Collector = Callable[[], Awaitable[list[str]]]
+
+_collectors: list[Collector] = []
+
+LOCAL_ADDRESSES = {"127.0.0.1", "::1"}
+
+
+def register_collector(collector: Collector) -> Collector:
+    """Add a collector to /metrics (usable as a decorator)."""
+    _collectors.append(collector)
+    return collector
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict[str, object]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+def metric_family(
+    name: str, kind: str, help_text: str, samples: list[tuple[dict, float]]
+) -> list[str]:
+    """Render one metric family: HELP/TYPE header plus labelled samples."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(labels)} {value:g}")
+    return lines
+
+
+@register_collector
+async def _job_run_metrics() -> list[str]:
+    stats = await get_job_run_stats()
+    lines: list[str] = []
+    for name, kind, help_text, key, scale in (
+        # Sums over the retained job_runs rows, which drop as old runs are pruned: gauges
+        ("alanbot_job_runs_retained", "gauge", "Retained scheduler job runs.", "runs", 1),
+        ("alanbot_job_recipients_retained", "gauge", "Recipients processed by retained runs.", "total_recipients", 1),
+        ("alanbot_job_errors_retained", "gauge", "Send errors in retained runs.", "total_errors", 1),
+        ("alanbot_job_last_duration_seconds", "gauge", "Duration of the last run.", "duration_ms", 1000),
+        ("alanbot_job_last_recipients", "gauge", "Recipients processed by the last run.", "recipients", 1),
+        ("alanbot_job_last_errors", "gauge", "Errors in the last run.", "errors", 1),
+        ("alanbot_job_last_db_seconds", "gauge", "Time spent in the DB during the last run.", "db_ms", 1000),
+        ("alanbot_job_last_telegram_seconds", "gauge", "Time spent calling Telegram during the last run.", "telegram_ms", 1000),
+    ):
+        lines += metric_family(
+            name, kind, help_text,
+            [({"job": s["job"]}, (s[key] or 0) / scale) for s in stats],
+        )
+    lines += metric_family(
+        "alanbot_job_last_recipient_latency_seconds", "gauge",
+        "Per-recipient latency quantiles of the last run.",
+        [({"job": s["job"], "quantile": "0.5"}, s["p50_ms"] / 1000) for s in stats]
+        + [({"job": s["job"], "quantile": "0.95"}, s["p95_ms"] / 1000) for s in stats],
+    )
+    return lines
+
+
+STATEMENT_LABEL_CHARS = 200
+
+
+@register_collector
+async def _statement_metrics() -> list[str]:
+    stats = statement_stats()
+    labels = [{"statement": s["statement"][:STATEMENT_LABEL_CHARS]} for s in stats]
+    lines = [
+        "# HELP alanbot_db_statement_seconds Web app SQL statements by normalized text.",
+        "# TYPE alanbot_db_statement_seconds summary",
+    ]
+    for label, s in zip(labels, stats):
+        for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+            lines.append(
+                f"alanbot_db_statement_seconds{format_labels({**label, 'quantile': q})} "
+                f"{s[key] / 1000:g}"
+            )
+        lines.append(f"alanbot_db_statement_seconds_sum{format_labels(label)} {s['total_ms'] / 1000:g}")
+        lines.append(f"alanbot_db_statement_seconds_count{format_labels(label)} {s['count']}")
+    lines += metric_family(
+        "alanbot_db_statement_max_seconds", "gauge", "Slowest run of each statement.",
+        [(label, s["max_ms"] / 1000) for label, s in zip(labels, stats)],
+    )
+    return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in Prometheus histogram format."""
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self, name: str, labels: dict[str, object]) -> list[str]:
+        lines = []
+        cumulative = 0
+        for le, n in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': le})} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {self.sum!r}")
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return lines
+
+
+def histogram_family(
+    name: str, help_text: str, histograms: dict[tuple, Histogram], label_names: tuple[str, ...]
+) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, hist in sorted(histograms.items()):
+        lines += hist.render(name, dict(zip(label_names, key)))
+    return lines
+
+
+# ── HTTP request metrics ──
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+THROUGHPUT_BUCKETS = (16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)  # bytes/s
+
+_http_latency: dict[tuple[str, str], Histogram] = {}
+_http_request_bytes: dict[tuple[str, str], Histogram] = {}
+_http_response_bytes: dict[tuple[str, str], Histogram] = {}
+_upload_throughput: dict[tuple[str, str], Histogram] = {}
+_http_responses: Counter[tuple[str, str, str]] = Counter()
+_http_in_flight: Counter[tuple[str, str]] = Counter()
+
+
+def _observe(store: dict, key: tuple, buckets: tuple[float, ...], value: float) -> None:
+    hist = store.get(key)
+    if hist is None:
+        hist = store[key] = Histogram(buckets)
+    hist.observe(value)
+
+
+def _response_size(response: web.StreamResponse) -> int | None:
+    """Body bytes of a response as the handler returned it; None if not known yet.
+
+    body_length only counts bytes already written, which for a plain Response
+    happens after the middleware chain (in write_eof); it also counts the
+    header block, so a declared Content-Length is preferred.
+    """
+    if response.prepared:  # streamed by the handler itself
+        if response.content_length is not None:
+            return response.content_length
+        return response.body_length
+    if isinstance(response, web.Response):
+        return response.content_length or 0
+    return None  # FileResponse & co.: sized in prepare, see record_prepared_size
+
+
+@web.middleware
+async def http_metrics_middleware(request: web.Request, handler):
+    """Latency, status, sizes and in-flight count per route (outermost)."""
+    # Unmatched paths share one label so scanners can't blow up cardinality
+    route = route_name(request) if request.match_info.route.resource is not None else "<unmatched>"
+    key = (request.method, route)
+    _http_in_flight[key] += 1
+    start = time.perf_counter()
+    status, body_length = 500, 0
+    try:
+        response = await handler(request)
+        status, body_length = response.status, _response_size(response)
+        return response
+    except web.HTTPException as exc:
+        status, body_length = exc.status, len(exc.text or "")
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _http_in_flight[key] -= 1
+        _http_responses[(*key, str(status))] += 1
+        _observe(_http_latency, key, LATENCY_BUCKETS, elapsed)
+        received = request.content.total_bytes
+        _observe(_http_request_bytes, key, SIZE_BUCKETS, received)
+        if body_length is None:
+            request["http_metrics_key"] = key
+        else:
+            _observe(_http_response_bytes, key, SIZE_BUCKETS, body_length)
+        if request.content_type.startswith("multipart/") and received and elapsed > 0:
+            _observe(_upload_throughput, key, THROUGHPUT_BUCKETS, received / elapsed)
+
+
+async def record_prepared_size(request: web.Request, response: web.StreamResponse) -> None:
+    """on_response_prepare: size of responses prepared after the middleware returned.
+
+    By then a FileResponse has set Content-Length to what it will send (the
+    file, or the requested Range).
+    """
+    key = request.get("http_metrics_key")
+    if key is not None:
+        del request["http_metrics_key"]
+        _observe(_http_response_bytes, key, SIZE_BUCKETS, response.content_length or 0)
+
+
+def http_response_bytes(method: str, route: str) -> Histogram | None:
+    """Recorded response sizes of one route (for bench checks)."""
+    return _http_response_bytes.get((method, route))
+
+
+@register_collector
+async def _http_metrics() -> list[str]:
+    labels = ("method", "route")
+    lines = metric_family(
+        "alanbot_http_responses_total", "counter", "HTTP responses by route and status.",
+        [
+            ({"method": m, "route": r, "status": st}, n)
+            for (m, r, st), n in sorted(_http_responses.items())
+        ],
+    )
+    lines += metric_family(
+        "alanbot_http_in_flight_requests", "gauge", "Requests currently being handled.",
+        [({"method": m, "route": r}, n) for (m, r), n in sorted(_http_in_flight.items())],
+    )
+    lines += histogram_family(
+        "alanbot_http_request_duration_seconds", "Time to handle a request.", _http_latency, labels
+    )
+    lines += histogram_family(
+        "alanbot_http_request_size_bytes", "Request body bytes read by the handler.",
+        _http_request_bytes, labels,
+    )
+    lines += histogram_family(
+        "alanbot_http_response_size_bytes", "Response body bytes.", _http_response_bytes, labels
+    )
+    lines += histogram_family(
+        "alanbot_http_upload_bytes_per_second", "Multipart upload throughput per request.",
+        _upload_throughput, labels,
+    )
+    return lines
+
+
+@register_collector
+async def _loop_lag_metrics() -> list[str]:
+    """This process's monitors live, other processes (the bot) from loop_lag."""
+    local = [m.summary() for m in running_monitors()]
+    seen = {s["instance"] for s in local}
+    reports = local + [r for r in await get_loop_lag_reports() if r["instance"] not in seen]
+    labels = [{"process": r["process"], "instance": r["instance"]} for r in reports]
+    lines = metric_family(
+        "alanbot_loop_lag_seconds", "gauge",
+        "Event-loop scheduling delay quantiles over the last minute.",
+        [
+            ({**label, "quantile": q}, r[key] / 1000)
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms"))
+            for label, r in zip(labels, reports)
+        ],
+    )
+    lines += metric_family(
+        "alanbot_loop_lag_max_seconds", "gauge", "Largest lag since process start.",
+        [(label, r["max_ms"] / 1000) for label, r in zip(labels, reports)],
+    )
+    lines += metric_family(
+        "alanbot_loop_stalls_total", "counter", "Lag samples over LOOP_STALL_MS.",
+        [(label, r["stalls"]) for label, r in zip(labels, reports)],
+    )
+    return lines
+
+
+@register_collector
+async def _background_job_metrics() -> list[str]:
+    stats = job_stats()
+    if stats is None:
+        return []
+    lines = metric_family(
+        "alanbot_background_jobs", "gauge", "Background jobs by state.",
+        [({"state": state}, stats[state]) for state in ("queued", "running", "waiting_retry")],
+    )
+    lines += metric_family(
+        "alanbot_background_job_runs_total", "counter", "Background job attempts by outcome.",
+        [
+            ({"job": name, "outcome": outcome}, n)
+            for (name, outcome), n in sorted(stats["outcomes"].items())
+        ],
+    )
+    return lines
+
+
+@register_collector
+async def _media_cache_metrics() -> list[str]:
+    stats = media_cache_stats()
+    if stats is None:
+        return []
+    lines = metric_family(
+        "alanbot_media_cache_bytes", "gauge", "Telegram media cached on disk by /api/media.",
+        [({}, stats["bytes"])],
+    )
+    lines += metric_family(
+        "alanbot_media_cache_files", "gauge", "Files in the /api/media disk cache.",
+        [({}, stats["files"])],
+    )
+    lines += metric_family(
+        "alanbot_media_cache_lookups_total", "counter", "/api/media cache lookups by result.",
+        [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])],
+    )
+    return lines
+
+
+@register_collector
+async def _singleflight_metrics() -> list[str]:
+    stats = singleflight_stats()
+    lines = metric_family(
+        "alanbot_upstream_flights", "gauge", "Coalesced upstream calls in flight.",
+        [({"flight": s["name"]}, s["running"]) for s in stats],
+    )
+    lines += metric_family(
+        "alanbot_upstream_flight_calls_total", "counter",
+        "Upstream calls that started a flight or joined a running one.",
+        [
+            ({"flight": s["name"], "result": result}, s[result])
+            for s in stats for result in ("started", "joined")
+        ],
+    )
+    return lines
+
+
+def route_name(request: web.Request) -> str:
+    """Route template ('/api/today/{child_id}'), not the raw path, for grouping."""
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else request.path
+
+
+@web.middleware
+async def db_stats_middleware(request: web.Request, handler):
+    """One db_operation per request (outermost, so auth lookups count too)."""
+    with db_operation(f"{request.method} {route_name(request)}"):
+        return await handler(request)
+
+
+def is_local_request(request: web.Request) -> bool:
+    """True only for direct loopback requests (not proxied through nginx)."""
+    if request.remote not in LOCAL_ADDRESSES:
+        return False
+    return not any(
+        h in request.headers for h in ("X-Forwarded-For", "X-Real-IP", "Forwarded")
+    )
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    if not is_local_request(request):
+        raise web.HTTPNotFound()
+    lines: list[str] = []
+    for collector in _collectors:
+        lines += await collector()
+    return web.Response(
+        text="\n".join(lines) + "\n",
+        content_type="text/plain",
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
@@ -2,15 +2,51 @@
 
 from __future__ import annotations
 
+import asyncio
+import mimetypes
+import time
+from collections import OrderedDict
+from functools import partial
 from pathlib import Path
 
 import aiohttp
 
-from bot.config import BOT_TOKEN
+from bot.config import BOT_TOKEN, TELEGRAM_API_URL
+from webapp.singleflight import Singleflight
 
-API_BASE = f"https://api.telegram.org/bot{BOT_TOKEN}"
+API_BASE = f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}"
+FILE_BASE = f"{TELEGRAM_API_URL}/file/bot{BOT_TOKEN}"
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
+CHECKLIST_UPDATED = "📋 Чеклист обновлён — нажми /checklist чтобы увидеть изменения."
+
+# getFile download links are valid for at least an hour; reuse them a bit less
+FILE_URL_TTL = 50 * 60
+FILE_URL_CACHE_SIZE = 2048
+_file_urls: OrderedDict[str, tuple[float, str]] = OrderedDict()  # file_id -> (expiry, url)
+_get_file_flights = Singleflight("getFile")
+
+
+class TelegramRejected(Exception):
+    """The Bot API refused a send for good (bot blocked, bad request): retrying won't help."""
+
+    def __init__(self, status: int, description: str) -> None:
+        super().__init__(f"HTTP {status}: {description}")
+        self.status = status
+
+
+def _permanent(status: int) -> bool:
+    # Flood control (429) and server errors pass; any other 4xx fails the same way again
+    return 400 <= status < 500 and status != 429
+
+
+async def _rejection(resp: aiohttp.ClientResponse) -> TelegramRejected:
+    try:
+        description = (await resp.json()).get("description", "")
+    except (aiohttp.ContentTypeError, ValueError):
+        description = ""
+    return TelegramRejected(resp.status, description)
+
 
 async def send_message(chat_id: int, text: str, parse_mode: str = "HTML") -> bool:
     """Send a text message to a Telegram user. Returns True on success."""
@@ -104,11 +140,20 @@ async def send_media_to_parent(
     caption: str,
     completion_id: int,
     is_extra: bool = False,
+    fallback: bool = True,
+    child_id: int | None = None,
+    child_name: str = "",
+    day: str = "",
 ) -> int | None:
     """Send photo/video with approval buttons to a parent.
     Handles both Telegram file_ids and local upload paths.
     Returns the Telegram message_id on success, None on failure.
     Also saves the approval_message for cross-parent sync.
+    With fallback=False a failed send is not replaced by a plain caption
+    message (the caller retries instead), and one Telegram rejects for good
+    raises TelegramRejected.
+    With child_id/day, adds the "approve everything for the day" button
+    (same keyboard as bot.keyboards.approval_kb).
     """
     # Build inline keyboard for approval
     if is_extra:
@@ -124,38 +169,38 @@ async def send_media_to_parent(
             {"text": "❌ Отклонить", "callback_data": reject_cb},
         ]]
     }
+    if child_id is not None and day:
+        reply_markup["inline_keyboard"].append([{
+            "text": f"✅ Одобрить всё от {child_name} за сегодня",
+            "callback_data": f"approve_all:{child_id}:{day}",
+        }])
 
     message_id = None
 
-    # Local upload path
-    if file_id_or_path.startswith("uploads/"):
-        if media_type == "video":
-            message_id = await _send_media_get_id(chat_id, file_id_or_path, "video", caption, reply_markup)
+    try:
+        # Local upload path
+        if file_id_or_path.startswith("uploads/"):
+            from webapp.db import get_media
+            media = await get_media(file_id_or_path)
+            if media and media["telegram_file_id"]:
+                # Sent before: Telegram already has the bytes
+                message_id = await _send_file_id(
+                    chat_id, media["telegram_file_id"], media_type, caption, reply_markup
+                )
+            if message_id is None:
+                media_key = "video" if media_type == "video" else "photo"
+                message_id = await _send_media_get_id(
+                    chat_id, file_id_or_path, media_key, caption, reply_markup, fallback
+                )
         else:
-            message_id = await _send_media_get_id(chat_id, file_id_or_path, "photo", caption, reply_markup)
-    else:
-        # Telegram file_id — send directly via API
-        try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "chat_id": chat_id,
-                    "caption": caption,
-                    "parse_mode": "HTML",
-                    "reply_markup": reply_markup,
-                }
-                if media_type == "video":
-                    payload["video"] = file_id_or_path
-                    url = f"{API_BASE}/sendVideo"
-                else:
-                    payload["photo"] = file_id_or_path
-                    url = f"{API_BASE}/sendPhoto"
-
-                async with session.post(url, json=payload) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        message_id = data.get("result", {}).get("message_id")
-        except Exception:
-            await send_message(chat_id, caption)
+            # Telegram file_id — send directly via API
+            message_id = await _send_file_id(chat_id, file_id_or_path, media_type, caption, reply_markup)
+            if message_id is None and fallback:
+                await send_message(chat_id, caption)
+    except TelegramRejected:
+        if not fallback:
+            raise
+        await send_message(chat_id, caption)
 
     # Save approval message for cross-parent sync
     if message_id:
@@ -171,13 +216,57 @@ async def send_media_to_parent(
     return message_id
 
 
+async def _send_file_id(
+    chat_id: int, file_id: str, media_type: str, caption: str, reply_markup: dict
+) -> int | None:
+    """Send media already on Telegram's servers; returns message_id or None.
+
+    Raises TelegramRejected when the chat itself refuses (403, bot blocked);
+    other errors may be about the file_id, so the caller can still upload.
+    """
+    payload = {
+        "chat_id": chat_id,
+        "caption": caption,
+        "parse_mode": "HTML",
+        "reply_markup": reply_markup,
+    }
+    if media_type == "video":
+        payload["video"] = file_id
+        url = f"{API_BASE}/sendVideo"
+    else:
+        payload["photo"] = file_id
+        url = f"{API_BASE}/sendPhoto"
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=payload) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    return data.get("result", {}).get("message_id")
+                if resp.status == 403:
+                    raise await _rejection(resp)
+    except TelegramRejected:
+        raise
+    except Exception:
+        pass
+    return None
+
+
 async def _send_media_get_id(
-    chat_id: int, file_path: str, media_key: str, caption: str, reply_markup: dict
+    chat_id: int,
+    file_path: str,
+    media_key: str,
+    caption: str,
+    reply_markup: dict,
+    fallback: bool = True,
 ) -> int | None:
-    """Send local media file and return Telegram message_id."""
+    """Send local media file and return Telegram message_id.
+
+    Raises TelegramRejected on a 4xx that a retry would get again.
+    """
     local_file = DATA_DIR / file_path
     if not local_file.exists():
-        await send_message(chat_id, caption)
+        if fallback:
+            await send_message(chat_id, caption)
         return None
 
     import json as json_mod
@@ -187,9 +276,10 @@ async def _send_media_get_id(
     data.add_field("parse_mode", "HTML")
     data.add_field("reply_markup", json_mod.dumps(reply_markup))
 
-    content_type = "video/mp4" if media_key == "video" else "image/jpeg"
-    with open(local_file, "rb") as f:
-        file_data = f.read()
+    content_type = mimetypes.guess_type(local_file.name)[0] or (
+        "video/mp4" if media_key == "video" else "image/jpeg"
+    )
+    file_data = await asyncio.to_thread(local_file.read_bytes)
     data.add_field(
         media_key,
         file_data,
@@ -202,13 +292,29 @@ async def _send_media_get_id(
         async with aiohttp.ClientSession() as session:
             async with session.post(f"{API_BASE}/{endpoint}", data=data) as resp:
                 if resp.status == 200:
-                    result = await resp.json()
-                    return result.get("result", {}).get("message_id")
+                    message = (await resp.json()).get("result", {})
+                    await _remember_file_id(file_path, message, media_key)
+                    return message.get("message_id")
+                if _permanent(resp.status):
+                    raise await _rejection(resp)
+    except TelegramRejected:
+        raise
     except Exception:
-        await send_message(chat_id, caption)
+        if fallback:
+            await send_message(chat_id, caption)
     return None
 
 
+async def _remember_file_id(file_path: str, message: dict, media_key: str) -> None:
+    """Keep the file_id Telegram gave an uploaded store file, for reuse."""
+    sent = message.get(media_key)
+    if isinstance(sent, list):  # photo sizes, largest last
+        sent = sent[-1] if sent else None
+    if sent and sent.get("file_id"):
+        from webapp.db import set_media_telegram_file_id
+        await set_media_telegram_file_id(file_path, sent["file_id"])
+
+
 async def edit_message_caption(
     chat_id: int, message_id: int, caption: str, parse_mode: str = "HTML"
 ) -> bool:
@@ -234,14 +340,37 @@ async def send_checklist_to_child(telegram_id: int) -> bool:
 
     This is a lightweight notification — the child can also press /checklist.
     """
-    return await send_message(
-        telegram_id,
-        "📋 Чеклист обновлён — нажми /checklist чтобы увидеть изменения.",
-    )
+    return await send_message(telegram_id, CHECKLIST_UPDATED)
 
 
 async def get_file_url(file_id: str) -> str | None:
-    """Get a download URL for a Telegram file_id."""
+    """Get a download URL for a Telegram file_id.
+
+    Results are cached for FILE_URL_TTL, and concurrent lookups of the same
+    file_id share one getFile call.
+    """
+    cached = _file_urls.get(file_id)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    return await _get_file_flights.do(file_id, partial(_fetch_file_url, file_id))
+
+
+def forget_file_url(file_id: str) -> None:
+    """Drop a cached download URL that stopped working (expired early, file gone)."""
+    _file_urls.pop(file_id, None)
+
+
+async def _fetch_file_url(file_id: str) -> str | None:
+    url = await _get_file(file_id)
+    if url is not None:
+        _file_urls.pop(file_id, None)
+        _file_urls[file_id] = (time.monotonic() + FILE_URL_TTL, url)
+        while len(_file_urls) > FILE_URL_CACHE_SIZE:
+            _file_urls.popitem(last=False)
+    return url
+
+
+async def _get_file(file_id: str) -> str | None:
     try:
         async with aiohttp.ClientSession() as session:
             async with session.post(
@@ -254,6 +383,6 @@ async def get_file_url(file_id: str) -> str | None:
                 file_path = data.get("result", {}).get("file_path")
                 if not file_path:
                     return None
-                return f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file_path}"
+                return f"{FILE_BASE}/{file_path}"
     except Exception:
         return None
@@ -0,0 +1,77 @@
+"""Admin API routes — scheduler job run history, SQL statement timings."""
+
+from __future__ import annotations
+
+from aiohttp import web
+
+from bot.config import ADMIN_TELEGRAM_IDS, SLOW_QUERY_MS
+from bot.db_stats import reset_statement_stats, statement_stats
+from webapp.db import get_job_run_stats, get_job_runs
+
+routes = web.RouteTableDef()
+
+
+def _require_admin(request: web.Request) -> dict:
+    user = request["user"]
+    if user["role"] != "parent" or user["telegram_id"] not in ADMIN_TELEGRAM_IDS:
+        raise web.HTTPForbidden(text="Admin only")
+    return user
+
+
+@routes.get("/api/admin/jobs")
+async def get_jobs(request: web.Request) -> web.Response:
+    _require_admin(request)
+    job = request.query.get("job")
+    try:
+        limit = max(1, min(500, int(request.query.get("limit", "50"))))
+    except ValueError:
+        limit = 50
+
+    runs = await get_job_runs(limit, job)
+    stats = await get_job_run_stats()
+    return web.json_response({
+        "runs": runs,
+        "jobs": [
+            {
+                "job": s["job"],
+                "runs": s["runs"],
+                "total_recipients": s["total_recipients"],
+                "total_errors": s["total_errors"],
+                "last_started_at": s["started_at"],
+                "last_duration_ms": s["duration_ms"],
+                "last_p95_ms": s["p95_ms"],
+            }
+            for s in stats
+        ],
+    })
+
+
+STATEMENT_SORT_KEYS = ("total_ms", "p95_ms", "max_ms", "count", "mean_ms")
+
+
+@routes.get("/api/admin/db")
+async def get_db_stats(request: web.Request) -> web.Response:
+    """Per-statement timings of this (web app) process since start or reset."""
+    _require_admin(request)
+    sort = request.query.get("sort", "total_ms")
+    if sort not in STATEMENT_SORT_KEYS:
+        raise web.HTTPBadRequest(text=f"sort must be one of {', '.join(STATEMENT_SORT_KEYS)}")
+    try:
+        limit = max(1, min(500, int(request.query.get("limit", "50"))))
+    except ValueError:
+        limit = 50
+
+    stats = sorted(statement_stats(), key=lambda s: s[sort], reverse=True)
+    return web.json_response({
+        "slow_query_ms": SLOW_QUERY_MS,
+        "total_statements": sum(s["count"] for s in stats),
+        "total_ms": round(sum(s["total_ms"] for s in stats), 3),
+        "statements": stats[:limit],
+    })
+
+
+@routes.post("/api/admin/db/reset")
+async def reset_db_stats(request: web.Request) -> web.Response:
+    _require_admin(request)
+    reset_statement_stats()
+    return web.json_response({"ok": True})
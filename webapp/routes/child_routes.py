@@ -2,14 +2,14 @@
 
 from __future__ import annotations
 
-import uuid
-from datetime import date, datetime
+from datetime import date
+from functools import partial
 from pathlib import Path
 
-import aiohttp
 from aiohttp import web
 
-from bot.config import DEADLINE_HOUR, TIMEZONE
+from bot.family_schedule import FamilySchedule, local_today, schedule_for
+from bot.media_store import store_sha256
 from webapp.db import (
     complete_extra_task,
     complete_task,
@@ -17,21 +17,23 @@ from webapp.db import (
     get_child_all_tasks,
     get_child_enabled_tasks,
     get_completed_keys_for_date,
+    get_completion_by_id,
     get_extra_task,
     get_extra_tasks_for_date,
+    get_family,
     get_pending_keys_for_date,
     uncomplete_extra_task,
     uncomplete_task,
     get_family_parents,
 )
-from webapp.notify import get_file_url, send_media_to_parent
+from webapp.jobs import JobFailed, JobGaveUp, enqueue
+from webapp.media_proxy import serve_telegram_file
+from webapp.notify import TelegramRejected, send_media_to_parent, send_message
+from webapp.thumbnails import THUMB_SIZES, find_thumbnail, schedule_thumbnails
+from webapp.uploads import UploadError, save_upload
 
 routes = web.RouteTableDef()
 
-UPLOADS_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "uploads"
-MAX_UPLOAD_SIZE = 20 * 1024 * 1024  # 20 MB
-
-
 def _require_child(request: web.Request) -> dict:
     user = request["user"]
     if user["role"] != "child":
@@ -39,21 +41,76 @@ def _require_child(request: web.Request) -> dict:
     return user
 
 
-def _is_sunday(d: date | None = None) -> bool:
-    return (d or date.today()).weekday() == 6
-
-
-def _is_past_deadline() -> bool:
-    import zoneinfo
-    tz = zoneinfo.ZoneInfo(TIMEZONE)
-    now = datetime.now(tz)
-    return now.hour >= DEADLINE_HOUR
+def _is_sunday(d: date) -> bool:
+    return d.weekday() == 6
+
+
+async def _family_schedule(family_id: int) -> FamilySchedule:
+    return schedule_for(await get_family(family_id))
+
+
+def _family_today(user: dict) -> date:
+    """Today in the family's timezone — the day submissions are stored under."""
+    return local_today(user.get("family_timezone"))
+
+
+# ── Parent notifications (background) ───────────────────
+
+
+def _notify_parents_later(
+    child: dict, day: str, file_path: str, media_type: str, caption: str,
+    approval_id: int, is_extra: bool, submission: int = 0,
+) -> None:
+    """Queue the approval message for every parent; the upload doesn't wait on Telegram.
+
+    One job per parent, so a retry never re-sends to parents already notified.
+    A completion id is new on every resubmit; an extra task keeps its id, so
+    its `submission` number tells a stale job apart (the bytes, and so the
+    store path, may well be the same).
+    """
+    async def fan_out() -> None:
+        for parent in await get_family_parents(child["family_id"]):
+            chat_id = parent["telegram_id"]
+            enqueue(
+                "notify_parent",
+                partial(
+                    _notify_parent, chat_id, child, day, file_path, media_type, caption,
+                    approval_id, is_extra, submission,
+                ),
+                on_failure=partial(send_message, chat_id, caption),
+            )
+
+    enqueue("notify_parents", fan_out)
+
+
+async def _notify_parent(
+    chat_id: int, child: dict, day: str, file_path: str, media_type: str, caption: str,
+    approval_id: int, is_extra: bool, submission: int,
+) -> None:
+    # Approved, rejected or resubmitted while queued: nothing left to ask about
+    if is_extra:
+        row = await get_extra_task(approval_id)
+        pending = bool(row and row["completed"] and row["submissions"] == submission)
+    else:
+        row = await get_completion_by_id(approval_id)
+        pending = row is not None
+    if not pending or row["approved"] or row["photo_file_id"] != file_path:
+        return
+    try:
+        message_id = await send_media_to_parent(
+            chat_id, file_path, media_type, caption, approval_id, is_extra=is_extra, fallback=False,
+            child_id=child["id"], child_name=child["name"], day=day,
+        )
+    except TelegramRejected as e:
+        raise JobGaveUp(f"approval message to {chat_id} rejected: {e}") from e
+    if message_id is None:
+        raise JobFailed(f"approval message to {chat_id} not sent")
 
 
 @routes.get("/api/checklist")
 async def get_checklist(request: web.Request) -> web.Response:
     user = _require_child(request)
-    today = date.today()
+    today = _family_today(user)
     today_str = today.isoformat()
     is_sunday = _is_sunday(today)
 
@@ -102,7 +159,8 @@ async def get_checklist(request: web.Request) -> web.Response:
 async def complete_task_route(request: web.Request) -> web.Response:
     user = _require_child(request)
     task_key = request.match_info["task_key"]
-    today_str = date.today().isoformat()
+    schedule = await _family_schedule(user["family_id"])
+    today_str = schedule.local_today().isoformat()
 
     # Validate task key belongs to child and is enabled
     all_tasks = await get_child_all_tasks(user["id"])
@@ -113,47 +171,12 @@ async def complete_task_route(request: web.Request) -> web.Response:
         return web.json_response({"error": "Task is disabled"}, status=400)
     tasks_rows = [t for t in all_tasks if t["enabled"]]
 
-    # Handle multipart file upload
-    reader = await request.multipart()
-    file_path = None
-    full_path = None
-    media_type = "photo"
-
-    while True:
-        part = await reader.next()
-        if part is None:
-            break
-        if part.name == "file":
-            content_type = part.headers.get("Content-Type", "image/jpeg")
-            media_type = "video" if "video" in content_type else "photo"
-            ext = "mp4" if media_type == "video" else "jpg"
-            day_dir = UPLOADS_DIR / today_str
-            day_dir.mkdir(parents=True, exist_ok=True)
-            filename = f"{uuid.uuid4().hex}.{ext}"
-            full_path = day_dir / filename
-            try:
-                total_size = 0
-                with open(full_path, "wb") as f:
-                    while True:
-                        chunk = await part.read_chunk()
-                        if not chunk:
-                            break
-                        total_size += len(chunk)
-                        if total_size > MAX_UPLOAD_SIZE:
-                            break
-                        f.write(chunk)
-                if total_size > MAX_UPLOAD_SIZE:
-                    if full_path.exists():
-                        full_path.unlink()
-                    return web.json_response({"error": "File too large (max 20MB)"}, status=413)
-            except (IOError, OSError):
-                if full_path and full_path.exists():
-                    full_path.unlink()
-                return web.json_response({"error": "Failed to save file"}, status=500)
-            file_path = f"uploads/{today_str}/{filename}"
-
-    if not file_path:
-        return web.json_response({"error": "No file uploaded"}, status=400)
+    try:
+        upload = await save_upload(request)
+    except UploadError as e:
+        return web.json_response({"error": e.message}, status=e.status)
+    file_path, media_type = upload.path, upload.media_type
+    schedule_thumbnails(file_path, media_type)
 
     completion_id = await complete_task(user["id"], task_key, today_str, file_path, media_type)
 
@@ -164,27 +187,25 @@ async def complete_task_route(request: web.Request) -> web.Response:
             label = t["label"]
             break
 
-    # Check late submission
-    late = _is_past_deadline()
-    late_caption = "\n⚠️ Сдано после 22:00" if late else ""
+    # Check late submission (same local clock as the day it's stored under)
+    late = schedule.is_past_deadline()
+    late_caption = f"\n⚠️ Сдано после {schedule.deadline_hour:02d}:00" if late else ""
 
     # Notify parents with photo + approval buttons (same as bot)
     caption = f"🕐 {user['name']} выполнил(а): <b>{label}</b>\nОжидает одобрения{late_caption}"
-    parents = await get_family_parents(user["family_id"])
-    for parent in parents:
-        await send_media_to_parent(
-            parent["telegram_id"], file_path, media_type,
-            caption, completion_id, is_extra=False,
-        )
+    _notify_parents_later(user, today_str, file_path, media_type, caption, completion_id, is_extra=False)
 
-    return web.json_response({"ok": True, "completion_id": completion_id, "status": "pending", "late": late})
+    return web.json_response({
+        "ok": True, "completion_id": completion_id, "status": "pending",
+        "late": late, "deadline_hour": schedule.deadline_hour,
+    })
 
 
 @routes.post("/api/checklist/{task_key}/uncomplete")
 async def uncomplete_task_route(request: web.Request) -> web.Response:
     user = _require_child(request)
     task_key = request.match_info["task_key"]
-    today_str = date.today().isoformat()
+    today_str = _family_today(user).isoformat()
     await uncomplete_task(user["id"], task_key, today_str)
     return web.json_response({"ok": True})
 
@@ -193,69 +214,36 @@ async def uncomplete_task_route(request: web.Request) -> web.Response:
 async def complete_extra_route(request: web.Request) -> web.Response:
     user = _require_child(request)
     extra_id = int(request.match_info["extra_id"])
-    today_str = date.today().isoformat()
 
     et = await get_extra_task(extra_id)
     if not et or et["child_id"] != user["id"]:
         return web.json_response({"error": "Not found"}, status=404)
 
-    reader = await request.multipart()
-    file_path = None
-    full_path = None
-    media_type = "photo"
+    try:
+        upload = await save_upload(request)
+    except UploadError as e:
+        return web.json_response({"error": e.message}, status=e.status)
+    file_path, media_type = upload.path, upload.media_type
+    schedule_thumbnails(file_path, media_type)
 
-    while True:
-        part = await reader.next()
-        if part is None:
-            break
-        if part.name == "file":
-            content_type = part.headers.get("Content-Type", "image/jpeg")
-            media_type = "video" if "video" in content_type else "photo"
-            ext = "mp4" if media_type == "video" else "jpg"
-            day_dir = UPLOADS_DIR / today_str
-            day_dir.mkdir(parents=True, exist_ok=True)
-            filename = f"{uuid.uuid4().hex}.{ext}"
-            full_path = day_dir / filename
-            try:
-                total_size = 0
-                with open(full_path, "wb") as f:
-                    while True:
-                        chunk = await part.read_chunk()
-                        if not chunk:
-                            break
-                        total_size += len(chunk)
-                        if total_size > MAX_UPLOAD_SIZE:
-                            break
-                        f.write(chunk)
-                if total_size > MAX_UPLOAD_SIZE:
-                    if full_path.exists():
-                        full_path.unlink()
-                    return web.json_response({"error": "File too large (max 20MB)"}, status=413)
-            except (IOError, OSError):
-                if full_path and full_path.exists():
-                    full_path.unlink()
-                return web.json_response({"error": "Failed to save file"}, status=500)
-            file_path = f"uploads/{today_str}/{filename}"
-
-    if not file_path:
-        return web.json_response({"error": "No file uploaded"}, status=400)
-
-    await complete_extra_task(extra_id, file_path, media_type)
+    submission = await complete_extra_task(extra_id, file_path, media_type)
 
     # Check late submission
-    late = _is_past_deadline()
-    late_caption = "\n⚠️ Сдано после 22:00" if late else ""
+    schedule = await _family_schedule(user["family_id"])
+    late = schedule.is_past_deadline()
+    late_caption = f"\n⚠️ Сдано после {schedule.deadline_hour:02d}:00" if late else ""
 
     # Notify parents with photo + approval buttons (same as bot)
     caption = f"🕐 {user['name']} выполнил(а): <b>{et['title']}</b>\nОжидает одобрения{late_caption}"
-    parents = await get_family_parents(user["family_id"])
-    for parent in parents:
-        await send_media_to_parent(
-            parent["telegram_id"], file_path, media_type,
-            caption, extra_id, is_extra=True,
-        )
+    _notify_parents_later(
+        user, et["date"], file_path, media_type, caption, extra_id, is_extra=True,
+        submission=submission,
+    )
 
-    return web.json_response({"ok": True, "status": "pending", "late": late})
+    return web.json_response({
+        "ok": True, "status": "pending",
+        "late": late, "deadline_hour": schedule.deadline_hour,
+    })
 
 
 @routes.post("/api/extras/{extra_id}/uncomplete")
@@ -270,26 +258,38 @@ async def uncomplete_extra_route(request: web.Request) -> web.Response:
 
 
 @routes.get("/api/media/{file_id:.+}")
-async def proxy_media(request: web.Request) -> web.Response:
-    """Proxy Telegram file_id or serve local upload."""
+async def proxy_media(request: web.Request) -> web.StreamResponse:
+    """Proxy Telegram file_id or serve local upload.
+
+    ?size=thumb|preview serves a downscaled copy of stored media (WebP if the
+    client accepts it) and falls back to the original until one is rendered.
+    """
     file_id = request.match_info["file_id"]
+    size = request.query.get("size")
+    if size is not None and size not in THUMB_SIZES:
+        return web.json_response({"error": "Invalid size"}, status=400)
 
     # Local upload
     if file_id.startswith("uploads/"):
+        if size is not None:
+            thumb = find_thumbnail(file_id, size, request.headers.get("Accept", ""))
+            if thumb is not None:
+                thumb_file, content_type = thumb
+                return web.FileResponse(thumb_file, headers={
+                    "Content-Type": content_type,
+                    "Cache-Control": "private, max-age=31536000, immutable",
+                    "Vary": "Accept",
+                })
+            schedule_thumbnails(file_id)  # stored before thumbnails existed, or render failed
         local_path = Path(__file__).resolve().parent.parent.parent / "data" / file_id
         if local_path.exists():
+            if store_sha256(file_id) is not None:
+                # Content-addressed: the bytes behind this path never change
+                return web.FileResponse(local_path, headers={
+                    "Cache-Control": "private, max-age=31536000, immutable",
+                })
             return web.FileResponse(local_path)
         return web.json_response({"error": "File not found"}, status=404)
 
-    # Telegram file_id — proxy through Bot API
-    url = await get_file_url(file_id)
-    if not url:
-        return web.json_response({"error": "Cannot get file"}, status=404)
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                return web.json_response({"error": "Download failed"}, status=502)
-            data = await resp.read()
-            content_type = resp.headers.get("Content-Type", "application/octet-stream")
-            return web.Response(body=data, content_type=content_type)
+    # Telegram file_id — streamed through the Bot API once, then from the disk cache
+    return await serve_telegram_file(request, file_id)
@@ -2,51 +2,84 @@
 
 from __future__ import annotations
 
+import asyncio
+import base64
+import binascii
+import json
 from datetime import date, timedelta
+from itertools import groupby
 
 from aiohttp import web
 
+from bot.approvals import by_child, child_summary, edit_captions, item_caption
+from bot.bitset import TaskBits
+from bot.family_schedule import (
+    is_valid_timezone,
+    local_today,
+    parse_reminder_hours,
+    schedule_for,
+    schedule_to_dict,
+)
 from bot.scoring import (
     calculate_daily_points,
     calculate_weekly_result,
-    get_money_percentage,
-    points_to_next_tier,
+    tier_table,
 )
 from bot.tasks_config import SHOWER_KEY, SUNDAY_TASK, TaskDef
+from webapp.analytics import MAX_RANGE_DAYS, child_analytics
+from webapp.auth import media_url
 from webapp.db import (
     add_custom_child_task,
     add_extra_task,
     approve_completion,
     approve_extra_task,
+    count_pending_approvals,
     delete_approval_messages,
     delete_family,
+    ensure_child_tasks_initialized,
     get_approval_messages,
     get_child_all_tasks,
     get_child_enabled_tasks,
+    get_children_day_keys,
+    get_children_day_masks,
+    get_children_enabled_tasks,
+    get_children_extra_tasks_for_date,
     get_completed_keys_for_date,
     get_completed_keys_for_range,
     get_completion_by_id,
+    get_day_intensities,
     get_extra_points_for_date,
     get_extra_points_for_range,
     get_extra_task,
     get_extra_tasks_for_date,
+    get_family,
     get_family_children,
     get_family_invite_code,
-    get_family_parents,
+    get_family_members,
     get_pending_approvals,
     get_pending_keys_for_date,
     get_user_by_id,
+    has_activity_before,
+    read_snapshot,
     reject_completion,
     reject_extra_task,
     remove_custom_child_task,
     reset_child_tasks,
+    resolve_pending_approvals,
+    set_family_schedule,
     toggle_child_task,
 )
-from webapp.notify import edit_message_caption, send_checklist_to_child, send_message
+from webapp.notify import (
+    CHECKLIST_UPDATED,
+    edit_message_caption,
+    send_checklist_to_child,
+    send_message,
+)
 
 routes = web.RouteTableDef()
 
 HISTORY_WEEKS = 4
+MAX_HISTORY_WEEKS = 52
 
 
 def _require_parent(request: web.Request) -> dict:
@@ -56,6 +89,11 @@ def _require_parent(request: web.Request) -> dict:
     return user
 
 
+def _family_today(user: dict) -> date:
+    """Today in the family's timezone — the day children's submissions are stored under."""
+    return local_today(user.get("family_timezone"))
+
+
 def _child_has_shower(tasks: list[dict]) -> bool:
     return any(t["task_key"] == SHOWER_KEY for t in tasks)
 
@@ -75,38 +113,82 @@ def _tasks_to_taskdefs(tasks: list[dict], exclude_sunday: bool = True) -> tuple[
 # ── Children list with progress ─────────────────────────
 
 
+def _child_progress(child: dict, bits: TaskBits, done_mask: int, pending_mask: int) -> dict:
+    return {
+        "id": child["id"],
+        "name": child["name"],
+        "telegram_id": child["telegram_id"],
+        "total_tasks": bits.daily_count,
+        "done": bits.done_count(done_mask),
+        "pending": bits.done_count(pending_mask),
+    }
+
+
 @routes.get("/api/children")
 async def get_children(request: web.Request) -> web.Response:
     user = _require_parent(request)
-    children = await get_family_children(user["family_id"])
-    today_str = date.today().isoformat()
+    members = await get_family_members(user["family_id"])
+    children = [m for m in members if m["role"] == "child"]
+    parents = [m for m in members if m["role"] == "parent"]
+    today_str = _family_today(user).isoformat()
+
+    tasks_by_child = await get_children_enabled_tasks([c["id"] for c in children])
+    bits_by_child = {cid: TaskBits(tasks) for cid, tasks in tasks_by_child.items()}
+    masks = await get_children_day_masks(today_str, bits_by_child)
+
+    result = [
+        _child_progress(child, bits_by_child[child["id"]], *masks[child["id"]])
+        for child in children
+    ]
+
+    return web.json_response({
+        "children": result,
+        "parents": [{"id": p["id"], "name": p["name"]} for p in parents],
+        "pending_approvals": await count_pending_approvals(user["family_id"]),
+    })
+
+
+# ── Dashboard (children + today + approvals in one response) ──
+
+
+@routes.get("/api/dashboard")
+async def get_dashboard(request: web.Request) -> web.Response:
+    """Everything the parent home screen needs, read from one DB snapshot."""
+    user = _require_parent(request)
+    today = _family_today(user)
+    today_str = today.isoformat()
+
+    async with read_snapshot():
+        members = await get_family_members(user["family_id"])
+        children = [m for m in members if m["role"] == "child"]
+        child_ids = [c["id"] for c in children]
+        tasks_by_child = await get_children_enabled_tasks(child_ids)
+        keys_by_child = await get_children_day_keys(today_str, child_ids)
+        extras_by_child = await get_children_extra_tasks_for_date(today_str, child_ids)
+        approvals = await get_pending_approvals(user["family_id"])
 
     result = []
     for child in children:
-        enabled = await get_child_enabled_tasks(child["id"])
-        daily_tasks = [t for t in enabled if t["task_group"] != "sunday"]
-        completed = await get_completed_keys_for_date(child["id"], today_str)
-        pending = await get_pending_keys_for_date(child["id"], today_str)
-        total = len(daily_tasks)
-        done = sum(1 for t in daily_tasks if t["task_key"] in completed)
-        pend = sum(1 for t in daily_tasks if t["task_key"] in pending)
+        enabled = tasks_by_child[child["id"]]
+        completed, pending = keys_by_child[child["id"]]
+        extras = extras_by_child[child["id"]]
+        bits = TaskBits(enabled)
+        extra_pts = sum(e["points"] for e in extras if e["completed"] and e["approved"])
         result.append({
-            "id": child["id"],
-            "name": child["name"],
-            "telegram_id": child["telegram_id"],
-            "total_tasks": total,
-            "done": done,
-            "pending": pend,
+            **_child_progress(child, bits, bits.encode(completed), bits.encode(pending)),
+            "today": {
+                "child_name": child["name"],
+                **_today_detail(enabled, completed, pending, extras, extra_pts, today),
+            },
         })
 
-    # Also get pending approval count and parents list
-    approvals = await get_pending_approvals(user["family_id"])
-    parents = await get_family_parents(user["family_id"])
-
+    approval_items = [_approval_item(a, user) for a in approvals]
     return web.json_response({
+        "date": today_str,
         "children": result,
-        "parents": [{"id": p["id"], "name": p["name"]} for p in parents],
-        "pending_approvals": len(approvals),
+        "parents": [{"id": m["id"], "name": m["name"]} for m in members if m["role"] == "parent"],
+        "pending_approvals": len(approval_items),
+        "approvals": approval_items,
     })
 
 
@@ -124,9 +206,8 @@ async def get_today(request: web.Request) -> web.Response:
     if not child:
         return web.json_response({"error": "Child not found"}, status=404)
 
-    today = date.today()
+    today = _family_today(user)
     today_str = today.isoformat()
-    is_sunday = today.weekday() == 6
 
     enabled = await get_child_enabled_tasks(child_id)
     completed = await get_completed_keys_for_date(child_id, today_str)
@@ -134,6 +215,21 @@ async def get_today(request: web.Request) -> web.Response:
     extras = await get_extra_tasks_for_date(child_id, today_str)
     extra_pts = await get_extra_points_for_date(child_id, today_str)
 
+    return web.json_response({
+        "child_name": child["name"],
+        **_today_detail(enabled, completed, pending, extras, extra_pts, today),
+    })
+
+
+def _today_detail(
+    enabled: list[dict],
+    completed: set[str],
+    pending: set[str],
+    extras: list[dict],
+    extra_pts: int,
+    today: date,
+) -> dict:
+    is_sunday = today.weekday() == 6
     daily_tasks = _tasks_to_taskdefs(enabled, exclude_sunday=True)
     shower_req = _child_has_shower(enabled)
 
@@ -169,9 +265,8 @@ async def get_today(request: web.Request) -> web.Response:
 
     shower_missing = shower_req and SHOWER_KEY not in completed
 
-    return web.json_response({
-        "child_name": child["name"],
-        "date": today_str,
+    return {
+        "date": today.isoformat(),
         "is_sunday": is_sunday,
         "tasks": tasks,
         "extras": extra_list,
@@ -180,7 +275,7 @@ async def get_today(request: web.Request) -> web.Response:
         "max_points": len(daily_tasks),
         "extra_points": extra_pts,
         "shower_missing": shower_missing,
-    })
+    }
 
 
 # ── Weekly report ───────────────────────────────────────
@@ -196,7 +291,7 @@ async def get_report(request: web.Request) -> web.Response:
     if not child:
         return web.json_response({"error": "Child not found"}, status=404)
 
-    today = date.today()
+    today = _family_today(user)
     start = today - timedelta(days=today.weekday())
     end = start + timedelta(days=6)
 
@@ -246,9 +341,18 @@ async def get_report(request: web.Request) -> web.Response:
         "extra_total": result["extra_total"],
         "money_percent": result["money_percent"],
         "max_daily": len(daily_tasks),
+        "next_tier": _next_tier_json(result["total"], max_weekly),
     })
 
 
+def _next_tier_json(total: int, max_weekly: int) -> dict | None:
+    _, next_tier = tier_table(max_weekly).lookup(total)
+    if not next_tier:
+        return None
+    deficit, pct = next_tier
+    return {"points_needed": deficit, "percent": pct}
+
+
 # ── History (last 4 weeks) ─────────────────────────────
 
 
@@ -262,28 +366,44 @@ async def get_history(request: web.Request) -> web.Response:
     if not child:
         return web.json_response({"error": "Child not found"}, status=404)
 
-    today = date.today()
-    current_week_start = today - timedelta(days=today.weekday())
+    # ?before=<date> pages back: full weeks starting before that date's week
+    before = _parse_date(request.query.get("before"))
+    if request.query.get("before") and before is None:
+        return web.json_response({"error": "Invalid before"}, status=400)
+    before = before or _family_today(user)
+    try:
+        weeks_count = int(request.query.get("weeks", HISTORY_WEEKS))
+    except ValueError:
+        return web.json_response({"error": "Invalid weeks"}, status=400)
+    weeks_count = max(1, min(MAX_HISTORY_WEEKS, weeks_count))
+    try:
+        before_week = before - timedelta(days=before.weekday())
+        oldest = before_week - timedelta(weeks=weeks_count)
+    except OverflowError:  # ?before= close to date.min
+        return web.json_response({"error": "Invalid before"}, status=400)
 
     enabled = await get_child_enabled_tasks(child_id)
     daily_tasks = _tasks_to_taskdefs(enabled, exclude_sunday=True)
     shower_req = _child_has_shower(enabled)
     has_sunday = _child_has_sunday(enabled)
 
+    # Whole range in two queries, bucketed per week below
+    range_start, range_end = oldest.isoformat(), (before_week - timedelta(days=1)).isoformat()
+    completed_by_day = await get_completed_keys_for_range(child_id, range_start, range_end)
+    extra_by_day = await get_extra_points_for_range(child_id, range_start, range_end)
+
     weeks = []
-    for w in range(1, HISTORY_WEEKS + 1):
-        start = current_week_start - timedelta(weeks=w)
+    for w in range(1, weeks_count + 1):
+        start = before_week - timedelta(weeks=w)
         end = start + timedelta(days=6)
+        week_days = [(start + timedelta(days=i)).isoformat() for i in range(7)]
 
-        daily_completed = await get_completed_keys_for_range(child_id, start.isoformat(), end.isoformat())
-        for i in range(7):
-            d = (start + timedelta(days=i)).isoformat()
-            daily_completed.setdefault(d, set())
+        daily_completed = {d: completed_by_day.get(d, set()) for d in week_days}
 
         sunday_str = end.isoformat()
         sunday_done = has_sunday and SUNDAY_TASK.key in daily_completed.get(sunday_str, set())
 
-        extra_pts = await get_extra_points_for_range(child_id, start.isoformat(), end.isoformat())
+        extra_pts = {d: extra_by_day[d] for d in week_days if d in extra_by_day}
         max_weekly = len(daily_tasks) * 7
 
         result = calculate_weekly_result(
@@ -318,48 +438,221 @@ async def get_history(request: web.Request) -> web.Response:
             "max_daily": len(daily_tasks),
         })
 
+    has_more = await has_activity_before(child_id, oldest.isoformat())
     return web.json_response({
         "child_name": child["name"],
         "weeks": weeks,
+        "next_before": oldest.isoformat() if has_more else None,
     })
 
 
+# ── Analytics (arbitrary range) ────────────────────────
+
+
+ANALYTICS_DEFAULT_DAYS = 365
+
+
+def _parse_date(value: str | None) -> date | None:
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+@routes.get("/api/analytics/{child_id}")
+async def get_analytics(request: web.Request) -> web.Response:
+    """?from=YYYY-MM-DD&to=YYYY-MM-DD — defaults to the last year up to today."""
+    user = _require_parent(request)
+    child_id = int(request.match_info["child_id"])
+
+    children = await get_family_children(user["family_id"])
+    child = next((c for c in children if c["id"] == child_id), None)
+    if not child:
+        return web.json_response({"error": "Child not found"}, status=404)
+
+    today = _family_today(user)
+    raw_from, raw_to = request.query.get("from"), request.query.get("to")
+    start, end = _parse_date(raw_from), _parse_date(raw_to)
+    if (raw_from and start is None) or (raw_to and end is None):
+        return web.json_response({"error": "Invalid date"}, status=400)
+    end = min(end or today, today)
+    try:
+        start = start or end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    except OverflowError:  # ?to= close to date.min
+        return web.json_response({"error": "Invalid date"}, status=400)
+    if start > end or (end - start).days >= MAX_RANGE_DAYS:
+        return web.json_response({"error": "Invalid range"}, status=400)
+
+    await ensure_child_tasks_initialized(child_id)
+    result = await child_analytics(child_id, start, end)
+    result["child_name"] = child["name"]
+    return web.json_response(result)
+
+
+# ── Year heatmap ───────────────────────────────────────
+
+
+HEATMAP_DAYS = 365
+
+
+def _run_length(data: bytes) -> list[list[int]]:
+    """[[value, count], ...] — long zero runs (no activity) collapse to one pair."""
+    return [[value, len(list(group))] for value, group in groupby(data)]
+
+
+@routes.get("/api/heatmap/{child_id}")
+async def get_heatmap(request: web.Request) -> web.Response:
+    """Per-day totals for the 365 days ending at ?end= (default today).
+
+    ?encoding=bytes (default) returns base64 of one byte per day;
+    ?encoding=rle returns [value, count] runs.
+    """
+    user = _require_parent(request)
+    child_id = int(request.match_info["child_id"])
+
+    children = await get_family_children(user["family_id"])
+    child = next((c for c in children if c["id"] == child_id), None)
+    if not child:
+        return web.json_response({"error": "Child not found"}, status=404)
+
+    raw_end = request.query.get("end")
+    end = _parse_date(raw_end)
+    if raw_end and end is None:
+        return web.json_response({"error": "Invalid date"}, status=400)
+    encoding = request.query.get("encoding", "bytes")
+    if encoding not in ("bytes", "rle"):
+        return web.json_response({"error": "Invalid encoding"}, status=400)
+
+    end = end or _family_today(user)
+    try:
+        start = end - timedelta(days=HEATMAP_DAYS - 1)
+    except OverflowError:  # ?end= within a year of date.min
+        return web.json_response({"error": "Invalid date"}, status=400)
+    data = await get_day_intensities(child_id, start, end)
+    enabled = await get_child_enabled_tasks(child_id)
+
+    result = {
+        "child_name": child["name"],
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": len(data),
+        "max_daily": len(_tasks_to_taskdefs(enabled, exclude_sunday=True)),
+        "encoding": encoding,
+    }
+    if encoding == "rle":
+        result["runs"] = _run_length(data)
+    else:
+        result["data"] = base64.b64encode(data).decode()
+    return web.json_response(result)
+
+
 # ── Approvals ───────────────────────────────────────────
 
 
+APPROVALS_PAGE_SIZE = 50
+MAX_APPROVALS_PAGE_SIZE = 200
+
+
+def _approval_item(a: dict, viewer: dict) -> dict:
+    item = {
+        "id": a["id"],
+        "type": a["type"],
+        "child_name": a["child_name"],
+        "child_id": a["child_id"],
+        "date": a["date"],
+        "photo_file_id": a.get("photo_file_id"),
+        "media_url": media_url(a.get("photo_file_id"), viewer["telegram_id"]),
+        "media_type": a.get("media_type", "photo"),
+        "label": a["label"],
+    }
+    if a["type"] == "task":
+        item["task_key"] = a["task_key"]
+    else:
+        item["points"] = a["points"]
+    return item
+
+
+def _encode_cursor(sort_key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(sort_key).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[int, str, int] | None:
+    try:
+        kind, ts, item_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(kind), str(ts), int(item_id)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
 @routes.get("/api/approvals")
 async def get_approvals(request: web.Request) -> web.Response:
+    """Pending approvals; ?child_id= filters, ?cursor= continues a page."""
     user = _require_parent(request)
-    approvals = await get_pending_approvals(user["family_id"])
+    try:
+        child_id = int(request.query["child_id"]) if request.query.get("child_id") else None
+        limit = int(request.query.get("limit", APPROVALS_PAGE_SIZE))
+    except ValueError:
+        return web.json_response({"error": "Invalid child_id/limit"}, status=400)
+    limit = max(1, min(MAX_APPROVALS_PAGE_SIZE, limit))
+    after = None
+    if request.query.get("cursor"):
+        after = _decode_cursor(request.query["cursor"])
+        if after is None:
+            return web.json_response({"error": "Invalid cursor"}, status=400)
+
+    # One extra row tells whether another page exists
+    approvals = await get_pending_approvals(user["family_id"], child_id, after, limit + 1)
+    page = approvals[:limit]
+    return web.json_response({
+        "approvals": [_approval_item(a, user) for a in page],
+        "total": approvals[0]["total"] if approvals else 0,
+        "next_cursor": _encode_cursor(page[-1]["sort_key"]) if len(approvals) > limit else None,
+    })
 
-    result = []
-    for a in approvals:
-        item = {
-            "id": a["id"],
-            "type": a["type"],
-            "child_name": a["child_name"],
-            "child_id": a["child_id"],
-            "date": a["date"],
-            "photo_file_id": a.get("photo_file_id"),
-            "media_type": a.get("media_type", "photo"),
-        }
-        if a["type"] == "task":
-            # Get task label
-            enabled = await get_child_enabled_tasks(a["child_id"])
-            label = a["task_key"]
-            for t in enabled:
-                if t["task_key"] == a["task_key"]:
-                    label = t["label"]
-                    break
-            item["label"] = label
-            item["task_key"] = a["task_key"]
+
+@routes.post("/api/approvals/bulk")
+async def bulk_approvals_route(request: web.Request) -> web.Response:
+    """Approve or reject many pending items in one transaction.
+
+    Body: {"action": "approve"|"reject", "items": [{"type", "id"}, ...]}, or
+    {"action", "child_id", "date"} for everything the child has pending that
+    day (date defaults to today). Each child gets one summary message.
+    """
+    user = _require_parent(request)
+    body = await request.json() if request.content_length else {}
+    action = body.get("action")
+    if action not in ("approve", "reject"):
+        return web.json_response({"error": "action must be approve or reject"}, status=400)
+    approve = action == "approve"
+
+    try:
+        if "items" in body:
+            items = [(str(i["type"]), int(i["id"])) for i in body["items"]]
+            if not 0 < len(items) <= MAX_APPROVALS_PAGE_SIZE:
+                raise ValueError
+            if any(t not in ("task", "extra") for t, _ in items):
+                raise ValueError
+            scope = {"items": items}
         else:
-            item["label"] = a["title"]
-            item["points"] = a["points"]
+            day = body.get("date") or _family_today(user).isoformat()
+            scope = {"child_id": int(body["child_id"]), "day": date.fromisoformat(day).isoformat()}
+    except (KeyError, TypeError, ValueError):
+        return web.json_response({"error": "Invalid items/child_id/date"}, status=400)
 
-        result.append(item)
+    result = await resolve_pending_approvals(user["family_id"], approve, **scope)
 
-    return web.json_response({"approvals": result})
+    async def notify_child(telegram_id: int, items: list[dict]) -> None:
+        await send_message(telegram_id, f"{child_summary(items, approve)}\n\n{CHECKLIST_UPDATED}")
+
+    captions = {(i["type"], i["id"]): item_caption(i, approve) for i in result["items"]}
+    await asyncio.gather(
+        edit_captions(edit_message_caption, result["messages"], captions),
+        *(notify_child(tg, items) for tg, items in by_child(result["items"]).items()),
+    )
+    return web.json_response({
+        "ok": True,
+        "resolved": [{"type": i["type"], "id": i["id"]} for i in result["items"]],
+    })
 
 
 async def _update_all_approval_messages(approval_type: str, approval_id: int, new_caption: str) -> None:
@@ -492,7 +785,7 @@ async def create_extra(request: web.Request) -> web.Response:
     except (ValueError, TypeError):
         points = 1
 
-    today_str = date.today().isoformat()
+    today_str = _family_today(user).isoformat()
     task_id = await add_extra_task(user["family_id"], child_id, title, points, today_str)
 
     # Notify child
@@ -612,6 +905,54 @@ async def get_invite(request: web.Request) -> web.Response:
     return web.json_response({"invite_code": code})
 
 
+# ── Family schedule (timezone, checklist/reminder/deadline hours) ──
+
+
+@routes.get("/api/family/schedule")
+async def get_schedule(request: web.Request) -> web.Response:
+    user = _require_parent(request)
+    family = await get_family(user["family_id"])
+    return web.json_response(schedule_to_dict(schedule_for(family)))
+
+
+def _parse_hour(value, upper: int = 23) -> int | None:
+    try:
+        hour = int(value)
+    except (ValueError, TypeError):
+        return None
+    return hour if 0 <= hour <= upper else None
+
+
+@routes.post("/api/family/schedule")
+async def update_schedule(request: web.Request) -> web.Response:
+    user = _require_parent(request)
+    body = await request.json()
+
+    updates: dict = {}
+    if "timezone" in body:
+        if not isinstance(body["timezone"], str) or not is_valid_timezone(body["timezone"]):
+            return web.json_response({"error": "Invalid timezone"}, status=400)
+        updates["timezone"] = body["timezone"]
+    for field, upper in (("morning_hour", 23), ("morning_minute", 59), ("deadline_hour", 23)):
+        if field in body:
+            value = _parse_hour(body[field], upper)
+            if value is None:
+                return web.json_response({"error": f"Invalid {field}"}, status=400)
+            updates[field] = value
+    if "reminder_hours" in body:
+        raw = body["reminder_hours"]
+        if isinstance(raw, list):
+            raw = ",".join(str(h) for h in raw)
+        hours = parse_reminder_hours(raw if isinstance(raw, str) else None)
+        if hours is None:
+            return web.json_response({"error": "Invalid reminder_hours"}, status=400)
+        updates["reminder_hours"] = ",".join(str(h) for h in hours)
+
+    await set_family_schedule(user["family_id"], **updates)
+    family = await get_family(user["family_id"])
+    return web.json_response(schedule_to_dict(schedule_for(family)))
+
+
 # ── Reset family ───────────────────────────────────────
 
 
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import logging
 import os
 from pathlib import Path
 
@@ -10,11 +11,24 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from bot.config import LOG_LEVEL
+from bot.loop_monitor import LoopMonitor
+
 from .auth import auth_middleware
 from .db import close_db
+from .jobs import stop_jobs
+from .media_proxy import close_media_proxy
+from .metrics import (
+    db_stats_middleware,
+    http_metrics_middleware,
+    metrics_handler,
+    record_prepared_size,
+)
+from .routes.admin_routes import routes as admin_routes
 from .routes.auth_routes import routes as auth_routes
 from .routes.child_routes import routes as child_routes
 from .routes.parent_routes import routes as parent_routes
+from .thumbnails import shutdown_thumbnails
 
 WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8081"))
 BASE_DIR = Path(__file__).resolve().parent
@@ -22,17 +36,32 @@ STATIC_DIR = BASE_DIR / "static"
 UPLOADS_DIR = Path(__file__).resolve().parent.parent / "data" / "uploads"
 
 
+async def on_startup(app: web.Application) -> None:
+    app["loop_monitor"] = LoopMonitor("webapp")
+    app["loop_monitor"].start()
+
+
 async def on_shutdown(app: web.Application) -> None:
+    await app["loop_monitor"].stop()
+    await stop_jobs()
+    shutdown_thumbnails()
+    await close_media_proxy()
     await close_db()
 
 
 def create_app() -> web.Application:
-    app = web.Application(middlewares=[auth_middleware])
+    app = web.Application(
+        middlewares=[http_metrics_middleware, db_stats_middleware, auth_middleware]
+    )
 
     # API routes
     app.router.add_routes(auth_routes)
     app.router.add_routes(child_routes)
     app.router.add_routes(parent_routes)
+    app.router.add_routes(admin_routes)
+
+    # Prometheus metrics (loopback only, never through the proxy)
+    app.router.add_get("/metrics", metrics_handler)
 
     # Serve uploaded files
     UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
@@ -46,13 +75,19 @@ def create_app() -> web.Application:
         return web.FileResponse(STATIC_DIR / "index.html")
 
     app.router.add_get("/", index_handler)
-    app.router.add_get("/{path:(?!api/|static/|uploads/).*}", index_handler)
+    app.router.add_get("/{path:(?!api/|static/|uploads/|metrics$).*}", index_handler)
 
+    app.on_response_prepare.append(record_prepared_size)
+    app.on_startup.append(on_startup)
     app.on_shutdown.append(on_shutdown)
     return app
 
 
 def main() -> None:
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
     app = create_app()
     web.run_app(app, host="0.0.0.0", port=WEBAPP_PORT)
 
@@ -0,0 +1,71 @@
+"""Coalescing of concurrent identical upstream calls.
+
+`Singleflight.do(key, fn)` runs `fn()` once per key at a time: callers that
+arrive while it is running await the same task instead of starting their own
+(two parents opening the approvals list at once cost one getFile and one
+download per file, not two). The shared task is shielded, so a caller that
+goes away does not cancel it for the others.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+_instances: list["Singleflight"] = []
+
+
+class Singleflight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.flights: dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+        _instances.append(self)
+
+    def running(self, key: Hashable) -> asyncio.Task | None:
+        return self.flights.get(key)
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """The key's running task, or a new one for `fn()`."""
+        task = self.flights.get(key)
+        if task is not None:
+            self.joined += 1
+            return task
+        task = asyncio.create_task(fn())
+        self.flights[key] = task
+        self.started += 1
+
+        def finished(t: asyncio.Task) -> None:
+            if self.flights.get(key) is t:
+                del self.flights[key]
+            if not t.cancelled():
+                t.exception()  # retrieved even if every caller went away
+
+        task.add_done_callback(finished)
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, fn))
+
+    async def wait(self, key: Hashable) -> bool:
+        """Wait for the key's running task, ignoring its outcome; False if none was running."""
+        task = self.flights.get(key)
+        if task is None:
+            return False
+        self.joined += 1
+        await asyncio.wait([task])
+        return True
+
+    async def stop(self) -> None:
+        tasks = list(self.flights.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def singleflight_stats() -> list[dict]:
+    return [
+        {"name": s.name, "running": len(s.flights), "started": s.started, "joined": s.joined}
+        for s in _instances
+    ]
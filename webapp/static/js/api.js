@@ -2,6 +2,11 @@
  * API client — fetch wrapper with Telegram WebApp authorization.
  */
 const API = (() => {
+    // Responses delivered ahead of time (e.g. inside /api/dashboard); each is
+    // served once, and only while fresh, so later visits still hit the server.
+    const PRIMED_TTL_MS = 15000;
+    const primed = new Map();
+
     function getInitData() {
         if (window.Telegram && window.Telegram.WebApp) {
             return window.Telegram.WebApp.initData;
@@ -28,10 +33,20 @@ const API = (() => {
     }
 
     function get(path) {
+        const hit = primed.get(path);
+        if (hit) {
+            primed.delete(path);
+            if (Date.now() - hit.at < PRIMED_TTL_MS) return Promise.resolve(hit.data);
+        }
         return request(path, { method: 'GET' });
     }
 
+    function prime(path, data) {
+        primed.set(path, { data, at: Date.now() });
+    }
+
     function post(path, body) {
+        primed.clear();  // any write may change what was primed
         if (body instanceof FormData) {
             return request(path, { method: 'POST', body, headers: {} });
         }
@@ -41,13 +56,13 @@ const API = (() => {
         });
     }
 
-    function mediaUrl(fileId) {
-        if (!fileId) return '';
-        if (fileId.startsWith('uploads/')) {
-            return '/' + fileId;
-        }
-        return '/api/media/' + encodeURIComponent(fileId);
+    // Downscaled WebP of stored media (see bot/media_store.py thumb_path); '' when
+    // there is none to expect, so callers use the item's media_url instead.
+    function thumbUrl(fileId, size = 'thumb') {
+        const m = /^uploads\/media\/([0-9a-f]{2})\/([0-9a-f]{64})\./.exec(fileId || '');
+        if (!m) return '';
+        return `/uploads/thumbs/${m[1]}/${m[2]}-${size}.webp`;
     }
 
-    return { get, post, mediaUrl };
+    return { get, post, prime, thumbUrl };
 })();
@@ -150,7 +150,8 @@ const ChecklistView = (() => {
                 overlay.remove();
 
                 if (result && result.late) {
-                    showAlert('⚠️ Задача сдана после 22:00');
+                    const hour = String(result.deadline_hour ?? 22).padStart(2, '0');
+                    showAlert(`⚠️ Задача сдана после ${hour}:00`);
                 }
 
                 await render($el, user);
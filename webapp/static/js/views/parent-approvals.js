@@ -2,9 +2,14 @@
  * Parent approvals view — pending task confirmations with media.
  */
 const ParentApprovalsView = (() => {
+    // Server limit on items per /api/approvals/bulk request (MAX_APPROVALS_PAGE_SIZE)
+    const BULK_MAX_ITEMS = 200;
+    let total = 0;
+
     async function render($el, user) {
         const data = await API.get('/api/approvals');
-        window.appUpdateApprovalBadge(data.approvals.length);
+        total = data.total;
+        window.appUpdateApprovalBadge(total);
 
         let html = '<div class="page-header">Проверка</div>';
 
@@ -14,37 +19,98 @@ const ParentApprovalsView = (() => {
             return;
         }
 
-        html += `<div class="section-header">${data.approvals.length} на проверке</div>`;
+        html += `<div class="section-header">${total} на проверке</div>`;
+        html += '<div class="card text-center"><button class="btn btn-success btn-sm" id="approve-all-btn">✅ Одобрить все показанные</button></div>';
+        html += data.approvals.map(approvalCard).join('');
+        html += '<div id="approvals-more"></div>';
+
+        $el.innerHTML = html;
+        attachEvents($el, user);
+        document.getElementById('approve-all-btn').addEventListener('click', approveAll);
+        renderMore($el, user, data.next_cursor);
+    }
+
+    function renderMore($el, user, cursor) {
+        const $more = document.getElementById('approvals-more');
+        if (!cursor) {
+            $more.innerHTML = '';
+            return;
+        }
+        $more.innerHTML = '<div class="card text-center"><button class="btn btn-outline btn-sm" id="approvals-more-btn">Показать ещё</button></div>';
+        document.getElementById('approvals-more-btn').addEventListener('click', async () => {
+            $more.innerHTML = '<div class="card text-center text-hint">Загрузка…</div>';
+            const page = await API.get(`/api/approvals?cursor=${encodeURIComponent(cursor)}`);
+            $more.insertAdjacentHTML('beforebegin', page.approvals.map(approvalCard).join(''));
+            attachEvents($el, user);
+            renderMore($el, user, page.next_cursor);
+        });
+    }
 
-        for (const a of data.approvals) {
-            const mediaUrl = a.photo_file_id ? API.mediaUrl(a.photo_file_id) : '';
-            const isVideo = a.media_type === 'video';
+    function approvalCard(a) {
+        const mediaUrl = a.media_url || '';  // signed by the server: <img>/<video> send no auth header
+        const thumbUrl = API.thumbUrl(a.photo_file_id);
+        const isVideo = a.media_type === 'video';
 
-            html += `
-                <div class="approval-card" id="approval-${a.type}-${a.id}">
-                    ${mediaUrl ? `<div class="media-wrap">${isVideo
-                        ? `<video src="${mediaUrl}" controls playsinline></video>`
+        // Thumbnails are rendered in the background; until then (or without
+        // one) the image falls back to the original, the video to no poster.
+        return `
+            <div class="approval-card" id="approval-${a.type}-${a.id}">
+                ${mediaUrl ? `<div class="media-wrap">${isVideo
+                    ? `<video src="${mediaUrl}"${thumbUrl ? ` poster="${thumbUrl}"` : ''} preload="none" controls playsinline></video>`
+                    : thumbUrl
+                        ? `<a href="${mediaUrl}" target="_blank"><img src="${thumbUrl}" data-full="${mediaUrl}" onerror="this.onerror=null;this.src=this.dataset.full" alt="" loading="lazy"></a>`
                         : `<img src="${mediaUrl}" alt="" loading="lazy">`
-                    }</div>` : ''}
-                    <div class="info">
-                        <div class="child-name">${a.child_name}</div>
-                        <div class="task-name">${a.label}${a.points ? ` (+${a.points} б.)` : ''}</div>
-                        <div class="text-sm text-hint mt-4">${a.date}</div>
-                        <div class="btn-row">
-                            <button class="btn btn-success btn-sm" data-action="approve" data-id="${a.id}" data-type="${a.type}">✅ Одобрить</button>
-                            <button class="btn btn-danger btn-sm" data-action="reject" data-id="${a.id}" data-type="${a.type}">✕ Отклонить</button>
-                        </div>
+                }</div>` : ''}
+                <div class="info">
+                    <div class="child-name">${a.child_name}</div>
+                    <div class="task-name">${a.label}${a.points ? ` (+${a.points} б.)` : ''}</div>
+                    <div class="text-sm text-hint mt-4">${a.date}</div>
+                    <div class="btn-row">
+                        <button class="btn btn-success btn-sm" data-action="approve" data-id="${a.id}" data-type="${a.type}">✅ Одобрить</button>
+                        <button class="btn btn-danger btn-sm" data-action="reject" data-id="${a.id}" data-type="${a.type}">✕ Отклонить</button>
                     </div>
                 </div>
-            `;
+            </div>
+        `;
+    }
+
+    async function approveAll(e) {
+        const btn = e.currentTarget;
+        const items = [...document.querySelectorAll('.approval-card:not(.processed) [data-action="approve"]')]
+            .map(b => ({ type: b.dataset.type, id: Number(b.dataset.id) }));
+        if (items.length === 0) return;
+
+        haptic('medium');
+        btn.disabled = true;
+        try {
+            for (let i = 0; i < items.length; i += BULK_MAX_ITEMS) {
+                const chunk = items.slice(i, i + BULK_MAX_ITEMS);
+                const res = await API.post('/api/approvals/bulk', { action: 'approve', items: chunk });
+                res.resolved.forEach(({ type, id }) => markProcessed(type, id, 'approve'));
+                total = Math.max(0, total - res.resolved.length);
+                window.appUpdateApprovalBadge(total);
+            }
+            haptic('success');
+        } catch (err) {
+            haptic('error');
+            showAlert('Ошибка: ' + err.message);
         }
+        btn.disabled = false;
+    }
 
-        $el.innerHTML = html;
-        attachEvents($el, user);
+    function markProcessed(type, id, action) {
+        const card = document.getElementById(`approval-${type}-${id}`);
+        if (card) {
+            card.classList.add('processed');
+            const info = card.querySelector('.info');
+            const badge = action === 'approve' ? '✅ Одобрено' : '❌ Отклонено';
+            info.querySelector('.btn-row').innerHTML = `<div class="approval-result">${badge}</div>`;
+        }
     }
 
     function attachEvents($el, user) {
-        $el.querySelectorAll('[data-action]').forEach(btn => {
+        $el.querySelectorAll('[data-action]:not([data-bound])').forEach(btn => {
+            btn.dataset.bound = '1';
             btn.addEventListener('click', async () => {
                 const action = btn.dataset.action;
                 const id = btn.dataset.id;
@@ -55,18 +121,12 @@ const ParentApprovalsView = (() => {
 
                 try {
                     await API.post(`/api/approvals/${id}/${action}`, { type });
-                    const card = document.getElementById(`approval-${type}-${id}`);
-                    if (card) {
-                        card.classList.add('processed');
-                        const info = card.querySelector('.info');
-                        const badge = action === 'approve' ? '✅ Одобрено' : '❌ Отклонено';
-                        info.querySelector('.btn-row').innerHTML = `<div class="approval-result">${badge}</div>`;
-                    }
+                    markProcessed(type, id, action);
                     haptic(action === 'approve' ? 'success' : 'warning');
 
                     // Update badge
-                    const remaining = $el.querySelectorAll('.approval-card:not(.processed)').length;
-                    window.appUpdateApprovalBadge(remaining);
+                    total = Math.max(0, total - 1);
+                    window.appUpdateApprovalBadge(total);
                 } catch (err) {
                     btn.disabled = false;
                     haptic('error');
@@ -1,5 +1,5 @@
 /**
- * Parent history view — last 4 weeks.
+ * Parent history view — recent weeks, "Ранее" pages further back.
  */
 const ParentHistoryView = (() => {
     async function render($el, user, childId) {
@@ -17,36 +17,56 @@ const ParentHistoryView = (() => {
             return;
         }
 
-        for (const week of data.weeks) {
-            const moneyClass = week.money_percent === 100 ? 'green'
-                : week.money_percent >= 70 ? 'yellow'
-                : week.money_percent >= 40 ? 'orange'
-                : 'red';
-
-            const hasExtra = week.extra_total > 0;
-
-            html += `
-                <div class="card">
-                    <div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:10px">
-                        <strong style="font-size:15px">${week.start_display} — ${week.end_display}</strong>
-                        <span class="money-badge ${moneyClass}" style="font-size:14px;padding:3px 10px">${week.money_percent}%</span>
-                    </div>
-                    <table class="report-table">
-                        <tr><th>День</th><th>Баллы</th>${hasExtra ? '<th>Доп.</th>' : ''}</tr>
-            `;
-            for (const day of week.days) {
-                html += `<tr><td>${day.weekday} ${day.display}</td><td>${day.points}/${week.max_daily}</td>${hasExtra ? `<td>${day.extra || '—'}</td>` : ''}</tr>`;
-            }
-            html += `
-                        <tr class="total-row"><td><b>Итого</b></td><td colspan="${hasExtra ? 2 : 1}"><b>${week.total}</b>${hasExtra ? ` (доп: +${week.extra_total})` : ''}</td></tr>
-                    </table>
-                    ${week.penalty ? `<div class="text-sm text-hint mt-8" style="color:var(--destructive)">Штраф: -${week.penalty}</div>` : ''}
-                </div>
-            `;
-        }
+        html += data.weeks.map(weekCard).join('');
+        html += '<div id="history-more"></div>';
 
         $el.innerHTML = html;
         document.getElementById('back-btn').addEventListener('click', () => window.appNavigate('home'));
+        renderMore(childId, data.next_before);
+    }
+
+    function renderMore(childId, nextBefore) {
+        const $more = document.getElementById('history-more');
+        if (!nextBefore) {
+            $more.innerHTML = '';
+            return;
+        }
+        $more.innerHTML = '<div class="card text-center"><button class="btn btn-outline btn-sm" id="history-more-btn">⬅️ Ранее</button></div>';
+        document.getElementById('history-more-btn').addEventListener('click', async () => {
+            $more.innerHTML = '<div class="card text-center text-hint">Загрузка…</div>';
+            const page = await API.get(`/api/history/${childId}?before=${nextBefore}`);
+            $more.insertAdjacentHTML('beforebegin', page.weeks.map(weekCard).join(''));
+            renderMore(childId, page.next_before);
+        });
+    }
+
+    function weekCard(week) {
+        const moneyClass = week.money_percent === 100 ? 'green'
+            : week.money_percent >= 70 ? 'yellow'
+            : week.money_percent >= 40 ? 'orange'
+            : 'red';
+
+        const hasExtra = week.extra_total > 0;
+
+        let html = `
+            <div class="card">
+                <div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:10px">
+                    <strong style="font-size:15px">${week.start_display} — ${week.end_display}</strong>
+                    <span class="money-badge ${moneyClass}" style="font-size:14px;padding:3px 10px">${week.money_percent}%</span>
+                </div>
+                <table class="report-table">
+                    <tr><th>День</th><th>Баллы</th>${hasExtra ? '<th>Доп.</th>' : ''}</tr>
+        `;
+        for (const day of week.days) {
+            html += `<tr><td>${day.weekday} ${day.display}</td><td>${day.points}/${week.max_daily}</td>${hasExtra ? `<td>${day.extra || '—'}</td>` : ''}</tr>`;
+        }
+        html += `
+                    <tr class="total-row"><td><b>Итого</b></td><td colspan="${hasExtra ? 2 : 1}"><b>${week.total}</b>${hasExtra ? ` (доп: +${week.extra_total})` : ''}</td></tr>
+                </table>
+                ${week.penalty ? `<div class="text-sm text-hint mt-8" style="color:var(--destructive)">Штраф: -${week.penalty}</div>` : ''}
+            </div>
+        `;
+        return html;
     }
 
     return { render };
@@ -3,8 +3,16 @@
  */
 const ParentTodayView = (() => {
     async function renderDashboard($el, user) {
-        const data = await API.get('/api/children');
+        // One round trip: today's detail and approvals come along and are
+        // primed for the views the parent is likely to open next.
+        const data = await API.get('/api/dashboard');
         window.appUpdateApprovalBadge(data.pending_approvals);
+        for (const child of data.children) {
+            API.prime(`/api/today/${child.id}`, child.today);
+        }
+        API.prime('/api/approvals', {
+            approvals: data.approvals, total: data.pending_approvals, next_cursor: null,
+        });
 
         let html = '<div class="page-header">CHILD CONTROL</div>';
 
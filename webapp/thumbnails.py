@@ -0,0 +1,159 @@
+"""Downscaled copies of uploaded media for list views.
+
+After an upload lands in the media store, `schedule_thumbnails` queues a
+background job that renders every THUMB_SIZES entry as WebP and JPEG
+(bot.media_store.thumb_path) in a small process pool, so decoding and
+resampling never run on the event loop or hold the GIL of the server process.
+Videos get a poster frame the same way when an ffmpeg binary is on PATH.
+
+Both are optional: without Pillow (or, for videos, ffmpeg) nothing is
+rendered and `find_thumbnail` returns None, so callers serve the original.
+Thumbnails of collected media are removed by the scheduler's media GC.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import io
+import logging
+import mimetypes
+import multiprocessing
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+
+from bot.media_store import THUMB_FORMATS, THUMB_SIZES, store_sha256, thumb_path, thumb_paths
+from webapp.jobs import enqueue
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+THUMB_WORKERS = 2
+THUMB_QUALITY = {"webp": 80, "jpeg": 82}
+POSTER_TIMEOUT = 30  # seconds ffmpeg may take to extract a frame
+
+_pool: ProcessPoolExecutor | None = None
+_pending: set[str] = set()  # store paths with a job queued or running
+
+
+def pillow_available() -> bool:
+    return importlib.util.find_spec("PIL") is not None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the server process has running threads (aiosqlite, loop monitor)
+        _pool = ProcessPoolExecutor(THUMB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_thumbnails() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ── Worker process ──
+
+
+def _poster_frame(ffmpeg: str, src: str) -> bytes:
+    """First frame after 0.5s (or the very first, for short clips) as PNG."""
+    for seek in ("0.5", "0"):
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-ss", seek, "-i", src, "-frames:v", "1",
+             "-f", "image2pipe", "-vcodec", "png", "-"],
+            capture_output=True, timeout=POSTER_TIMEOUT, check=False,
+        )
+        if result.returncode == 0 and result.stdout:
+            return result.stdout
+    raise ValueError(f"no frame decoded from {src}")
+
+
+def _render(data_dir: str, src: str, sha256: str, ffmpeg: str | None) -> int:
+    """Write all thumbnails of one file; runs in the process pool. Returns files written."""
+    from PIL import Image, ImageOps
+
+    if ffmpeg:
+        image = Image.open(io.BytesIO(_poster_frame(ffmpeg, src)))
+    else:
+        image = Image.open(src)
+    image = ImageOps.exif_transpose(image).convert("RGB")
+
+    written = 0
+    for size, longest in THUMB_SIZES.items():
+        scaled = image.copy()
+        scaled.thumbnail((longest, longest), Image.Resampling.LANCZOS)
+        for fmt in THUMB_FORMATS:
+            dest = Path(data_dir) / thumb_path(sha256, size, fmt)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_suffix(f".{os.getpid()}.tmp")
+            scaled.save(tmp, fmt.upper(), quality=THUMB_QUALITY[fmt])
+            os.replace(tmp, dest)
+            written += 1
+    return written
+
+
+# ── Server side ──
+
+
+def _missing(sha256: str) -> bool:
+    return any(not (DATA_DIR / p).exists() for p in thumb_paths(sha256))
+
+
+async def _make_thumbnails(path: str, media_type: str) -> None:
+    sha256 = store_sha256(path)
+    try:
+        if not await asyncio.to_thread(_missing, sha256):
+            return
+        ffmpeg = None
+        if media_type == "video":
+            ffmpeg = shutil.which("ffmpeg")
+            if ffmpeg is None:
+                return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            _get_pool(), _render, str(DATA_DIR), str(DATA_DIR / path), sha256, ffmpeg
+        )
+    except BrokenProcessPool:
+        # A worker died (OOM on a huge image?): start a fresh pool for the retry
+        shutdown_thumbnails()
+        raise
+    except (OSError, ValueError, subprocess.SubprocessError) as e:
+        # Undecodable or truncated input: retrying won't help, the original still works
+        logger.warning("No thumbnails for %s: %s", path, e)
+    finally:
+        _pending.discard(path)
+
+
+def schedule_thumbnails(path: str, media_type: str | None = None) -> None:
+    """Queue thumbnail rendering for a store path (no-op if it can't or is already queued).
+
+    media_type ("photo" / "video") is guessed from the extension when not given.
+    """
+    if store_sha256(path) is None or path in _pending or not pillow_available():
+        return
+    if media_type is None:
+        guessed = mimetypes.guess_type(path)[0] or ""
+        media_type = "video" if guessed.startswith("video/") else "photo"
+    _pending.add(path)
+    enqueue("thumbnails", partial(_make_thumbnails, path, media_type))
+
+
+def find_thumbnail(path: str, size: str, accept: str = "") -> tuple[Path, str] | None:
+    """(file, content type) of a rendered thumbnail; WebP when accepted, else JPEG."""
+    sha256 = store_sha256(path)
+    if sha256 is None:
+        return None
+    fmts = ("webp", "jpeg") if "image/webp" in accept else ("jpeg",)
+    for fmt in fmts:
+        candidate = DATA_DIR / thumb_path(sha256, size, fmt)
+        if candidate.exists():
+            return candidate, THUMB_FORMATS[fmt]
+    return None
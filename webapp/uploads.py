@@ -0,0 +1,188 @@
+"""Streaming multipart upload handling shared by the child upload routes.
+
+`save_upload` streams the request's "file" part to disk without blocking the
+event loop: chunks are batched and written (and SHA-256 hashed) in a worker
+thread. The size limit is enforced while streaming, and the media type comes
+from the file's magic bytes, not the client's Content-Type header.
+
+Finished files go into the content-addressed media store (bot.media_store):
+bytes already stored are not written twice.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from aiohttp import web
+
+from bot.media_store import media_path
+from webapp.db import register_media
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+UPLOADS_DIR = DATA_DIR / "uploads"
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024  # 20 MB
+WRITE_BATCH = 256 * 1024            # bytes buffered per thread-pool write
+SNIFF_BYTES = 32
+
+
+class UploadError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class SavedUpload:
+    path: str           # relative to data/, e.g. "uploads/media/3f/3f…e1.jpg"
+    media_type: str     # "photo" | "video"
+    content_type: str   # sniffed, e.g. "image/jpeg"
+    size: int
+    sha256: str
+    deduplicated: bool  # the same bytes were already stored
+
+
+# Sniffed content type -> stored file extension
+_IMAGE_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+_VIDEO_TYPES = {
+    "video/mp4": "mp4",
+    "video/quicktime": "mov",
+    "video/webm": "webm",
+}
+_HEIC_BRANDS = {b"heic", b"heix", b"heif", b"mif1", b"msf1", b"hevc"}
+# ISO BMFF major brands played as MP4; others (AVIF, Canon CR3, …) are refused
+_MP4_BRANDS = {
+    b"isom", b"iso2", b"iso4", b"iso5", b"iso6", b"mp41", b"mp42", b"avc1",
+    b"dash", b"M4V ", b"M4VH", b"M4VP", b"MSNV", b"f4v ",
+}
+
+
+def sniff_content_type(head: bytes) -> str | None:
+    """Content type from the first bytes of a file; None if not a supported image/video."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in _HEIC_BRANDS:
+            return "image/heic"
+        if brand == b"qt  ":
+            return "video/quicktime"
+        if brand in _MP4_BRANDS or brand[:3] in (b"3gp", b"3g2"):
+            return "video/mp4"
+    return None
+
+
+def _write(f: BinaryIO, digest, data: bytes) -> None:
+    f.write(data)
+    digest.update(data)
+
+
+async def save_upload(request: web.Request) -> SavedUpload:
+    """Stream the "file" part of a multipart request into the media store.
+
+    Raises UploadError (status + message for the JSON error) when the body is
+    too large, has no file, isn't an image/video, or can't be written.
+    """
+    if request.content_length and request.content_length > MAX_UPLOAD_SIZE + 64 * 1024:
+        raise UploadError(413, "File too large (max 20MB)")
+
+    if not request.content_type.startswith("multipart/"):
+        raise UploadError(400, "No file uploaded")
+    reader = await request.multipart()
+    while True:
+        part = await reader.next()
+        if part is None:
+            raise UploadError(400, "No file uploaded")
+        if part.name == "file":
+            break
+
+    tmp_dir = UPLOADS_DIR / "tmp"
+    tmp_path = tmp_dir / f"{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+    buffer = bytearray()
+    f = None
+    saved = False
+    try:
+        await asyncio.to_thread(tmp_dir.mkdir, parents=True, exist_ok=True)
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        while True:
+            chunk = await part.read_chunk()
+            if chunk:
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise UploadError(413, "File too large (max 20MB)")
+                buffer += chunk
+            if content_type is None and (len(buffer) >= SNIFF_BYTES or not chunk):
+                content_type = sniff_content_type(bytes(buffer[:SNIFF_BYTES]))
+                if content_type is None:
+                    raise UploadError(415, "Unsupported file type (photo or video only)")
+                if content_type == "image/heic":
+                    # Telegram's sendPhoto refuses HEIC, so parents could never see it
+                    raise UploadError(415, "HEIC photos are not supported (send JPEG or PNG)")
+            if len(buffer) >= WRITE_BATCH or (buffer and not chunk):
+                await asyncio.to_thread(_write, f, digest, bytes(buffer))
+                buffer.clear()
+            if not chunk:
+                break
+        await asyncio.to_thread(f.close)
+        sha256 = digest.hexdigest()
+        media_type = "video" if content_type in _VIDEO_TYPES else "photo"
+        ext = _IMAGE_TYPES.get(content_type) or _VIDEO_TYPES[content_type]
+        # Register before placing: the media GC re-checks for the row, under a
+        # write lock, right before it unlinks a collected path
+        media = await register_media(
+            sha256, media_path(sha256, ext), content_type, media_type, size
+        )
+        deduplicated = await asyncio.to_thread(_place, tmp_path, DATA_DIR / media["path"])
+        saved = True
+    except OSError:
+        raise UploadError(500, "Failed to save file") from None
+    finally:
+        if not saved:
+            # Also on client disconnect/cancellation, so no awaits here
+            if f is not None:
+                f.close()
+            tmp_path.unlink(missing_ok=True)
+
+    return SavedUpload(
+        path=media["path"],
+        media_type=media_type,
+        content_type=content_type,
+        size=size,
+        sha256=sha256,
+        deduplicated=deduplicated,
+    )
+
+
+def _place(tmp_path: Path, final_path: Path) -> bool:
+    """Move the upload into the store; True if the content was already there.
+
+    Always replaces, even over an existing copy, so a freshly registered path
+    holds these bytes whatever became of an older copy (media GC, damage).
+    """
+    existed = final_path.exists()
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return existed
+